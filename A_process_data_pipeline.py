@@ -1,20 +1,142 @@
+from __future__ import annotations
+
+import argparse
 import logging
 import re
+import signal
 import sys
-from os import listdir
-from typing import Dict, List, Pattern
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import partial
+from itertools import islice
+from os import makedirs, path, remove, stat
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Pattern,
+    Set,
+    Tuple,
+)
 
 import jsonlines
-from bs4 import BeautifulSoup
-from sentence_transformers import SentenceTransformer, util
-
-from constants.data_constants import ERROR, FORMAT, MODEL_NAME, PATH, PREFIX
+import numpy as np
+
+from constants.data_constants import (
+    ANN,
+    BATCH,
+    CACHE,
+    CHECKPOINT,
+    CONCURRENCY,
+    EMBEDDING_DTYPE,
+    ENCODER_BACKEND,
+    ENCODER_SERVER,
+    ERROR,
+    FORMAT,
+    HTML_EXTRACTOR,
+    MODEL_NAME,
+    PATH,
+    THEME_SEARCH,
+    WATCH,
+)
+from utils.checkpoint import (
+    CHECKPOINT_DIRECTORY_NAME,
+    PipelineCheckpoint,
+    run_fingerprint,
+)
+from utils.columnar_output import ColumnarOutputWriter
+from utils.company_artifacts import (
+    CompanyArtifacts,
+    CompanyArtifactWriter,
+    remove_company_artifacts,
+)
+from utils.company_html import parse_company_html
+from utils.company_store import CompanyStore
+from utils.embedding_cache import EmbeddingCache
+from utils.encoder_pool import EncoderPool
+from utils.encoder_server import EncoderClient
+from utils.input_manifest import InputManifest, hash_file
+from utils.input_sources import iterate_input_files, read_input_file
+from utils.lazy_model import LazySentenceTransformer, encoder_model_name
 from utils.logger import create_logger
+from utils.prefetch_reader import PrefetchingFileReader
+from utils.shards import (
+    load_shard_metadata,
+    merge_shard_companies,
+    save_shard_metadata,
+    shard_directory,
+    shard_of_file,
+)
+from utils.stage_metrics import StageMetrics
+from utils.theme_matrix import THEME_MATRIX_FILE_NAME, ThemeMatrix
+
+# torch and sentence_transformers take seconds to import, so they are only imported once encoding
+# or scoring starts.
+if TYPE_CHECKING:
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    from utils.theme_index import IvfThemeIndex
+
+# Timing, CPU time, peak RSS and item counts of every stage of the current run
+pipeline_metrics = StageMetrics()
+
+
+@pipeline_metrics.timed(
+    "parse_themes", lambda theme_matrix, *args, **kwargs: len(theme_matrix.theme_names)
+)
+def parse_themes(
+    logger: logging.Logger,
+    model: SentenceTransformer,
+    embedding_cache: Optional[EmbeddingCache] = None,
+    encode_batch_size: int = BATCH.ENCODE_BATCH_SIZE.value,
+    theme_matrix_file: str = PATH.OUTPUT_THEME_MATRIX_FILE.value,
+    model_name: str = MODEL_NAME,
+) -> ThemeMatrix:
+    """Parses the input themes.txt file with a helper function and returns the matrix of normalized
+    theme encodings.
+
+    Note: the theme matrix saved by an earlier run is reused if it was built from the same themes
+    file with the same model and encoder backend, named by model_name. Otherwise every theme is
+    encoded in one batch.
+    """
+    themes = parse_theme_descriptions(logger)
 
+    theme_names = list(themes.keys())
+    themes_hash = hash_file(PATH.INPUT_THEME_FILE.value)
+    theme_matrix = ThemeMatrix.load(theme_matrix_file)
+    if theme_matrix is not None and theme_matrix.is_current(
+        theme_names, themes_hash, model_name
+    ):
+        logger.info(f"Done loading theme matrix from: {theme_matrix_file}")
+        return theme_matrix
 
-def parse_themes(logger: logging.Logger, model: SentenceTransformer) -> Dict[str, any]:
-    """Reads lines from input themes.txt file, processes every line with a helper function and returns
-    a dictionary of processed themes.
+    import torch
+
+    theme_description_model_encodings = encode_descriptions(
+        model, list(themes.values()), encode_batch_size, embedding_cache
+    )
+    return ThemeMatrix(
+        theme_names,
+        torch.nn.functional.normalize(
+            torch.stack(theme_description_model_encodings).float(), dim=1
+        )
+        .cpu()
+        .numpy(),
+        themes_hash,
+        model_name,
+    )
+
+
+def parse_theme_descriptions(logger: logging.Logger) -> Dict[str, str]:
+    """Reads lines from input themes.txt file and returns the description of every valid theme, keyed
+    by theme name. Invalid lines are logged and skipped.
     """
     themes = dict()
     theme_name_pattern = re.compile(FORMAT.THEME_NAME.value)
@@ -30,13 +152,7 @@ def parse_themes(logger: logging.Logger, model: SentenceTransformer) -> Dict[str
             logger.error(error_message)
             continue
 
-        themes[theme_name] = {
-            "theme_name": theme_name,
-            "theme_description": theme_description,
-            "theme_description_model_encoding": model.encode(
-                theme_description, convert_to_tensor=True
-            ),
-        }
+        themes[theme_name] = theme_description
 
     logger.info(
         f"Done parsing themes. There are {len(themes)} themes: {list(themes.keys())}"
@@ -80,19 +196,55 @@ def is_valid_theme_name(theme_name: str, theme_name_pattern: Pattern) -> bool:
     return bool(theme_name_pattern.match(theme_name))
 
 
+@pipeline_metrics.timed(
+    "parse_company_files", lambda companies, *args, **kwargs: len(companies)
+)
 def parse_company_files(
-    logger: logging.Logger, model: SentenceTransformer
+    logger: logging.Logger,
+    model: SentenceTransformer,
+    encode_batch_size: int = BATCH.ENCODE_BATCH_SIZE.value,
+    parse_window_size: int = BATCH.PARSE_WINDOW_SIZE.value,
+    parse_workers: int = CONCURRENCY.PARSE_WORKERS.value,
+    parse_timeout_seconds: float = CONCURRENCY.PARSE_TIMEOUT_SECONDS.value,
+    html_extractor: str = HTML_EXTRACTOR.FAST.value,
+    embedding_cache: Optional[EmbeddingCache] = None,
+    read_workers: int = CONCURRENCY.READ_WORKERS.value,
+    read_queue_depth: int = CONCURRENCY.READ_QUEUE_DEPTH.value,
+    shard_index: Optional[int] = None,
+    shard_count: Optional[int] = None,
+    checkpoint: Optional[PipelineCheckpoint] = None,
+    resume: bool = False,
+    embedding_dtype: Optional[str] = None,
 ) -> Dict[str, any]:
-    """List all html files in the input directory and call helper function to process the list"""
-    full_list_of_company_html_files: List[str] = [
-        file
-        for file in listdir(PATH.INPUT_COMPANIES_DIRECTORY.value)
-        if ".html" in file
-    ]
+    """List all html files in the input directory, or only those of one shard, and call helper
+    function to process the list. With an embedding dtype, the companies are returned in a
+    CompanyStore holding their encodings in that dtype.
+    """
+    full_list_of_company_html_files = list_company_html_files(shard_index, shard_count)
+    company_store = (
+        None
+        if embedding_dtype is None
+        else CompanyStore(len(full_list_of_company_html_files), embedding_dtype)
+    )
 
     companies: Dict[str, any] = process_list_of_companies(
-        logger, full_list_of_company_html_files, model
+        logger,
+        full_list_of_company_html_files,
+        model,
+        encode_batch_size=encode_batch_size,
+        parse_window_size=parse_window_size,
+        parse_workers=parse_workers,
+        parse_timeout_seconds=parse_timeout_seconds,
+        html_extractor=html_extractor,
+        embedding_cache=embedding_cache,
+        read_workers=read_workers,
+        read_queue_depth=read_queue_depth,
+        checkpoint=checkpoint,
+        resume=resume,
+        company_store=company_store,
     )
+    if company_store is not None:
+        log_company_store_memory(logger, company_store)
 
     company_count = len(companies)
     last_three_companies = [
@@ -102,200 +254,2733 @@ def parse_company_files(
         f"Done parsing companies. There are {company_count} companies. Last three: {last_three_companies}"
     )
 
-    if len(companies) < 1:
+    # An empty shard is still written, so that the merge finds the output of every shard
+    if len(companies) < 1 and shard_count is None:
         logger.error(ERROR.NO_COMPANIES.value)
         sys.exit()
 
     return companies
 
 
+def iterate_company_html_files() -> Iterator[str]:
+    """Lazily yield the path of every html file in the input companies directory, relative to it.
+    This includes the files in subdirectories and in zip and tar archives, which are read without
+    being extracted.
+    """
+    return iterate_input_files(PATH.INPUT_COMPANIES_DIRECTORY.value)
+
+
+def list_company_html_files(
+    shard_index: Optional[int] = None, shard_count: Optional[int] = None
+) -> List[str]:
+    """Return the paths of all html files in the input companies directory. With a shard, return
+    only the files of that shard, sorted by name, so that a later file with the same ticker
+    replaces an earlier one in the same order on every node.
+    """
+    html_files = iterate_company_html_files()
+    if shard_count is None:
+        return list(html_files)
+    return sorted(
+        file for file in html_files if shard_of_file(file, shard_count) == shard_index
+    )
+
+
 def process_list_of_companies(
-    logger: logging.Logger, list_of_html_files: List[str], model: SentenceTransformer
+    logger: logging.Logger,
+    list_of_html_files: List[str],
+    model: SentenceTransformer,
+    encode_batch_size: int = BATCH.ENCODE_BATCH_SIZE.value,
+    parse_window_size: int = BATCH.PARSE_WINDOW_SIZE.value,
+    parse_workers: int = CONCURRENCY.PARSE_WORKERS.value,
+    parse_timeout_seconds: float = CONCURRENCY.PARSE_TIMEOUT_SECONDS.value,
+    html_extractor: str = HTML_EXTRACTOR.FAST.value,
+    embedding_cache: Optional[EmbeddingCache] = None,
+    read_workers: int = CONCURRENCY.READ_WORKERS.value,
+    read_queue_depth: int = CONCURRENCY.READ_QUEUE_DEPTH.value,
+    checkpoint: Optional[PipelineCheckpoint] = None,
+    resume: bool = False,
+    company_store: Optional[CompanyStore] = None,
+    file_tickers: Optional[Dict[str, str]] = None,
 ) -> Dict[str, any]:
     """Traverse every file in a list, process its contents for company information, then store and
-    return as a dictionary
+    return as a dictionary, or in the company store if one is given. With a checkpoint, every
+    window of companies is also added to the checkpoint, and with resume, the windows of the last
+    checkpoint are not processed again. With file_tickers, the ticker of every valid file is added
+    to it, including files whose company a later file with the same ticker replaced.
     """
 
-    companies = dict()
-
-    for html_file in list_of_html_files:
-        with open(
-            f"{PATH.INPUT_COMPANIES_DIRECTORY.value}/{html_file}", "r", encoding="utf-8"
-        ) as file:
-            html_content = file.read()
-            processed_html = BeautifulSoup(html_content, "html.parser")
+    companies = dict() if company_store is None else company_store
+    if checkpoint is not None:
+        companies = open_checkpoint(
+            logger, checkpoint, list_of_html_files, resume, company_store
+        )
+        list_of_html_files = list_of_html_files[
+            checkpoint.window_count * parse_window_size :
+        ]
 
-            if not is_expected_html_format(processed_html):
-                logger.error(
-                    f"[{PATH.INPUT_COMPANIES_DIRECTORY.value}/{html_file}]:{ERROR.HTML_MALFORMED_DATA.value}"
+    if company_store is not None:
+        for parsed_companies in iterate_parsed_company_windows(
+            logger,
+            list_of_html_files,
+            parse_window_size,
+            parse_workers,
+            parse_timeout_seconds,
+            html_extractor,
+            read_workers,
+            read_queue_depth,
+        ):
+            window_rows = store_window_of_companies(
+                model,
+                parsed_companies,
+                company_store,
+                encode_batch_size,
+                embedding_cache,
+                file_tickers,
+            )
+            if checkpoint is not None:
+                checkpoint.append_window(
+                    {
+                        company_store.company_tickers[row]: company_store[
+                            company_store.company_tickers[row]
+                        ]
+                        for row in window_rows
+                    },
+                    company_store.encodings[window_rows],
                 )
-                continue
-
-            try:
-                (
-                    company_name,
-                    company_ticker,
-                    company_description,
-                ) = extract_company_details(processed_html)
-            except Exception as exception_message:
-                logger.error(
-                    f"[{PATH.INPUT_COMPANIES_DIRECTORY.value}/{html_file}]:{exception_message}"
+    else:
+        for window_of_companies in iterate_company_windows(
+            logger,
+            list_of_html_files,
+            model,
+            encode_batch_size,
+            parse_window_size,
+            parse_workers,
+            parse_timeout_seconds,
+            html_extractor,
+            embedding_cache,
+            read_workers,
+            read_queue_depth,
+            file_tickers,
+        ):
+            companies.update(window_of_companies)
+            if checkpoint is not None:
+                checkpoint.append_window(
+                    window_of_companies, window_encodings(window_of_companies)
                 )
-                continue
 
+    if checkpoint is not None:
+        checkpoint.commit()
+    return companies
+
+
+@pipeline_metrics.timed(
+    "open_checkpoint", lambda companies, *args, **kwargs: len(companies)
+)
+def open_checkpoint(
+    logger: logging.Logger,
+    checkpoint: PipelineCheckpoint,
+    list_of_html_files: List[str],
+    resume: bool = False,
+    company_store: Optional[CompanyStore] = None,
+) -> Dict[str, any]:
+    """Start a new checkpoint, or with resume, return the companies of the last checkpoint of an
+    interrupted run with the same input files and options, in the order they were processed. They
+    are added to the company store if one is given.
+    """
+    import torch
+
+    fingerprint = run_fingerprint(
+        PATH.INPUT_COMPANIES_DIRECTORY.value,
+        list_of_html_files,
+        checkpoint.run_details,
+    )
+    companies = dict() if company_store is None else company_store
+    if not resume:
+        checkpoint.start(fingerprint)
+        return companies
+
+    for company_record, company_encoding in checkpoint.resume(fingerprint):
+        if company_store is not None:
+            company_store.add(company_record, company_encoding)
+            continue
+        companies[company_record["company_ticker"]] = {
+            "company_name": company_record["company_name"],
+            "company_ticker": company_record["company_ticker"],
+            "company_description": company_record["company_description"],
+            "company_description_model_encoding": torch.from_numpy(company_encoding),
+            "company_html_file": company_record["company_html_file"],
+        }
+
+    if checkpoint.window_count > 0:
+        logger.info(
+            f"Resuming from checkpoint: {checkpoint.window_count} windows with "
+            f"{len(companies)} companies were already processed."
+        )
+    else:
+        logger.warning(ERROR.NO_CHECKPOINT.value)
+    return companies
+
+
+def log_company_store_memory(
+    logger: logging.Logger, company_store: CompanyStore
+) -> None:
+    """Logs the bytes per company of the company store, and an estimate of the bytes per company
+    of the same companies as a dict of one dict and float32 tensor per company, and adds both to
+    the pipeline metrics.
+
+    Note: the dicts are not built, so their size is estimated from sys.getsizeof, which does not
+    see the bookkeeping torch and the allocator add to every object. It is a lower bound.
+    """
+    import torch
+
+    company_count = len(company_store)
+    if company_count < 1:
+        return
+    encoding = torch.zeros(company_store.encodings.shape[1], dtype=torch.float32)
+    bytes_per_company = company_store.nbytes() / company_count
+    estimated_dict_bytes_per_company = (
+        company_store.dict_nbytes(
+            sys.getsizeof(encoding) + encoding.untyped_storage().nbytes()
+        )
+        / company_count
+    )
+    pipeline_metrics.add_details(
+        company_store={
+            "company_count": company_count,
+            "embedding_dtype": company_store.embedding_dtype.name,
+            "bytes_per_company": bytes_per_company,
+            "estimated_min_dict_bytes_per_company": estimated_dict_bytes_per_company,
+        }
+    )
+    logger.info(
+        f"Done storing {company_count} companies in {bytes_per_company:.0f} bytes per company "
+        f"with {company_store.embedding_dtype.name} encodings. As dicts of tensors, they would "
+        f"take an estimated {estimated_dict_bytes_per_company:.0f} bytes per company or more."
+    )
+
+
+def window_encodings(companies: Dict[str, any]) -> np.ndarray:
+    """Return the encodings of a window of companies as a float32 array, one row per company"""
+    import torch
+
+    if not companies:
+        return np.zeros((0, 0), dtype=np.float32)
+    return (
+        torch.stack(
+            [
+                company["company_description_model_encoding"]
+                for company in companies.values()
+            ]
+        )
+        .cpu()
+        .numpy()
+    )
+
+
+def iterate_company_windows(
+    logger: logging.Logger,
+    list_of_html_files: Iterable[str],
+    model: SentenceTransformer,
+    encode_batch_size: int = BATCH.ENCODE_BATCH_SIZE.value,
+    parse_window_size: int = BATCH.PARSE_WINDOW_SIZE.value,
+    parse_workers: int = CONCURRENCY.PARSE_WORKERS.value,
+    parse_timeout_seconds: float = CONCURRENCY.PARSE_TIMEOUT_SECONDS.value,
+    html_extractor: str = HTML_EXTRACTOR.FAST.value,
+    embedding_cache: Optional[EmbeddingCache] = None,
+    read_workers: int = CONCURRENCY.READ_WORKERS.value,
+    read_queue_depth: int = CONCURRENCY.READ_QUEUE_DEPTH.value,
+    file_tickers: Optional[Dict[str, str]] = None,
+    written_tickers: Optional[Set[str]] = None,
+) -> Iterator[Dict[str, any]]:
+    """Parse the files a window at a time, encode the descriptions of each window together in
+    batches, and yield every window as a dictionary of companies. The files are read ahead by
+    reader threads, so that reading overlaps with parsing and encoding. With file_tickers, the
+    ticker of every valid file is added to it.
+
+    Note: within a window, as across windows of a dictionary, a later file with the same ticker
+    replaces an earlier one. With written_tickers, the first file of a ticker is kept instead: a
+    file whose ticker is in it is logged and skipped before encoding, and the ticker of every
+    yielded company is added to it.
+    """
+    for parsed_companies in iterate_parsed_company_windows(
+        logger,
+        list_of_html_files,
+        parse_window_size,
+        parse_workers,
+        parse_timeout_seconds,
+        html_extractor,
+        read_workers,
+        read_queue_depth,
+    ):
+        if written_tickers is not None:
+            parsed_companies = skip_written_tickers(
+                logger, parsed_companies, written_tickers
+            )
+        company_description_model_encodings = encode_descriptions(
+            model,
+            [
+                company_description
+                for _, (_, _, company_description) in parsed_companies
+            ],
+            encode_batch_size,
+            embedding_cache,
+        )
+
+        companies = dict()
+        for (
+            html_file,
+            (company_name, company_ticker, company_description),
+        ), company_description_model_encoding in zip(
+            parsed_companies, company_description_model_encodings
+        ):
+            if file_tickers is not None:
+                file_tickers[html_file] = company_ticker
             companies[company_ticker] = {
                 "company_name": company_name,
                 "company_ticker": company_ticker,
                 "company_description": company_description,
-                "company_description_model_encoding": model.encode(
-                    company_description, convert_to_tensor=True
-                ),
+                "company_description_model_encoding": company_description_model_encoding,
+                "company_html_file": html_file,
             }
-    return companies
+        yield companies
 
 
-def is_expected_html_format(processed_html: BeautifulSoup) -> bool:
-    """Return boolean if the tag structure is the same expected structure"""
-    list_of_tags = [tag.name for tag in processed_html.find_all()]
-    if list_of_tags != FORMAT.HTML_TAG_STRUCTURE.value:
-        return False
-    return True
+def skip_written_tickers(
+    logger: logging.Logger,
+    parsed_companies: List[Tuple[str, Tuple[str, str, str]]],
+    written_tickers: Set[str],
+) -> List[Tuple[str, Tuple[str, str, str]]]:
+    """Return the parsed companies whose ticker is not written yet, keeping the first file of a
+    ticker, and add their tickers to the written tickers. Every skipped file is logged.
+    """
+    kept_companies = []
+    for html_file, company_details in parsed_companies:
+        company_ticker = company_details[1]
+        if company_ticker in written_tickers:
+            logger.error(f"[{company_ticker}]:{ERROR.DUPLICATE_COMPANY_TICKER.value}")
+            continue
+        written_tickers.add(company_ticker)
+        kept_companies.append((html_file, company_details))
+    return kept_companies
 
 
-def extract_company_details(processed_html: BeautifulSoup) -> tuple:
-    """Call helper functions to obtain the respective company information and return the tuple of
-    information, otherwise raise exception.
+def iterate_parsed_company_windows(
+    logger: logging.Logger,
+    list_of_html_files: Iterable[str],
+    parse_window_size: int = BATCH.PARSE_WINDOW_SIZE.value,
+    parse_workers: int = CONCURRENCY.PARSE_WORKERS.value,
+    parse_timeout_seconds: float = CONCURRENCY.PARSE_TIMEOUT_SECONDS.value,
+    html_extractor: str = HTML_EXTRACTOR.FAST.value,
+    read_workers: int = CONCURRENCY.READ_WORKERS.value,
+    read_queue_depth: int = CONCURRENCY.READ_QUEUE_DEPTH.value,
+) -> Iterator[List[Tuple[str, Tuple[str, str, str]]]]:
+    """Parse the files a window at a time, and yield the html file and the name, ticker and
+    description of every valid file of each window, in file order
     """
-    try:
-        company_name = extract_company_name(processed_html)
-        company_ticker = extract_company_ticker(processed_html)
-        company_description = extract_company_description(processed_html)
-    except Exception as error_message:
-        raise Exception(error_message)
+    with create_parse_pool(parse_workers) as parse_pool:
+        for window_of_html_files, window_of_html_contents in iterate_html_file_windows(
+            logger,
+            list_of_html_files,
+            parse_window_size,
+            read_workers,
+            read_queue_depth,
+        ):
+            yield parse_window_of_companies(
+                logger,
+                window_of_html_files,
+                parse_pool,
+                parse_timeout_seconds,
+                html_extractor,
+                window_of_html_contents,
+            )
+
+
+def store_window_of_companies(
+    model: SentenceTransformer,
+    parsed_companies: List[Tuple[str, Tuple[str, str, str]]],
+    company_store: CompanyStore,
+    encode_batch_size: int = BATCH.ENCODE_BATCH_SIZE.value,
+    embedding_cache: Optional[EmbeddingCache] = None,
+    file_tickers: Optional[Dict[str, str]] = None,
+) -> List[int]:
+    """Add a window of parsed companies to the company store, and encode their descriptions
+    straight into its encoding array, a batch at a time. Return the rows of the window, in the
+    order the window would hold them as a dictionary. With file_tickers, the ticker of every file
+    is added to it.
+
+    Note: every description is encoded, as in a dictionary window, but only the encoding of the
+    last file of a ticker is stored.
+    """
+    description_rows: Dict[int, int] = dict()
+    last_indices: Dict[str, int] = dict()
+    for index, (
+        html_file,
+        (company_name, company_ticker, company_description),
+    ) in enumerate(parsed_companies):
+        if file_tickers is not None:
+            file_tickers[html_file] = company_ticker
+        row = company_store.add_record(
+            company_name, company_ticker, company_description, html_file
+        )
+        description_rows[index] = row
+        if company_ticker in last_indices:
+            del description_rows[last_indices[company_ticker]]
+        last_indices[company_ticker] = index
+
+    def store_encodings(indices: List[int], encodings) -> None:
+        stored = [
+            position
+            for position, index in enumerate(indices)
+            if index in description_rows
+        ]
+        company_store.set_encodings(
+            [description_rows[indices[position]] for position in stored],
+            encodings[stored].cpu().numpy(),
+        )
+
+    encode_descriptions(
+        model,
+        [company_description for _, (_, _, company_description) in parsed_companies],
+        encode_batch_size,
+        embedding_cache,
+        encoding_sink=store_encodings,
+    )
+    return [description_rows[index] for index in last_indices.values()]
+
 
-    return company_name, company_ticker, company_description
+def validate_inputs(
+    logger: logging.Logger,
+    parse_window_size: int = BATCH.PARSE_WINDOW_SIZE.value,
+    parse_workers: int = CONCURRENCY.PARSE_WORKERS.value,
+    parse_timeout_seconds: float = CONCURRENCY.PARSE_TIMEOUT_SECONDS.value,
+    html_extractor: str = HTML_EXTRACTOR.FAST.value,
+    read_workers: int = CONCURRENCY.READ_WORKERS.value,
+    read_queue_depth: int = CONCURRENCY.READ_QUEUE_DEPTH.value,
+) -> int:
+    """Validate the themes file and every company file without loading the model. Every reject is
+    logged with the same message as a full run. Return the number of rejected theme lines and files.
+    """
+    theme_line_count = len(read_lines_from_file(PATH.INPUT_THEME_FILE.value))
+    rejected_theme_count = theme_line_count - len(parse_theme_descriptions(logger))
+
+    list_of_html_files = list_company_html_files()
+    valid_file_count = 0
+    with create_parse_pool(parse_workers) as parse_pool:
+        for window_of_html_files, window_of_html_contents in iterate_html_file_windows(
+            logger,
+            list_of_html_files,
+            parse_window_size,
+            read_workers,
+            read_queue_depth,
+        ):
+            valid_file_count += len(
+                parse_window_of_companies(
+                    logger,
+                    window_of_html_files,
+                    parse_pool,
+                    parse_timeout_seconds,
+                    html_extractor,
+                    window_of_html_contents,
+                )
+            )
+    rejected_file_count = len(list_of_html_files) - valid_file_count
 
+    logger.info(
+        f"Done validating inputs. Rejected theme lines: {rejected_theme_count} of {theme_line_count}, "
+        f"rejected company files: {rejected_file_count} of {len(list_of_html_files)}"
+    )
+    return rejected_theme_count + rejected_file_count
 
-def extract_company_name(processed_html: BeautifulSoup):
-    """Return the company name from where it is expected in HTML, otherwise raise exception."""
-    company_name_from_h1 = processed_html.body.h1.text
-    if not company_name_from_h1:
-        raise Exception(ERROR.HTML_BLANK_COMPANY_NAME.value)
 
-    title_line = processed_html.head.title.text
-    index_start_of_name = title_line.find(PREFIX.TITLE_NAME.value)
-    if index_start_of_name == -1:
-        raise Exception(ERROR.HTML_MISSING_TITLE_PREFIX.value)
+def iterate_html_file_windows(
+    logger: logging.Logger,
+    list_of_html_files: Iterable[str],
+    parse_window_size: int = BATCH.PARSE_WINDOW_SIZE.value,
+    read_workers: int = CONCURRENCY.READ_WORKERS.value,
+    read_queue_depth: int = CONCURRENCY.READ_QUEUE_DEPTH.value,
+) -> Iterator[Tuple[List[str], Optional[List[Optional[str]]]]]:
+    """Yield the files a window at a time, along with their contents, which reader threads read up
+    to read_queue_depth files ahead. With no reader threads, no contents are yielded and every file
+    is read when it is parsed. The files may be given lazily, and are only listed as far as they
+    are read.
+    """
+    list_of_html_files = iter(list_of_html_files)
+    if read_workers < 1:
+        while True:
+            window_of_html_files = list(islice(list_of_html_files, parse_window_size))
+            if not window_of_html_files:
+                return
+            yield window_of_html_files, None
+
+    html_reader = PrefetchingFileReader(
+        PATH.INPUT_COMPANIES_DIRECTORY.value, read_workers, read_queue_depth
+    )
+    prefetched_html_files = html_reader.read_all(list_of_html_files)
+    while True:
+        window_of_prefetched_html_files = list(
+            islice(prefetched_html_files, parse_window_size)
+        )
+        if not window_of_prefetched_html_files:
+            break
+        yield [html_file for html_file, _ in window_of_prefetched_html_files], [
+            html_content for _, html_content in window_of_prefetched_html_files
+        ]
+
+    logger.info(
+        f"Done reading {html_reader.file_count} company files with {read_workers} reader threads "
+        f"and a queue depth of {read_queue_depth}. Reading took {html_reader.read_seconds:.3f}s, "
+        f"of which {html_reader.wait_seconds:.3f}s was not overlapped with parsing and encoding"
+    )
 
-    name_from_title = title_line[
-        index_start_of_name + len(PREFIX.TITLE_NAME.value) :
-    ].strip()
-    if name_from_title != company_name_from_h1:
-        raise Exception(ERROR.HTML_MISMATCH_NAME.value)
 
-    return company_name_from_h1
+def create_parse_pool(parse_workers: int):
+    """Return a process pool for parsing HTML files, or an empty context when parsing in-process"""
+    if parse_workers > 1:
+        return ProcessPoolExecutor(max_workers=parse_workers)
+    return nullcontext()
+
+
+@pipeline_metrics.timed(
+    "parse_html_files",
+    lambda parsed_companies, logger, list_of_html_files, *args, **kwargs: len(
+        list_of_html_files
+    ),
+)
+def parse_window_of_companies(
+    logger: logging.Logger,
+    list_of_html_files: List[str],
+    parse_pool: Optional[Executor] = None,
+    parse_timeout_seconds: float = CONCURRENCY.PARSE_TIMEOUT_SECONDS.value,
+    html_extractor: str = HTML_EXTRACTOR.FAST.value,
+    html_contents: Optional[List[Optional[str]]] = None,
+) -> List[tuple]:
+    """Parse every file in a list and return the file name and (name, ticker, description) tuple of
+    every valid company, in file order. Invalid files are logged and skipped. Files with already
+    read contents are not read again.
+
+    Note: with a parse pool, every file is parsed in a worker process with its own timeout, and
+    only the small tuples and error messages are sent back to be logged here. Without one, files
+    are parsed in this process with the same timeout where it can be armed, but a file that
+    crashes the interpreter stops the run.
+    """
+    if html_contents is None:
+        html_contents = [None] * len(list_of_html_files)
+    if not can_arm_parse_timeout(in_process=parse_pool is None):
+        logger.warning(ERROR.PARSE_TIMEOUT_UNAVAILABLE.value)
+    if parse_pool is None:
+        parse_results = map(
+            partial(
+                parse_company_file_with_timeout,
+                timeout_seconds=parse_timeout_seconds,
+                html_extractor=html_extractor,
+            ),
+            list_of_html_files,
+            html_contents,
+        )
+    else:
+        parse_results = parse_pool.map(
+            partial(
+                parse_company_file_with_timeout,
+                timeout_seconds=parse_timeout_seconds,
+                html_extractor=html_extractor,
+            ),
+            list_of_html_files,
+            html_contents,
+            chunksize=CONCURRENCY.PARSE_TASK_CHUNK_SIZE.value,
+        )
+
+    parsed_companies = []
+    for html_file, (company_details, error_message) in zip(
+        list_of_html_files, parse_results
+    ):
+        if error_message:
+            logger.error(error_message)
+            continue
+        parsed_companies.append((html_file, company_details))
+
+    return parsed_companies
+
+
+def parse_company_file(
+    html_file: str,
+    html_content: Optional[str] = None,
+    html_extractor: str = HTML_EXTRACTOR.FAST.value,
+) -> Tuple[Optional[tuple], Optional[str]]:
+    """Parse one company file, reading it unless its content was already read. Return its
+    (name, ticker, description) tuple, or the error message to log when the file is skipped. With
+    the fast extractor, only the files it rejects are parsed with BeautifulSoup.
+    """
+    file_path = f"{PATH.INPUT_COMPANIES_DIRECTORY.value}/{html_file}"
+    if html_content is None:
+        html_content = read_input_file(PATH.INPUT_COMPANIES_DIRECTORY.value, html_file)
+
+    company_details, error_message = parse_company_html(html_content, html_extractor)
+    if error_message is not None:
+        return None, f"[{file_path}]:{error_message}"
+    return company_details, None
+
+
+def parse_company_file_with_timeout(
+    html_file: str,
+    html_content: Optional[str] = None,
+    timeout_seconds: float = CONCURRENCY.PARSE_TIMEOUT_SECONDS.value,
+    html_extractor: str = HTML_EXTRACTOR.FAST.value,
+) -> Tuple[Optional[tuple], Optional[str]]:
+    """Parse one company file, giving up on it once the timeout has passed, and turn any unexpected
+    failure into an error message so that one file cannot stop the run. The timeout needs SIGALRM,
+    so it is only armed on POSIX platforms, on the main thread of the process.
+    """
+    file_path = f"{PATH.INPUT_COMPANIES_DIRECTORY.value}/{html_file}"
+    has_alarm = can_arm_parse_timeout()
+    if has_alarm:
+        signal.signal(signal.SIGALRM, raise_parse_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout_seconds)
+    try:
+        return parse_company_file(html_file, html_content, html_extractor)
+    except TimeoutError:
+        return None, f"[{file_path}]:{ERROR.HTML_PARSE_TIMEOUT.value}"
+    except Exception as exception_message:
+        return None, f"[{file_path}]:{exception_message}"
+    finally:
+        if has_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
 
 
-def extract_company_ticker(processed_html: BeautifulSoup):
-    """Return the company ticker from where it is expected in HTML, otherwise raise exception."""
-    company_ticker_line = processed_html.body.h2.text
-    index_ticker = company_ticker_line.find(PREFIX.TICKER.value)
+def raise_parse_timeout(signal_number, frame) -> None:
+    raise TimeoutError()
 
-    if index_ticker == -1:
-        raise Exception(ERROR.HTML_MISSING_TICKER_PREFIX.value)
 
-    company_ticker = (
-        company_ticker_line[index_ticker + len(PREFIX.TICKER.value) :].strip().upper()
+def can_arm_parse_timeout(in_process: bool = True) -> bool:
+    """Return whether the per-file parse timeout can be armed, in this process or in the main
+    thread of a parse worker
+    """
+    return hasattr(signal, "SIGALRM") and (
+        not in_process or threading.current_thread() is threading.main_thread()
     )
 
-    if not company_ticker:
-        raise Exception(ERROR.HTML_BLANK_COMPANY_TICKER.value)
 
-    return company_ticker
+def encode_descriptions(
+    model: SentenceTransformer,
+    descriptions: List[str],
+    batch_size: int,
+    embedding_cache: Optional[EmbeddingCache] = None,
+    encoding_sink: Optional[Callable[[List[int], any], None]] = None,
+) -> Optional[List[any]]:
+    """Encode a list of descriptions in batches of similar length to minimise padding, and return
+    the encodings in the same order as the given descriptions. Descriptions found in the embedding
+    cache are not encoded again, and new encodings are added to it. With encoding_sink, nothing is
+    returned: the sink is called with the indices of a batch of descriptions and their encodings as
+    one tensor, e.g. to write them straight into a preallocated array.
+
+    Note: the word count is used as a cheap stand-in for the token length when sorting.
+    """
+    import torch
 
+    encodings = [None] * len(descriptions)
 
-def extract_company_description(processed_html: BeautifulSoup):
-    """Return the company description from where it is expected in HTML, otherwise raise exception."""
-    company_description_line = processed_html.body.p.text
-    company_description = " ".join(
-        [line.strip() for line in company_description_line.split("\n")]
-    ).strip()
+    def collect_encodings(indices: List[int], batch_encodings) -> None:
+        for index, encoding in zip(indices, batch_encodings):
+            encodings[index] = encoding
 
-    if not company_description:
-        raise Exception(ERROR.HTML_BLANK_COMPANY_DESCRIPTION.value)
+    if encoding_sink is None:
+        encoding_sink = collect_encodings
 
-    return company_description
+    cached_indices = set()
+    if embedding_cache is not None:
+        cached_encodings = [
+            (index, cached_encoding)
+            for index, cached_encoding in enumerate(
+                embedding_cache.get_many(descriptions)
+            )
+            if cached_encoding is not None
+        ]
+        if cached_encodings:
+            cached_indices = {index for index, _ in cached_encodings}
+            encoding_sink(
+                [index for index, _ in cached_encodings],
+                torch.from_numpy(
+                    np.stack(
+                        [cached_encoding for _, cached_encoding in cached_encodings]
+                    )
+                ),
+            )
+
+    order_by_length = sorted(
+        [index for index in range(len(descriptions)) if index not in cached_indices],
+        key=lambda index: -len(descriptions[index].split()),
+    )
+    if order_by_length:
+        with pipeline_metrics.stage("encode_descriptions") as timer:
+            timer.add_items(len(order_by_length))
+            encode_uncached_descriptions(
+                model,
+                descriptions,
+                order_by_length,
+                encoding_sink,
+                batch_size,
+                embedding_cache,
+            )
+    return None if encoding_sink is not collect_encodings else encodings
 
 
+def encode_uncached_descriptions(
+    model: SentenceTransformer,
+    descriptions: List[str],
+    order_by_length: List[int],
+    encoding_sink: Callable[[List[int], any], None],
+    batch_size: int,
+    embedding_cache: Optional[EmbeddingCache] = None,
+) -> None:
+    """Encode the descriptions at the given indices in batches, in that order, and hand every
+    batch of encodings to the sink with their indices. An encoder pool is given every description
+    at once, and splits them into the same batches across its workers.
+    """
+    if isinstance(model, EncoderPool):
+        ordered_descriptions = [descriptions[index] for index in order_by_length]
+        ordered_encodings = model.encode(
+            ordered_descriptions,
+            batch_size=batch_size,
+            convert_to_tensor=True,
+        )
+        if embedding_cache is not None:
+            embedding_cache.put_many(ordered_descriptions, ordered_encodings.numpy())
+
+        encoding_sink(order_by_length, ordered_encodings)
+        return
+
+    for batch_start in range(0, len(order_by_length), batch_size):
+        batch_indices = order_by_length[batch_start : batch_start + batch_size]
+        batch_descriptions = [descriptions[index] for index in batch_indices]
+        batch_encodings = model.encode(
+            batch_descriptions,
+            batch_size=batch_size,
+            convert_to_tensor=True,
+        )
+        if embedding_cache is not None:
+            batch_encodings = batch_encodings.cpu()
+            embedding_cache.put_many(batch_descriptions, batch_encodings.numpy())
+
+        encoding_sink(batch_indices, batch_encodings)
+
+
+@pipeline_metrics.timed(
+    "determine_themes",
+    lambda companies_with_themes, *args, **kwargs: len(companies_with_themes),
+)
 def determine_themes(
     logger: logging.Logger,
-    themes: Dict[str, any],
+    theme_matrix: ThemeMatrix,
     companies: Dict[str, any],
     topNThemes: int = 3,
+    score_chunk_size: int = BATCH.SCORE_CHUNK_SIZE.value,
+    company_artifact_writer: Optional[CompanyArtifactWriter] = None,
+    theme_index: Optional[IvfThemeIndex] = None,
 ) -> Dict[str, any]:
-    """Given the processed themes and companies, find the cosine similarity between every company
+    """Given the theme matrix and processed companies, find the cosine similarity between every company
     and every theme. Return a dictionary with all the processed company information and the top N
     themes (highest tensor values)
     """
+    companies_with_themes = score_companies(
+        theme_matrix.theme_names,
+        theme_matrix_tensor(theme_matrix),
+        companies,
+        topNThemes,
+        score_chunk_size,
+        company_artifact_writer,
+        theme_index,
+    )
+
+    logger.info(f"Done determining top {topNThemes} themes for every company.")
+    return companies_with_themes
+
+
+def theme_matrix_tensor(theme_matrix: ThemeMatrix) -> torch.Tensor:
+    """Return the normalized theme encodings as a tensor, one row per theme"""
+    import torch
+
+    return torch.from_numpy(theme_matrix.matrix)
+
+
+@pipeline_metrics.timed(
+    "score_companies",
+    lambda companies_with_themes, *args, **kwargs: len(companies_with_themes),
+)
+def score_companies(
+    theme_names: List[str],
+    theme_matrix: torch.Tensor,
+    companies: Dict[str, any],
+    topNThemes: int = 3,
+    score_chunk_size: int = BATCH.SCORE_CHUNK_SIZE.value,
+    company_artifact_writer: Optional[CompanyArtifactWriter] = None,
+    theme_index: Optional[IvfThemeIndex] = None,
+) -> Dict[str, any]:
+    """Score the companies against the theme matrix a chunk at a time, with a single matrix
+    multiplication per chunk, and return the companies with their top N themes. With an artifact
+    writer, the normalized encodings and all the theme scores of every chunk are written too.
+
+    Note: with a theme index, every company is only scored against the candidate themes the index
+    finds for it, and no full theme scores are written. The encodings of a company store are
+    scored straight from its array, a chunk of rows at a time.
+    """
+    import torch
+
     companies_with_themes = dict()
-    for company_ticker, company in companies.items():
-        theme_similarities = {}
-
-        for theme_name, theme in themes.items():
-            similarity = util.pytorch_cos_sim(
-                company["company_description_model_encoding"],
-                theme["theme_description_model_encoding"],
-            ).item()
-            theme_similarities[theme_name] = similarity
-
-        top_n_themes = [
-            theme_tuple[0]
-            for theme_tuple in sorted(theme_similarities.items(), key=lambda x: -x[1])[
-                :topNThemes
+    company_tickers = list(companies.keys())
+    for chunk_start in range(0, len(company_tickers), score_chunk_size):
+        chunk_of_tickers = company_tickers[chunk_start : chunk_start + score_chunk_size]
+        if isinstance(companies, CompanyStore):
+            chunk_encodings = torch.from_numpy(
+                companies.row_encodings(
+                    chunk_start, chunk_start + len(chunk_of_tickers)
+                )
+            )
+        else:
+            chunk_encodings = torch.stack(
+                [
+                    companies[company_ticker]["company_description_model_encoding"]
+                    for company_ticker in chunk_of_tickers
+                ]
+            )
+        company_matrix = torch.nn.functional.normalize(
+            chunk_encodings.float().to(theme_matrix.device), dim=1
+        )
+        if theme_index is None:
+            similarities = company_matrix @ theme_matrix.T
+            top_theme_indices = select_top_theme_indices(similarities, topNThemes)
+        else:
+            similarities = None
+            top_theme_indices = search_theme_index(
+                theme_index, theme_matrix, company_matrix, topNThemes
+            )
+        if company_artifact_writer is not None:
+            company_artifact_writer.append(
+                chunk_of_tickers,
+                company_matrix.cpu().numpy(),
+                None if similarities is None else similarities.cpu().numpy(),
+            )
+
+        for company_ticker, theme_indices in zip(
+            chunk_of_tickers, top_theme_indices.tolist()
+        ):
+            company = companies[company_ticker]
+            companies_with_themes[company_ticker] = {
+                "company_ticker": company_ticker,
+                "company_name": company["company_name"],
+                "company_top_themes": [theme_names[index] for index in theme_indices],
+                "company_description": company["company_description"],
+            }
+
+    return companies_with_themes
+
+
+def stream_companies_with_themes(
+    logger: logging.Logger,
+    theme_matrix: ThemeMatrix,
+    list_of_html_files: Iterable[str],
+    model: SentenceTransformer,
+    topNThemes: int = 3,
+    encode_batch_size: int = BATCH.ENCODE_BATCH_SIZE.value,
+    parse_window_size: int = BATCH.PARSE_WINDOW_SIZE.value,
+    score_chunk_size: int = BATCH.SCORE_CHUNK_SIZE.value,
+    parse_workers: int = CONCURRENCY.PARSE_WORKERS.value,
+    parse_timeout_seconds: float = CONCURRENCY.PARSE_TIMEOUT_SECONDS.value,
+    html_extractor: str = HTML_EXTRACTOR.FAST.value,
+    embedding_cache: Optional[EmbeddingCache] = None,
+    company_artifact_writer: Optional[CompanyArtifactWriter] = None,
+    theme_index: Optional[IvfThemeIndex] = None,
+    read_workers: int = CONCURRENCY.READ_WORKERS.value,
+    read_queue_depth: int = CONCURRENCY.READ_QUEUE_DEPTH.value,
+) -> Iterator[Dict[str, any]]:
+    """Parse, encode and score the files a window at a time, and yield the companies of every window
+    with their top N themes. Only one window of encodings is held in memory at a time.
+
+    Note: a window is written before later windows are parsed, so unlike a full run, where the last
+    file with a ticker is kept, the first file with a ticker is kept and every later file with the
+    same ticker is logged and skipped, within a window as across windows.
+    """
+    theme_names = theme_matrix.theme_names
+    theme_encodings = theme_matrix_tensor(theme_matrix)
+
+    for companies in iterate_company_windows(
+        logger,
+        list_of_html_files,
+        model,
+        encode_batch_size,
+        parse_window_size,
+        parse_workers,
+        parse_timeout_seconds,
+        html_extractor,
+        embedding_cache,
+        read_workers,
+        read_queue_depth,
+        written_tickers=set(),
+    ):
+        yield score_companies(
+            theme_names,
+            theme_encodings,
+            companies,
+            topNThemes,
+            score_chunk_size,
+            company_artifact_writer,
+            theme_index,
+        )
+
+
+def select_top_theme_indices(similarities: torch.Tensor, top_n: int) -> torch.Tensor:
+    """Return the column indices of the top N similarities of every row, highest first. Tied
+    similarities keep the order of the themes file, the same as a stable sort would.
+    """
+    import torch
+
+    top_n = min(max(top_n, 0), similarities.shape[1])
+    if top_n == 0:
+        return torch.empty((similarities.shape[0], 0), dtype=torch.long)
+
+    top_values, top_indices = torch.topk(similarities, top_n, dim=1)
+    top_values, top_indices = sort_top_themes(top_values, top_indices)
+
+    # Rows with more tied values at the cut-off than were picked fall back to a full stable sort.
+    cutoff_values = top_values[:, -1:]
+    tied_at_cutoff = (similarities == cutoff_values).sum(dim=1) != (
+        top_values == cutoff_values
+    ).sum(dim=1)
+    if tied_at_cutoff.any():
+        tied_rows = tied_at_cutoff.nonzero().squeeze(1)
+        top_indices[tied_rows] = torch.sort(
+            similarities[tied_rows], dim=1, descending=True, stable=True
+        ).indices[:, :top_n]
+
+    return top_indices
+
+
+def build_theme_index(
+    logger: logging.Logger,
+    theme_matrix: ThemeMatrix,
+    list_count: Optional[int] = None,
+    probe_count: int = ANN.IVF_PROBES.value,
+) -> IvfThemeIndex:
+    """Cluster the theme encodings into an inverted file index for approximate top theme search"""
+    from utils.theme_index import IvfThemeIndex
+
+    theme_index = IvfThemeIndex(
+        theme_matrix_tensor(theme_matrix),
+        list_count,
+        probe_count,
+        ANN.KMEANS_ITERATIONS.value,
+        ANN.RECALL_SAMPLE_SIZE.value,
+    )
+    logger.info(
+        f"Done building theme index. lists: {theme_index.list_count}, probed lists: "
+        f"{theme_index.probe_count}, largest list: {theme_index.max_list_size} themes"
+    )
+    return theme_index
+
+
+def search_theme_index(
+    theme_index: IvfThemeIndex,
+    theme_matrix: torch.Tensor,
+    company_matrix: torch.Tensor,
+    top_n: int,
+) -> torch.Tensor:
+    """Return the column indices of the approximate top N themes of every normalized company
+    encoding, highest first. Companies with fewer than N candidate themes are scored exactly. The
+    first companies, up to the recall sample size of the index, are also scored exactly to
+    measure its recall.
+
+    Note: unlike exact scoring, candidates tied at the cut-off are not guaranteed to be picked in
+    theme order.
+    """
+    import torch
+
+    candidate_themes, candidate_scores = theme_index.candidates(company_matrix)
+    if candidate_themes.shape[1] < top_n:
+        return select_top_theme_indices(company_matrix @ theme_matrix.T, top_n)
+
+    top_values, top_positions = torch.topk(candidate_scores, top_n, dim=1)
+    top_values, top_theme_indices = sort_top_themes(
+        top_values, torch.gather(candidate_themes, 1, top_positions)
+    )
+    short_rows = torch.isinf(top_values).any(dim=1)
+    if short_rows.any():
+        top_theme_indices[short_rows] = select_top_theme_indices(
+            company_matrix[short_rows] @ theme_matrix.T, top_n
+        )
+
+    sample_size = min(theme_index.remaining_recall_sample_size, company_matrix.shape[0])
+    if sample_size > 0 and top_n > 0:
+        theme_index.record_recall(
+            select_top_theme_indices(
+                company_matrix[:sample_size] @ theme_matrix.T, top_n
+            ).tolist(),
+            top_theme_indices[:sample_size].tolist(),
+        )
+    return top_theme_indices
+
+
+def check_encoder_parity(
+    logger: logging.Logger,
+    encoder_backend: str,
+    topNThemes: int = 3,
+    encode_batch_size: int = BATCH.ENCODE_BATCH_SIZE.value,
+    parse_window_size: int = BATCH.PARSE_WINDOW_SIZE.value,
+    parse_workers: int = CONCURRENCY.PARSE_WORKERS.value,
+    parse_timeout_seconds: float = CONCURRENCY.PARSE_TIMEOUT_SECONDS.value,
+    html_extractor: str = HTML_EXTRACTOR.FAST.value,
+) -> Dict[str, float]:
+    """Find the top N themes of the input companies with the fp32 torch backend and with the given
+    backend, and return how often they agree. The embedding cache is not used, so that every
+    description is encoded by both backends.
+    """
+    parsed_companies = []
+    list_of_html_files = list_company_html_files()
+    with create_parse_pool(parse_workers) as parse_pool:
+        for window_start in range(0, len(list_of_html_files), parse_window_size):
+            parsed_companies.extend(
+                parse_window_of_companies(
+                    logger,
+                    list_of_html_files[window_start : window_start + parse_window_size],
+                    parse_pool,
+                    parse_timeout_seconds,
+                    html_extractor,
+                )
+            )
+
+    top_themes_by_backend = dict()
+    for backend in [ENCODER_BACKEND.TORCH.value, encoder_backend]:
+        model = LazySentenceTransformer(MODEL_NAME, logger, backend)
+        theme_matrix = parse_themes(
+            logger,
+            model,
+            encode_batch_size=encode_batch_size,
+            model_name=encoder_model_name(MODEL_NAME, backend),
+        )
+
+        start_time = time.perf_counter()
+        company_description_model_encodings = encode_descriptions(
+            model,
+            [
+                company_description
+                for _, (_, _, company_description) in parsed_companies
+            ],
+            encode_batch_size,
+        )
+        logger.info(
+            f"Done encoding {len(parsed_companies)} descriptions with the {backend} backend in "
+            f"{time.perf_counter() - start_time:.2f}s"
+        )
+
+        companies = {
+            company_ticker: {
+                "company_name": company_name,
+                "company_description": company_description,
+                "company_description_model_encoding": company_description_model_encoding,
+            }
+            for (
+                _,
+                (company_name, company_ticker, company_description),
+            ), company_description_model_encoding in zip(
+                parsed_companies, company_description_model_encodings
+            )
+        }
+        top_themes_by_backend[backend] = {
+            company_ticker: company["company_top_themes"]
+            for company_ticker, company in score_companies(
+                theme_matrix.theme_names,
+                theme_matrix_tensor(theme_matrix),
+                companies,
+                topNThemes,
+            ).items()
+        }
+
+    agreement = top_theme_agreement(
+        top_themes_by_backend[ENCODER_BACKEND.TORCH.value],
+        top_themes_by_backend[encoder_backend],
+    )
+    logger.info(
+        f"Done checking the {encoder_backend} backend against {ENCODER_BACKEND.TORCH.value} on "
+        f"{len(top_themes_by_backend[encoder_backend])} companies. Identical top {topNThemes}: "
+        f"{agreement['identical_top_themes']:.2%}, same top {topNThemes} in any order: "
+        f"{agreement['same_top_themes']:.2%}, mean overlap: {agreement['mean_overlap']:.2%}"
+    )
+    return agreement
+
+
+def top_theme_agreement(
+    baseline_top_themes: Dict[str, List[str]],
+    candidate_top_themes: Dict[str, List[str]],
+) -> Dict[str, float]:
+    """Compare the top themes of every company with a baseline. Return the fraction of companies with
+    identical top themes, with the same top themes in any order, and the mean fraction of
+    baseline top themes that the candidate also picked.
+    """
+    company_tickers = list(baseline_top_themes.keys())
+    if not company_tickers:
+        return {
+            "identical_top_themes": 1.0,
+            "same_top_themes": 1.0,
+            "mean_overlap": 1.0,
+        }
+
+    identical_count = 0
+    same_count = 0
+    overlap_sum = 0.0
+    for company_ticker in company_tickers:
+        baseline = baseline_top_themes[company_ticker]
+        candidate = candidate_top_themes.get(company_ticker, [])
+        identical_count += baseline == candidate
+        same_count += set(baseline) == set(candidate)
+        overlap_sum += (
+            len(set(baseline).intersection(candidate)) / len(baseline)
+            if baseline
+            else 1.0
+        )
+
+    return {
+        "identical_top_themes": identical_count / len(company_tickers),
+        "same_top_themes": same_count / len(company_tickers),
+        "mean_overlap": overlap_sum / len(company_tickers),
+    }
+
+
+def sort_top_themes(
+    top_values: torch.Tensor, top_indices: torch.Tensor
+) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Sort the picks of topk by similarity, highest first, and tied similarities by theme index.
+
+    Note: topk does not define which of several tied values it returns, nor their order. The picks
+    are put in theme order, then stable sorted by similarity.
+    """
+    import torch
+
+    top_indices, order = torch.sort(top_indices, dim=1)
+    top_values = torch.gather(top_values, 1, order)
+    top_values, order = torch.sort(top_values, dim=1, descending=True, stable=True)
+    return top_values, torch.gather(top_indices, 1, order)
+
+
+@pipeline_metrics.timed(
+    "update_companies_incrementally",
+    lambda companies_with_themes, *args, **kwargs: len(companies_with_themes),
+)
+def update_companies_incrementally(
+    logger: logging.Logger,
+    theme_matrix: ThemeMatrix,
+    model: SentenceTransformer,
+    manifest: InputManifest,
+    topNThemes: int = 3,
+    encode_batch_size: int = BATCH.ENCODE_BATCH_SIZE.value,
+    parse_window_size: int = BATCH.PARSE_WINDOW_SIZE.value,
+    score_chunk_size: int = BATCH.SCORE_CHUNK_SIZE.value,
+    parse_workers: int = CONCURRENCY.PARSE_WORKERS.value,
+    parse_timeout_seconds: float = CONCURRENCY.PARSE_TIMEOUT_SECONDS.value,
+    html_extractor: str = HTML_EXTRACTOR.FAST.value,
+    embedding_cache: Optional[EmbeddingCache] = None,
+    company_artifact_writer: Optional[CompanyArtifactWriter] = None,
+    theme_index: Optional[IvfThemeIndex] = None,
+    read_workers: int = CONCURRENCY.READ_WORKERS.value,
+    read_queue_depth: int = CONCURRENCY.READ_QUEUE_DEPTH.value,
+) -> Dict[str, any]:
+    """Merge the added or changed company files into the processed data of the last run, and drop
+    the companies of deleted files. Return all the companies with their top N themes.
+
+    Note: when the themes file changed, the unchanged companies are rescored with their stored
+    encodings, from the embedding cache or the company artifacts of the last run, rather than
+    being parsed and encoded again. If some company has no stored encoding, every company file is
+    processed again, as in a full run. With an artifact writer, the rows of companies that were not
+    scored again are copied from the previous artifacts.
+    """
+    output_file = f"{PATH.OUTPUT_DIRECTORY.value}/output.jsonl"
+    previous_company_artifacts = load_previous_company_artifacts(
+        (
+            company_artifact_writer.directory
+            if company_artifact_writer is not None
+            else PATH.OUTPUT_DIRECTORY.value
+        ),
+        theme_matrix.model_name,
+        output_file,
+    )
+    companies_with_themes = (
+        read_processed_data_jsonl(output_file)
+        if manifest.exists and path.exists(output_file)
+        else dict()
+    )
+
+    html_files = list_company_html_files()
+    changed_files, stale_tickers, deleted_file_count = manifest.refresh(
+        PATH.INPUT_COMPANIES_DIRECTORY.value, html_files
+    )
+    for company_ticker in stale_tickers:
+        companies_with_themes.pop(company_ticker, None)
+
+    theme_names = theme_matrix.theme_names
+    theme_encodings = theme_matrix_tensor(theme_matrix)
+    if theme_matrix.themes_hash != manifest.themes_hash and companies_with_themes:
+        rescored_companies = rescore_companies(
+            theme_matrix,
+            companies_with_themes,
+            topNThemes,
+            score_chunk_size,
+            embedding_cache,
+            previous_company_artifacts,
+            company_artifact_writer,
+            theme_index,
+        )
+        if rescored_companies is None:
+            logger.warning(ERROR.NO_STORED_ENCODINGS.value)
+            manifest.forget_companies()
+            companies_with_themes = dict()
+            changed_files = html_files
+        else:
+            companies_with_themes = rescored_companies
+            logger.info(
+                f"Themes changed. Rescored {len(companies_with_themes)} unchanged companies."
+            )
+    manifest.themes_hash = theme_matrix.themes_hash
+
+    file_tickers = dict()
+    changed_companies = process_list_of_companies(
+        logger,
+        changed_files,
+        model,
+        encode_batch_size=encode_batch_size,
+        parse_window_size=parse_window_size,
+        parse_workers=parse_workers,
+        parse_timeout_seconds=parse_timeout_seconds,
+        html_extractor=html_extractor,
+        embedding_cache=embedding_cache,
+        read_workers=read_workers,
+        read_queue_depth=read_queue_depth,
+        file_tickers=file_tickers,
+    )
+    changed_companies = record_processed_files(
+        manifest, changed_companies, file_tickers, html_files
+    )
+    companies_with_themes.update(
+        score_companies(
+            theme_names,
+            theme_encodings,
+            changed_companies,
+            topNThemes,
+            score_chunk_size,
+            company_artifact_writer,
+            theme_index,
+        )
+    )
+    if company_artifact_writer is not None:
+        write_unscored_company_artifacts(
+            theme_matrix,
+            companies_with_themes,
+            model,
+            company_artifact_writer,
+            previous_company_artifacts,
+            encode_batch_size,
+            score_chunk_size,
+            embedding_cache,
+            theme_index,
+        )
+
+    logger.info(
+        f"Done updating companies incrementally. Added or changed files: {len(changed_files)}, "
+        f"deleted files: {deleted_file_count}, companies: {len(companies_with_themes)}"
+    )
+    return companies_with_themes
+
+
+def record_processed_files(
+    manifest: InputManifest,
+    companies: Dict[str, any],
+    file_tickers: Dict[str, str],
+    html_files: List[str],
+) -> Dict[str, any]:
+    """Record the ticker of every processed file in the manifest. Return the processed companies,
+    without those whose ticker a later file in html_files also produces, as a full run keeps the
+    company of the last file.
+    """
+    for html_file, company_ticker in file_tickers.items():
+        manifest.record_company(html_file, company_ticker)
+    file_order = {html_file: index for index, html_file in enumerate(html_files)}
+    return {
+        company_ticker: company
+        for company_ticker, company in companies.items()
+        if manifest.source_file(company_ticker, file_order)
+        == company["company_html_file"]
+    }
+
+
+def rescore_companies(
+    theme_matrix: ThemeMatrix,
+    companies_with_themes: Dict[str, any],
+    topNThemes: int = 3,
+    score_chunk_size: int = BATCH.SCORE_CHUNK_SIZE.value,
+    embedding_cache: Optional[EmbeddingCache] = None,
+    company_artifacts: Optional[CompanyArtifacts] = None,
+    company_artifact_writer: Optional[CompanyArtifactWriter] = None,
+    theme_index: Optional[IvfThemeIndex] = None,
+) -> Optional[Dict[str, any]]:
+    """Score processed companies again against changed themes with their stored encodings, without
+    encoding anything, and return them with their new top N themes. Return None if some company
+    has no stored encoding.
+    """
+    import torch
+
+    stored_encodings = load_stored_encodings(
+        companies_with_themes, embedding_cache, company_artifacts
+    )
+    if any(encoding is None for encoding in stored_encodings):
+        return None
+    companies = {
+        company_ticker: {
+            **company,
+            "company_description_model_encoding": torch.from_numpy(stored_encoding),
+        }
+        for (company_ticker, company), stored_encoding in zip(
+            companies_with_themes.items(), stored_encodings
+        )
+    }
+    return score_companies(
+        theme_matrix.theme_names,
+        theme_matrix_tensor(theme_matrix),
+        companies,
+        topNThemes,
+        score_chunk_size,
+        company_artifact_writer,
+        theme_index,
+    )
+
+
+def load_stored_encodings(
+    companies_with_themes: Dict[str, any],
+    embedding_cache: Optional[EmbeddingCache] = None,
+    company_artifacts: Optional[CompanyArtifacts] = None,
+) -> List[Optional[np.ndarray]]:
+    """Return the stored encoding of every processed company, from the embedding cache, or else the
+    normalized one from the company artifacts of the last run. None where neither has it.
+    """
+    stored_encodings = (
+        embedding_cache.get_many(
+            [
+                company["company_description"]
+                for company in companies_with_themes.values()
+            ]
+        )
+        if embedding_cache is not None
+        else [None] * len(companies_with_themes)
+    )
+    if company_artifacts is not None:
+        for index, company_ticker in enumerate(companies_with_themes.keys()):
+            if (
+                stored_encodings[index] is None
+                and company_ticker in company_artifacts.rows
+            ):
+                stored_encodings[index] = np.array(
+                    company_artifacts.embedding(company_ticker)
+                )
+    return stored_encodings
+
+
+def load_previous_company_artifacts(
+    directory: str, model_name: str, output_file: str
+) -> Optional[CompanyArtifacts]:
+    """Open the company artifacts of the last run, if they were built with the model and are at
+    least as new as the output file, so that they hold the companies it lists
+    """
+    company_artifacts = CompanyArtifacts.load(directory)
+    if company_artifacts is None or company_artifacts.model_name != model_name:
+        return None
+    if path.exists(output_file) and company_artifacts.saved_time < path.getmtime(
+        output_file
+    ):
+        return None
+    return company_artifacts
+
+
+def write_unscored_company_artifacts(
+    theme_matrix: ThemeMatrix,
+    companies_with_themes: Dict[str, any],
+    model: SentenceTransformer,
+    company_artifact_writer: CompanyArtifactWriter,
+    previous_company_artifacts: Optional[CompanyArtifacts] = None,
+    encode_batch_size: int = BATCH.ENCODE_BATCH_SIZE.value,
+    score_chunk_size: int = BATCH.SCORE_CHUNK_SIZE.value,
+    embedding_cache: Optional[EmbeddingCache] = None,
+    theme_index: Optional[IvfThemeIndex] = None,
+) -> None:
+    """Write the artifact rows of the companies that were not scored in this run. Rows are copied
+    from the previous artifacts when they were built with the same model and themes, and have
+    theme scores if they are needed. Otherwise the
+    descriptions are encoded, from the embedding cache where possible, and scored again.
+    """
+    unscored_tickers = [
+        company_ticker
+        for company_ticker in companies_with_themes.keys()
+        if company_ticker not in company_artifact_writer.rows
+    ]
+    if (
+        previous_company_artifacts is not None
+        and previous_company_artifacts.model_name == company_artifact_writer.model_name
+        and previous_company_artifacts.theme_names == theme_matrix.theme_names
+        and (
+            previous_company_artifacts.scores is not None
+            or not company_artifact_writer.has_scores
+        )
+    ):
+        copied_tickers = [
+            company_ticker
+            for company_ticker in unscored_tickers
+            if company_ticker in previous_company_artifacts.rows
+        ]
+        for chunk_start in range(0, len(copied_tickers), score_chunk_size):
+            chunk_of_tickers = copied_tickers[
+                chunk_start : chunk_start + score_chunk_size
+            ]
+            previous_rows = [
+                previous_company_artifacts.rows[company_ticker]
+                for company_ticker in chunk_of_tickers
             ]
+            company_artifact_writer.append(
+                chunk_of_tickers,
+                previous_company_artifacts.embeddings[previous_rows],
+                (
+                    previous_company_artifacts.scores[previous_rows]
+                    if company_artifact_writer.has_scores
+                    else None
+                ),
+            )
+        unscored_tickers = [
+            company_ticker
+            for company_ticker in unscored_tickers
+            if company_ticker not in company_artifact_writer.rows
         ]
 
-        companies_with_themes[company_ticker] = {
-            "company_ticker": company_ticker,
-            "company_name": company["company_name"],
-            "company_top_themes": top_n_themes,
-            "company_description": company["company_description"],
-        }
+    company_description_model_encodings = encode_descriptions(
+        model,
+        [
+            companies_with_themes[company_ticker]["company_description"]
+            for company_ticker in unscored_tickers
+        ],
+        encode_batch_size,
+        embedding_cache,
+    )
+    score_companies(
+        theme_matrix.theme_names,
+        theme_matrix_tensor(theme_matrix),
+        {
+            company_ticker: {
+                **companies_with_themes[company_ticker],
+                "company_description_model_encoding": company_description_model_encoding,
+            }
+            for company_ticker, company_description_model_encoding in zip(
+                unscored_tickers, company_description_model_encodings
+            )
+        },
+        score_chunk_size=score_chunk_size,
+        company_artifact_writer=company_artifact_writer,
+        theme_index=theme_index,
+    )
 
-    logger.info(f"Done determining top {topNThemes} themes for every company.")
+
+def watch_inputs(
+    logger: logging.Logger,
+    model: SentenceTransformer,
+    manifest: InputManifest,
+    model_name: str = MODEL_NAME,
+    topNThemes: int = 3,
+    watch_interval_seconds: float = WATCH.INTERVAL_SECONDS.value,
+    watch_batch_size: int = WATCH.BATCH_SIZE.value,
+    encode_batch_size: int = BATCH.ENCODE_BATCH_SIZE.value,
+    parse_window_size: int = BATCH.PARSE_WINDOW_SIZE.value,
+    score_chunk_size: int = BATCH.SCORE_CHUNK_SIZE.value,
+    parse_workers: int = CONCURRENCY.PARSE_WORKERS.value,
+    parse_timeout_seconds: float = CONCURRENCY.PARSE_TIMEOUT_SECONDS.value,
+    html_extractor: str = HTML_EXTRACTOR.FAST.value,
+    read_workers: int = CONCURRENCY.READ_WORKERS.value,
+    read_queue_depth: int = CONCURRENCY.READ_QUEUE_DEPTH.value,
+    embedding_cache: Optional[EmbeddingCache] = None,
+    theme_search: str = THEME_SEARCH.EXACT.value,
+    ivf_lists: Optional[int] = None,
+    ivf_probes: int = ANN.IVF_PROBES.value,
+    load_database: bool = False,
+    poll_count: Optional[int] = None,
+) -> Dict[str, any]:
+    """Keep the outputs up to date with the inputs, with the model loaded once, until interrupted or
+    until poll_count polls were made and every detected file was classified. Return the companies
+    with their top N themes.
+
+    Every watch_interval_seconds, the themes file and the company files are polled by their size
+    and mtime, and only files that changed are hashed, as in an incremental run. Added or changed
+    files are queued and classified in micro-batches of watch_batch_size files. The companies of a
+    micro-batch are appended to output.jsonl when they are all new, and the file is rewritten
+    otherwise, e.g. when a file changed or was deleted, or the themes changed. With load_database,
+    the companies of every micro-batch are upserted into the database. The manifest is saved
+    whenever the queue is empty, so a stopped daemon classifies the files it had queued again.
+
+    Note: company artifacts and the columnar output are not written in watch mode.
+    """
+    output_file = f"{PATH.OUTPUT_DIRECTORY.value}/output.jsonl"
+    companies_with_themes = (
+        read_processed_data_jsonl(output_file)
+        if manifest.exists and path.exists(output_file)
+        else dict()
+    )
+    # Added or changed files waiting to be classified, with the time they were detected
+    queued_files: Dict[str, float] = dict()
+    themes_signature = None
+    theme_matrix = theme_encodings = theme_index = None
+    removed_tickers = set()
+    html_files = []
+    rewrite_output = reload_database = True
+    poll_number = 0
+    next_poll_time = time.monotonic()
+
+    # Stop on SIGTERM as on Ctrl-C, between two steps of the loop
+    previous_sigterm_handler = signal.signal(signal.SIGTERM, signal.default_int_handler)
+    logger.info(
+        f"Watching {PATH.INPUT_COMPANIES_DIRECTORY.value} and {PATH.INPUT_THEME_FILE.value} "
+        f"every {watch_interval_seconds}s."
+    )
+    try:
+        while poll_count is None or poll_number < poll_count or queued_files:
+            if not queued_files:
+                time.sleep(max(0.0, next_poll_time - time.monotonic()))
+            if (
+                poll_count is None or poll_number < poll_count
+            ) and time.monotonic() >= next_poll_time:
+                poll_number += 1
+                next_poll_time = time.monotonic() + watch_interval_seconds
+                is_changed = False
+
+                signature = themes_file_signature()
+                if signature != themes_signature:
+                    themes_signature = signature
+                    theme_matrix, theme_index = load_watched_themes(
+                        logger,
+                        model,
+                        embedding_cache,
+                        encode_batch_size,
+                        model_name,
+                        theme_search,
+                        ivf_lists,
+                        ivf_probes,
+                    )
+                    theme_encodings = theme_matrix_tensor(theme_matrix)
+                    if theme_matrix.themes_hash != manifest.themes_hash:
+                        if companies_with_themes:
+                            rescored_companies = rescore_companies(
+                                theme_matrix,
+                                companies_with_themes,
+                                topNThemes,
+                                score_chunk_size,
+                                embedding_cache,
+                                theme_index=theme_index,
+                            )
+                            if rescored_companies is None:
+                                logger.warning(ERROR.NO_STORED_ENCODINGS.value)
+                                manifest.forget_companies()
+                                removed_tickers.update(companies_with_themes)
+                                companies_with_themes = dict()
+                                detected_time = time.monotonic()
+                                html_files = list_company_html_files()
+                                for html_file in html_files:
+                                    queued_files.setdefault(html_file, detected_time)
+                            else:
+                                companies_with_themes = rescored_companies
+                                logger.info(
+                                    f"Themes changed. Rescored {len(companies_with_themes)} "
+                                    "companies."
+                                )
+                        manifest.themes_hash = theme_matrix.themes_hash
+                        rewrite_output = reload_database = is_changed = True
+
+                html_files = list_company_html_files()
+                changed_files, stale_tickers, deleted_file_count = manifest.refresh(
+                    PATH.INPUT_COMPANIES_DIRECTORY.value, html_files
+                )
+                for company_ticker in stale_tickers:
+                    companies_with_themes.pop(company_ticker, None)
+                    removed_tickers.add(company_ticker)
+                detected_time = time.monotonic()
+                for html_file in changed_files:
+                    queued_files.setdefault(html_file, detected_time)
+                if changed_files or deleted_file_count:
+                    logger.info(
+                        f"Detected added or changed files: {len(changed_files)}, deleted files: "
+                        f"{deleted_file_count}. Queue depth: {len(queued_files)}"
+                    )
+                if stale_tickers:
+                    rewrite_output = is_changed = True
+
+                # Changes that leave nothing to classify are saved straight away
+                if is_changed and not queued_files:
+                    save_watched_companies(
+                        logger,
+                        companies_with_themes,
+                        dict(),
+                        removed_tickers,
+                        rewrite_output,
+                        load_database and reload_database,
+                        load_database,
+                    )
+                    removed_tickers = set()
+                    rewrite_output = reload_database = False
+                    manifest.save()
+                continue
+
+            if not queued_files:
+                continue
+            batch_files = list(islice(queued_files, watch_batch_size))
+            detected_time = min(
+                queued_files.pop(html_file) for html_file in batch_files
+            )
+            # Files deleted since they were queued are skipped
+            batch_files = [
+                html_file for html_file in batch_files if html_file in manifest.files
+            ]
+            file_tickers = dict()
+            batch_companies = process_list_of_companies(
+                logger,
+                batch_files,
+                model,
+                encode_batch_size=encode_batch_size,
+                parse_window_size=parse_window_size,
+                parse_workers=parse_workers,
+                parse_timeout_seconds=parse_timeout_seconds,
+                html_extractor=html_extractor,
+                embedding_cache=embedding_cache,
+                read_workers=read_workers,
+                read_queue_depth=read_queue_depth,
+                file_tickers=file_tickers,
+            )
+            batch_companies = record_processed_files(
+                manifest, batch_companies, file_tickers, html_files
+            )
+            batch_companies_with_themes = score_companies(
+                theme_matrix.theme_names,
+                theme_encodings,
+                batch_companies,
+                topNThemes,
+                score_chunk_size,
+                theme_index=theme_index,
+            )
+            if any(
+                company_ticker in companies_with_themes
+                for company_ticker in batch_companies_with_themes
+            ):
+                rewrite_output = True
+            companies_with_themes.update(batch_companies_with_themes)
+            removed_tickers.difference_update(batch_companies_with_themes)
+
+            save_watched_companies(
+                logger,
+                companies_with_themes,
+                batch_companies_with_themes,
+                removed_tickers,
+                rewrite_output,
+                load_database and reload_database,
+                load_database,
+            )
+            removed_tickers = set()
+            rewrite_output = reload_database = False
+            if not queued_files:
+                manifest.save()
+            logger.info(
+                f"Done classifying a micro-batch of {len(batch_files)} company files. Queue "
+                f"depth: {len(queued_files)}, latency: "
+                f"{time.monotonic() - detected_time:.2f}s, companies: "
+                f"{len(companies_with_themes)}"
+            )
+    except KeyboardInterrupt:
+        logger.info(
+            f"Stopped watching inputs. Queue depth: {len(queued_files)}, companies: "
+            f"{len(companies_with_themes)}"
+        )
+    finally:
+        signal.signal(signal.SIGTERM, previous_sigterm_handler)
     return companies_with_themes
 
 
+def themes_file_signature() -> Optional[Tuple[int, int]]:
+    """Return the size and mtime of the themes file, or None if it does not exist"""
+    if not path.exists(PATH.INPUT_THEME_FILE.value):
+        return None
+    file_stat = stat(PATH.INPUT_THEME_FILE.value)
+    return file_stat.st_size, file_stat.st_mtime_ns
+
+
+def load_watched_themes(
+    logger: logging.Logger,
+    model: SentenceTransformer,
+    embedding_cache: Optional[EmbeddingCache] = None,
+    encode_batch_size: int = BATCH.ENCODE_BATCH_SIZE.value,
+    model_name: str = MODEL_NAME,
+    theme_search: str = THEME_SEARCH.EXACT.value,
+    ivf_lists: Optional[int] = None,
+    ivf_probes: int = ANN.IVF_PROBES.value,
+) -> Tuple[ThemeMatrix, Optional[IvfThemeIndex]]:
+    """Parse the themes file, save the theme names and matrix, and return the matrix with the
+    theme index, if any
+    """
+    theme_matrix = parse_themes(
+        logger,
+        model,
+        embedding_cache,
+        encode_batch_size=encode_batch_size,
+        model_name=model_name,
+    )
+    save_theme_names(
+        logger, theme_matrix.theme_names, PATH.OUTPUT_THEME_NAMES_FILE.value
+    )
+    save_theme_matrix(logger, theme_matrix, PATH.OUTPUT_THEME_MATRIX_FILE.value)
+    theme_index = (
+        build_theme_index(logger, theme_matrix, ivf_lists, ivf_probes)
+        if theme_search == THEME_SEARCH.IVF.value
+        else None
+    )
+    return theme_matrix, theme_index
+
+
+def save_watched_companies(
+    logger: logging.Logger,
+    companies_with_themes: Dict[str, any],
+    new_companies_with_themes: Dict[str, any],
+    removed_tickers: Iterable[str],
+    rewrite_output: bool,
+    reload_database: bool = False,
+    load_database: bool = False,
+) -> None:
+    """Append the new companies to output.jsonl, or rewrite it with all the companies, and update
+    the database with the new and removed companies, or reload it from output.jsonl
+    """
+    output_file = f"{PATH.OUTPUT_DIRECTORY.value}/output.jsonl"
+    if rewrite_output:
+        save_processed_data_jsonl(logger, companies_with_themes, output_file)
+    else:
+        with jsonlines.open(output_file, "a") as writer:
+            writer.write_all(new_companies_with_themes.values())
+    if not load_database:
+        return
+
+    from db.database import bulk_load_companies, upsert_companies
+
+    if reload_database:
+        bulk_load_companies(output_file)
+    else:
+        upsert_companies(
+            new_companies_with_themes.values(), removed_tickers, output_file
+        )
+
+
+def read_processed_data_jsonl(file_path: str) -> Dict[str, any]:
+    """Reads the processed companies of an earlier run, keyed by ticker"""
+    with jsonlines.open(file_path, "r") as reader:
+        return {line["company_ticker"]: line for line in reader}
+
+
+@pipeline_metrics.timed(
+    "save_processed_data_jsonl",
+    lambda result, logger, companies_with_themes, *args, **kwargs: len(
+        companies_with_themes
+    ),
+)
 def save_processed_data_jsonl(
-    logger: logging.Logger, companies_with_themes: Dict[str, any]
+    logger: logging.Logger,
+    companies_with_themes: Dict[str, any],
+    file_path: str = f"{PATH.OUTPUT_DIRECTORY.value}/output.jsonl",
 ) -> None:
     """Saves the processed companies with their top themes as a jsonl file"""
     json_lines = companies_with_themes.values()
-    with jsonlines.open(f"{PATH.OUTPUT_DIRECTORY.value}/output.jsonl", "w") as writer:
+    with jsonlines.open(file_path, "w") as writer:
         writer.write_all(json_lines)
     logger.info("Done saving processed company data.")
 
 
-def save_theme_names(logger: logging.Logger, d: Dict[str, any], file_path: str) -> None:
-    """Saves the processed themes as a file with theme_name for every line"""
-    content = "\n".join(list(d.keys()))
+@pipeline_metrics.timed(
+    "save_processed_data_jsonl_stream",
+    lambda company_count, *args, **kwargs: company_count,
+)
+def save_processed_data_jsonl_stream(
+    logger: logging.Logger,
+    windows_of_companies_with_themes: Iterator[Dict[str, any]],
+    columnar_output_writer: Optional[ColumnarOutputWriter] = None,
+) -> int:
+    """Saves the processed companies with their top themes as a jsonl file, appending and flushing
+    every window as soon as it is processed. Every window is also appended to the columnar output
+    writer, if any. Returns the number of companies saved.
+    """
+    company_count = 0
+    with jsonlines.open(
+        f"{PATH.OUTPUT_DIRECTORY.value}/output.jsonl", "w", flush=True
+    ) as writer:
+        for companies_with_themes in windows_of_companies_with_themes:
+            writer.write_all(companies_with_themes.values())
+            if columnar_output_writer is not None:
+                columnar_output_writer.append(companies_with_themes)
+            company_count += len(companies_with_themes)
+    logger.info(f"Done streaming {company_count} processed companies.")
+    return company_count
+
+
+@pipeline_metrics.timed(
+    "save_columnar_output",
+    lambda file_path, logger, columnar_output_writer: columnar_output_writer.row_count,
+)
+def save_columnar_output(
+    logger: logging.Logger, columnar_output_writer: ColumnarOutputWriter
+) -> str:
+    """Writes the columnar output of the processed companies next to output.jsonl"""
+    file_path = columnar_output_writer.close()
+    logger.info(
+        f"Done saving {columnar_output_writer.row_count} processed companies in columns into: "
+        f"{file_path}"
+    )
+    return file_path
+
+
+@pipeline_metrics.timed("save_embedding_cache")
+def save_embedding_cache(
+    logger: logging.Logger, embedding_cache: EmbeddingCache
+) -> None:
+    """Saves the embedding cache index and logs how well the cache was used in this run"""
+    embedding_cache.save()
+    logger.info(
+        f"Done saving embedding cache. hits: {embedding_cache.hits}, misses: {embedding_cache.misses}, "
+        f"evicted: {embedding_cache.evicted}, entries: {len(embedding_cache.rows)}"
+    )
+
+
+def log_theme_index_recall(logger: logging.Logger, theme_index: IvfThemeIndex) -> None:
+    """Logs the recall of the theme index against exact scoring on the sampled companies"""
+    if theme_index.recall is None:
+        return
+    logger.info(
+        f"Theme index recall of the exact top themes on a sample of "
+        f"{theme_index.sampled_company_count} companies: {theme_index.recall:.2%}"
+    )
+
+
+@pipeline_metrics.timed(
+    "save_company_artifacts",
+    lambda result, logger, company_artifact_writer: len(company_artifact_writer.rows),
+)
+def save_company_artifacts(
+    logger: logging.Logger, company_artifact_writer: CompanyArtifactWriter
+) -> None:
+    """Saves the memory-mapped company encodings, theme scores and ticker index"""
+    company_artifact_writer.close()
+    saved_matrices = (
+        "embeddings and theme scores"
+        if company_artifact_writer.has_scores
+        else "embeddings"
+    )
+    logger.info(
+        f"Done saving {saved_matrices} of {len(company_artifact_writer.rows)} "
+        f"companies into: {company_artifact_writer.directory}"
+    )
+
+
+@pipeline_metrics.timed(
+    "save_theme_names",
+    lambda result, logger, theme_names, file_path: len(theme_names),
+)
+def save_theme_names(
+    logger: logging.Logger, theme_names: List[str], file_path: str
+) -> None:
+    """Saves the theme names as a file with theme_name for every line"""
+    content = "\n".join(theme_names)
     with open(file_path, "w") as file:
         file.write(content)
     logger.info(f"Done saving keys of themes into: {file_path}")
 
 
-def main() -> None:
-    logger = create_logger("data-pipeline")
-    logger.info("STARTED process_data_pipeline.py")
-    model = SentenceTransformer(MODEL_NAME)
+@pipeline_metrics.timed(
+    "save_theme_matrix",
+    lambda result, logger, theme_matrix, file_path: len(theme_matrix.theme_names),
+)
+def save_theme_matrix(
+    logger: logging.Logger, theme_matrix: ThemeMatrix, file_path: str
+) -> None:
+    """Saves the normalized theme encodings with the theme names, the themes file hash and the model
+    name, for later runs and other consumers to load
+    """
+    theme_matrix.save(file_path)
+    logger.info(f"Done saving theme matrix into: {file_path}")
+
 
-    themes = parse_themes(logger, model)
-    companies = parse_company_files(logger, model)
+@pipeline_metrics.timed(
+    "load_database", lambda load_statistics, *args: load_statistics["row_count"]
+)
+def load_database(logger: logging.Logger) -> Dict[str, any]:
+    """Loads the saved processed companies into the database of the web API with its bulk loader,
+    so that the web API does not have to load them on startup. The columnar output is loaded when
+    it was written in the same run.
+    """
+    from db.database import bulk_load_companies, processed_data_source
+
+    load_statistics = bulk_load_companies(processed_data_source())
+    logger.info(
+        f"Done loading {load_statistics['row_count']} companies into the database in "
+        f"{load_statistics['seconds']:.2f}s ({load_statistics['rows_per_second'] or 0:.0f} rows/s)."
+    )
+    return load_statistics
 
-    save_theme_names(logger, themes, PATH.OUTPUT_THEME_NAMES_FILE.value)
 
-    companies_with_themes = determine_themes(logger, themes, companies)
+def save_shard(
+    logger: logging.Logger,
+    theme_matrix: ThemeMatrix,
+    companies: Dict[str, any],
+    companies_with_themes: Dict[str, any],
+    output_directory: str,
+    shard_index: int,
+    shard_count: int,
+) -> None:
+    """Saves the processed companies, the theme names and the theme matrix of a shard into the
+    directory of the shard, along with the metadata the merge needs
+    """
+    makedirs(output_directory, exist_ok=True)
+    save_processed_data_jsonl(
+        logger, companies_with_themes, path.join(output_directory, "output.jsonl")
+    )
+    save_theme_names(
+        logger, theme_matrix.theme_names, path.join(output_directory, "theme_names.txt")
+    )
+    save_theme_matrix(
+        logger, theme_matrix, path.join(output_directory, THEME_MATRIX_FILE_NAME)
+    )
+    save_shard_metadata(
+        output_directory,
+        shard_index,
+        shard_count,
+        theme_matrix.theme_names,
+        theme_matrix.themes_hash,
+        theme_matrix.model_name,
+        {
+            company_ticker: companies[company_ticker]["company_html_file"]
+            for company_ticker in companies_with_themes.keys()
+        },
+    )
+    logger.info(
+        f"Done saving shard {shard_index} of {shard_count} into: {output_directory}"
+    )
+
+
+def merge_shards(
+    logger: logging.Logger,
+    shard_count: int,
+    directory: str = PATH.OUTPUT_SHARDS_DIRECTORY.value,
+    merge_company_artifacts: bool = True,
+    score_chunk_size: int = BATCH.SCORE_CHUNK_SIZE.value,
+) -> Dict[str, any]:
+    """Combines the processed companies of every shard into the final output and saves the theme
+    names and the theme matrix. The company artifacts of the shards are combined too, in the order
+    of the merged companies. Exits if a shard is missing, or was scored with other themes or
+    another model than the first shard.
+    """
+    first_shard_metadata = None
+    output_directories = []
+    shards = []
+    for shard_index in range(shard_count):
+        output_directory = shard_directory(directory, shard_index, shard_count)
+        shard_metadata = load_shard_metadata(output_directory)
+        output_file = path.join(output_directory, "output.jsonl")
+        if shard_metadata is None or not path.exists(output_file):
+            logger.error(f"[{output_directory}]:{ERROR.SHARD_MISSING.value}")
+            sys.exit(1)
+
+        if first_shard_metadata is None:
+            first_shard_metadata = shard_metadata
+        elif any(
+            shard_metadata[key] != first_shard_metadata[key]
+            for key in ["theme_names", "themes_hash", "model_name"]
+        ):
+            logger.error(f"[{output_directory}]:{ERROR.SHARD_MISMATCH.value}")
+            sys.exit(1)
+
+        output_directories.append(output_directory)
+        shards.append(
+            (read_processed_data_jsonl(output_file), shard_metadata["company_files"])
+        )
+
+    companies_with_themes, duplicate_count, company_shards = merge_shard_companies(
+        shards
+    )
+    logger.info(
+        f"Done merging {shard_count} shards. There are {len(companies_with_themes)} companies, "
+        f"{duplicate_count} duplicate tickers were dropped."
+    )
+    if len(companies_with_themes) < 1:
+        logger.error(ERROR.NO_COMPANIES.value)
+        sys.exit()
+
+    save_theme_names(
+        logger,
+        first_shard_metadata["theme_names"],
+        PATH.OUTPUT_THEME_NAMES_FILE.value,
+    )
+    theme_matrix = ThemeMatrix.load(
+        path.join(output_directories[0], THEME_MATRIX_FILE_NAME)
+    )
+    if theme_matrix is not None:
+        save_theme_matrix(logger, theme_matrix, PATH.OUTPUT_THEME_MATRIX_FILE.value)
     save_processed_data_jsonl(logger, companies_with_themes)
+    if merge_company_artifacts:
+        merge_shard_company_artifacts(
+            logger,
+            output_directories,
+            company_shards,
+            first_shard_metadata["theme_names"],
+            first_shard_metadata["model_name"],
+            score_chunk_size,
+        )
+    else:
+        remove_company_artifacts(PATH.OUTPUT_DIRECTORY.value)
+    return companies_with_themes
+
+
+def merge_shard_company_artifacts(
+    logger: logging.Logger,
+    output_directories: List[str],
+    company_shards: Dict[str, int],
+    theme_names: List[str],
+    model_name: str,
+    score_chunk_size: int = BATCH.SCORE_CHUNK_SIZE.value,
+) -> None:
+    """Copies the company artifact rows of the merged companies from the shard each company comes
+    from, in the order of the merged companies, into the company artifacts of the outputs
+    directory. The theme scores are only kept if every shard has them. If a shard has no artifacts
+    for its companies, the artifacts of the outputs directory are removed instead, so that they do
+    not describe an earlier output.
+    """
+    shard_artifacts = []
+    for output_directory in output_directories:
+        company_artifacts = CompanyArtifacts.load(output_directory)
+        if (
+            company_artifacts is None
+            or company_artifacts.model_name != model_name
+            or company_artifacts.theme_names != theme_names
+        ):
+            logger.warning(
+                f"[{output_directory}]:{ERROR.SHARD_NO_COMPANY_ARTIFACTS.value}"
+            )
+            remove_company_artifacts(PATH.OUTPUT_DIRECTORY.value)
+            return
+        shard_artifacts.append(company_artifacts)
+    for company_ticker, shard_position in company_shards.items():
+        if company_ticker not in shard_artifacts[shard_position].rows:
+            logger.warning(
+                f"[{output_directories[shard_position]}]:"
+                f"{ERROR.SHARD_NO_COMPANY_ARTIFACTS.value}"
+            )
+            remove_company_artifacts(PATH.OUTPUT_DIRECTORY.value)
+            return
+
+    company_artifact_writer = CompanyArtifactWriter(
+        PATH.OUTPUT_DIRECTORY.value,
+        theme_names,
+        model_name,
+        has_scores=all(
+            company_artifacts.scores is not None
+            for company_artifacts in shard_artifacts
+        ),
+    )
+    company_tickers = list(company_shards.keys())
+    for chunk_start in range(0, len(company_tickers), score_chunk_size):
+        chunk_of_tickers = company_tickers[chunk_start : chunk_start + score_chunk_size]
+        chunk_of_rows = [
+            (
+                shard_artifacts[company_shards[company_ticker]],
+                shard_artifacts[company_shards[company_ticker]].rows[company_ticker],
+            )
+            for company_ticker in chunk_of_tickers
+        ]
+        company_artifact_writer.append(
+            chunk_of_tickers,
+            np.stack(
+                [
+                    company_artifacts.embeddings[row]
+                    for company_artifacts, row in chunk_of_rows
+                ]
+            ),
+            (
+                np.stack(
+                    [
+                        company_artifacts.scores[row]
+                        for company_artifacts, row in chunk_of_rows
+                    ]
+                )
+                if company_artifact_writer.has_scores
+                else None
+            ),
+        )
+    save_company_artifacts(logger, company_artifact_writer)
+
+
+def positive_integer(value: str) -> int:
+    """Argument type for command line options that only accept integers greater than zero"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"expected a positive integer, got: {value}")
+    return number
+
+
+def non_negative_integer(value: str) -> int:
+    """Argument type for command line options that only accept integers of zero or more"""
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(
+            f"expected a non-negative integer, got: {value}"
+        )
+    return number
+
+
+def positive_number(value: str) -> float:
+    """Argument type for command line options that only accept numbers greater than zero"""
+    number = float(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"expected a positive number, got: {value}")
+    return number
+
+
+def parse_arguments(arguments: List[str] = None) -> argparse.Namespace:
+    """Parse the command line options used to tune the data pipeline"""
+    parser = argparse.ArgumentParser(
+        description="Classify the company HTML files in the inputs directory into themes."
+    )
+    parser.add_argument(
+        "--encode-batch-size",
+        type=positive_integer,
+        default=BATCH.ENCODE_BATCH_SIZE.value,
+        help="number of descriptions passed to the model in one forward pass.",
+    )
+    parser.add_argument(
+        "--parse-window-size",
+        type=positive_integer,
+        default=BATCH.PARSE_WINDOW_SIZE.value,
+        help="number of HTML files parsed before their descriptions are encoded.",
+    )
+    parser.add_argument(
+        "--score-chunk-size",
+        type=positive_integer,
+        default=BATCH.SCORE_CHUNK_SIZE.value,
+        help="number of companies scored against the themes in one matrix multiplication.",
+    )
+    parser.add_argument(
+        "--parse-workers",
+        type=positive_integer,
+        default=CONCURRENCY.PARSE_WORKERS.value,
+        help="number of worker processes parsing HTML files. 1 parses in the main process, "
+        "where a file that crashes the interpreter stops the run.",
+    )
+    parser.add_argument(
+        "--encode-workers",
+        type=positive_integer,
+        default=CONCURRENCY.ENCODE_WORKERS.value,
+        help="number of worker processes encoding descriptions, each with its own copy of the "
+        "model. 1 encodes in the main process.",
+    )
+    parser.add_argument(
+        "--encode-threads",
+        type=positive_integer,
+        default=None,
+        help="number of torch threads of every encode worker. Defaults to the CPU cores divided "
+        "by --encode-workers.",
+    )
+    parser.add_argument(
+        "--encoder-socket",
+        default=ENCODER_SERVER.SOCKET_PATH.value,
+        help="Unix domain socket of the local encoder server started with serve_encoder.py. "
+        "Descriptions are encoded in-process when no server with the same model and backend "
+        "listens on it.",
+    )
+    parser.add_argument(
+        "--no-encoder-server",
+        action="store_true",
+        help="always encode in-process, even when the local encoder server is running.",
+    )
+    parser.add_argument(
+        "--parse-timeout",
+        type=positive_number,
+        default=CONCURRENCY.PARSE_TIMEOUT_SECONDS.value,
+        help="seconds the parser may spend on one HTML file before it is skipped. Only applies "
+        "on platforms with SIGALRM; a warning is logged where it cannot be armed.",
+    )
+    parser.add_argument(
+        "--read-workers",
+        type=non_negative_integer,
+        default=CONCURRENCY.READ_WORKERS.value,
+        help="number of threads reading HTML files ahead of parsing and encoding. 0 reads every "
+        "file when it is parsed.",
+    )
+    parser.add_argument(
+        "--read-queue-depth",
+        type=positive_integer,
+        default=CONCURRENCY.READ_QUEUE_DEPTH.value,
+        help="number of HTML files the reader threads may read ahead of parsing.",
+    )
+    parser.add_argument(
+        "--html-extractor",
+        choices=[extractor.value for extractor in HTML_EXTRACTOR],
+        default=HTML_EXTRACTOR.FAST.value,
+        help="how company HTML files are parsed. The fast single-pass extractor falls back to "
+        "BeautifulSoup for any file it rejects.",
+    )
+    parser.add_argument(
+        "--embedding-dtype",
+        choices=[embedding_dtype.value for embedding_dtype in EMBEDDING_DTYPE],
+        default=EMBEDDING_DTYPE.FLOAT32.value,
+        help="data type the company encodings are held in until they are scored in a full run. "
+        "float16 halves their memory at a small cost in precision.",
+    )
+    parser.add_argument(
+        "--no-embedding-cache",
+        action="store_true",
+        help="encode every description instead of reusing encodings from earlier runs.",
+    )
+    parser.add_argument(
+        "--embedding-cache-max-entries",
+        type=positive_integer,
+        default=CACHE.EMBEDDING_CACHE_MAX_ENTRIES.value,
+        help="number of encodings kept in the embedding cache. The least recently used are evicted.",
+    )
+    parser.add_argument(
+        "--no-company-artifacts",
+        action="store_true",
+        help="do not write the memory-mapped company encodings to the outputs directory.",
+    )
+    parser.add_argument(
+        "--company-theme-scores",
+        action="store_true",
+        help="also write the similarity of every company to every theme to the company artifacts. "
+        "The matrix takes 4 bytes per company and theme, so it is only written on request.",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        action="store_true",
+        help="checkpoint the parsed and encoded companies while processing them, so an "
+        "interrupted run can be resumed with --resume. Every checkpoint writes and flushes the "
+        "companies processed since the last one, so it is only done on request.",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue a run interrupted with --checkpoint from its last checkpoint instead of "
+        "starting over, and keep checkpointing. Starts over when the input files or options "
+        "changed since.",
+    )
+    parser.add_argument(
+        "--checkpoint-interval",
+        type=positive_number,
+        default=CHECKPOINT.INTERVAL_SECONDS.value,
+        help="seconds between checkpoints.",
+    )
+    parser.add_argument(
+        "--checkpoint-every",
+        type=positive_integer,
+        help="also checkpoint once this many parse windows were processed since the last "
+        "checkpoint.",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only process the company files added or changed since the last run, and merge them "
+        "into the existing output. Uses the input manifest in the outputs directory.",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="keep running with the model loaded, and classify company files as they are added "
+        "or changed, as in an incremental run. Stop with Ctrl-C or SIGTERM.",
+    )
+    parser.add_argument(
+        "--watch-interval",
+        type=positive_number,
+        default=WATCH.INTERVAL_SECONDS.value,
+        help="seconds between two polls of the inputs for changes with --watch.",
+    )
+    parser.add_argument(
+        "--watch-batch-size",
+        type=positive_integer,
+        default=WATCH.BATCH_SIZE.value,
+        help="number of detected company files classified and saved together with --watch.",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="write every window of companies to the output as soon as it is scored, keeping "
+        "memory use flat regardless of the number of input files. Unlike a full run, the first "
+        "file with a ticker is kept.",
+    )
+    parser.add_argument(
+        "--theme-search",
+        choices=[theme_search.value for theme_search in THEME_SEARCH],
+        default=THEME_SEARCH.EXACT.value,
+        help="how the top themes of a company are found. ivf only scores every company against "
+        "the themes of its nearest clusters, for very large numbers of themes.",
+    )
+    parser.add_argument(
+        "--ivf-lists",
+        type=positive_integer,
+        default=None,
+        help="number of theme clusters of the ivf index. Defaults to the square root of the "
+        "number of themes.",
+    )
+    parser.add_argument(
+        "--ivf-probes",
+        type=positive_integer,
+        default=ANN.IVF_PROBES.value,
+        help="number of nearest theme clusters whose themes every company is scored against.",
+    )
+    parser.add_argument(
+        "--encoder-backend",
+        choices=[encoder_backend.value for encoder_backend in ENCODER_BACKEND],
+        default=ENCODER_BACKEND.TORCH.value,
+        help="inference backend of the model. torch-int8 dynamically quantizes the model for "
+        "faster encoding on CPU, at a small cost in accuracy.",
+    )
+    parser.add_argument(
+        "--parity-check",
+        action="store_true",
+        help="only compare the top 3 themes of the input companies found with --encoder-backend "
+        "against the fp32 torch backend, and report the agreement rate.",
+    )
+    parser.add_argument(
+        "--validate-only",
+        action="store_true",
+        help="only validate the themes file and the company files, and report the rejects. The "
+        "model is not loaded. Exits with status 1 if anything was rejected.",
+    )
+    parser.add_argument(
+        "--columnar-output",
+        action="store_true",
+        help="also write the processed companies column by column, as outputs/output.parquet "
+        "with pyarrow installed, or outputs/output.columns otherwise.",
+    )
+    parser.add_argument(
+        "--load-database",
+        action="store_true",
+        help="load outputs/output.jsonl into the database of the web API once it is saved, so "
+        "that the web API does not have to load it on startup.",
+    )
+    parser.add_argument(
+        "--shard-index",
+        type=non_negative_integer,
+        help="only process the company files of this shard, from 0 to --shard-count - 1, and "
+        "write the output to outputs/shards/.",
+    )
+    parser.add_argument(
+        "--shard-count",
+        type=positive_integer,
+        help="number of shards the company files are split into by a stable hash of their names.",
+    )
+    parser.add_argument(
+        "--merge-shards",
+        action="store_true",
+        help="only combine the outputs of all --shard-count shards into outputs/output.jsonl and "
+        "outputs/theme_names.txt.",
+    )
+    options = parser.parse_args(arguments)
+    if options.incremental and options.stream:
+        parser.error("--incremental and --stream cannot be used together.")
+    if options.validate_only and (options.incremental or options.stream):
+        parser.error("--validate-only cannot be used with --incremental or --stream.")
+    if options.parity_check and (
+        options.incremental or options.stream or options.validate_only
+    ):
+        parser.error(
+            "--parity-check cannot be used with --incremental, --stream or --validate-only."
+        )
+    if options.merge_shards:
+        if options.shard_count is None or options.shard_index is not None:
+            parser.error("--merge-shards needs --shard-count and no --shard-index.")
+    elif (options.shard_index is None) != (options.shard_count is None):
+        parser.error("--shard-index and --shard-count must be used together.")
+    elif options.shard_count is not None and options.shard_index >= options.shard_count:
+        parser.error("--shard-index must be less than --shard-count.")
+    if (options.shard_count is not None or options.merge_shards) and (
+        options.incremental
+        or options.stream
+        or options.validate_only
+        or options.parity_check
+    ):
+        parser.error(
+            "sharding cannot be used with --incremental, --stream, --validate-only or "
+            "--parity-check."
+        )
+    if (options.checkpoint or options.resume) and (
+        options.incremental
+        or options.stream
+        or options.validate_only
+        or options.parity_check
+        or options.merge_shards
+    ):
+        parser.error(
+            "--checkpoint and --resume cannot be used with --incremental, --stream, "
+            "--validate-only, --parity-check or --merge-shards."
+        )
+    if options.company_theme_scores and (
+        options.no_company_artifacts or options.theme_search == THEME_SEARCH.IVF.value
+    ):
+        parser.error(
+            "--company-theme-scores cannot be used with --no-company-artifacts or "
+            "--theme-search ivf."
+        )
+    if options.watch and (
+        options.incremental
+        or options.stream
+        or options.validate_only
+        or options.parity_check
+        or options.shard_count is not None
+        or options.checkpoint
+        or options.resume
+        or options.columnar_output
+    ):
+        parser.error(
+            "--watch cannot be used with --incremental, --stream, --validate-only, "
+            "--parity-check, sharding, --checkpoint, --resume or --columnar-output."
+        )
+    if options.columnar_output and (
+        options.validate_only or options.parity_check or options.shard_index is not None
+    ):
+        parser.error(
+            "--columnar-output cannot be used with --validate-only, --parity-check or "
+            "--shard-index."
+        )
+    if options.load_database and (
+        options.validate_only or options.parity_check or options.shard_index is not None
+    ):
+        parser.error(
+            "--load-database cannot be used with --validate-only, --parity-check or "
+            "--shard-index."
+        )
+    return options
+
+
+def save_pipeline_metrics(
+    logger: logging.Logger,
+    options: argparse.Namespace,
+    directory: str = PATH.LOG_DIRECTORY.value,
+) -> str:
+    """Logs the metrics of every stage of the run and saves them, along with the options of the
+    run, as a JSON file in the log directory, so that runs can be compared
+    """
+    summary = pipeline_metrics.summary()
+    for name, stage in summary["stages"].items():
+        items_per_second = (
+            f"{stage['items_per_second']:.1f}"
+            if stage["items_per_second"] is not None
+            else "n/a"
+        )
+        peak_rss = (
+            f"{stage['peak_rss_mb']:.0f} MB"
+            if stage["peak_rss_mb"] is not None
+            else "n/a"
+        )
+        logger.info(
+            f"Stage {name}: {stage['wall_seconds']:.3f}s wall, {stage['cpu_seconds']:.3f}s CPU, "
+            f"{stage['items']} items, {items_per_second} items/s, peak RSS {peak_rss}"
+        )
+
+    file_path = pipeline_metrics.save(directory, "data-pipeline", options=vars(options))
+    logger.info(f"Done saving pipeline metrics: {file_path}")
+    return file_path
+
+
+def checkpoint_run_details(
+    options: argparse.Namespace, model_name: str
+) -> Dict[str, any]:
+    """Return the options a checkpoint can only be resumed with if they are the same, as the
+    companies and encodings it holds depend on them
+    """
+    return {
+        "model_name": model_name,
+        "html_extractor": options.html_extractor,
+        "parse_window_size": options.parse_window_size,
+        "encode_batch_size": options.encode_batch_size,
+        "embedding_dtype": options.embedding_dtype,
+    }
+
+
+def main(arguments: List[str] = None) -> None:
+    options = parse_arguments(arguments)
+    logger = create_logger("data-pipeline")
+    logger.info("STARTED process_data_pipeline.py")
+    pipeline_metrics.reset()
+
+    if options.validate_only:
+        rejected_count = validate_inputs(
+            logger,
+            parse_window_size=options.parse_window_size,
+            parse_workers=options.parse_workers,
+            parse_timeout_seconds=options.parse_timeout,
+            html_extractor=options.html_extractor,
+            read_workers=options.read_workers,
+            read_queue_depth=options.read_queue_depth,
+        )
+        logger.info("FINISHED process_data_pipeline.py")
+        if rejected_count > 0:
+            sys.exit(1)
+        return
+
+    if options.parity_check:
+        check_encoder_parity(
+            logger,
+            options.encoder_backend,
+            encode_batch_size=options.encode_batch_size,
+            parse_window_size=options.parse_window_size,
+            parse_workers=options.parse_workers,
+            parse_timeout_seconds=options.parse_timeout,
+            html_extractor=options.html_extractor,
+        )
+        logger.info("FINISHED process_data_pipeline.py")
+        return
+
+    if options.merge_shards:
+        companies_with_themes = merge_shards(
+            logger,
+            options.shard_count,
+            merge_company_artifacts=not options.no_company_artifacts,
+            score_chunk_size=options.score_chunk_size,
+        )
+        if options.columnar_output:
+            columnar_output_writer = ColumnarOutputWriter(
+                PATH.OUTPUT_DIRECTORY.value,
+                read_lines_from_file(PATH.OUTPUT_THEME_NAMES_FILE.value),
+            )
+            columnar_output_writer.append(companies_with_themes)
+            save_columnar_output(logger, columnar_output_writer)
+        if options.load_database:
+            load_database(logger)
+        logger.info("FINISHED process_data_pipeline.py")
+        return
+
+    model_name = encoder_model_name(MODEL_NAME, options.encoder_backend)
+    model = LazySentenceTransformer(MODEL_NAME, logger, options.encoder_backend)
+    if options.encode_workers > 1:
+        model = EncoderPool(
+            partial(
+                LazySentenceTransformer,
+                MODEL_NAME,
+                encoder_backend=options.encoder_backend,
+            ),
+            options.encode_workers,
+            options.encode_threads,
+            logger,
+        )
+    elif not options.no_encoder_server:
+        model = EncoderClient(options.encoder_socket, model_name, model, logger)
+    embedding_cache = (
+        None
+        if options.no_embedding_cache
+        else EmbeddingCache(
+            PATH.EMBEDDING_CACHE_DIRECTORY.value,
+            model_name,
+            options.embedding_cache_max_entries,
+        )
+    )
+
+    if options.watch:
+        watch_inputs(
+            logger,
+            model,
+            InputManifest(PATH.INPUT_MANIFEST_FILE.value),
+            model_name,
+            watch_interval_seconds=options.watch_interval,
+            watch_batch_size=options.watch_batch_size,
+            encode_batch_size=options.encode_batch_size,
+            parse_window_size=options.parse_window_size,
+            score_chunk_size=options.score_chunk_size,
+            parse_workers=options.parse_workers,
+            parse_timeout_seconds=options.parse_timeout,
+            html_extractor=options.html_extractor,
+            read_workers=options.read_workers,
+            read_queue_depth=options.read_queue_depth,
+            embedding_cache=embedding_cache,
+            theme_search=options.theme_search,
+            ivf_lists=options.ivf_lists,
+            ivf_probes=options.ivf_probes,
+            load_database=options.load_database,
+        )
+        if isinstance(model, (EncoderPool, EncoderClient)):
+            model.close()
+        if embedding_cache is not None:
+            save_embedding_cache(logger, embedding_cache)
+        save_pipeline_metrics(logger, options)
+        logger.info("FINISHED process_data_pipeline.py")
+        return
+
+    output_directory = (
+        PATH.OUTPUT_DIRECTORY.value
+        if options.shard_count is None
+        else shard_directory(
+            PATH.OUTPUT_SHARDS_DIRECTORY.value, options.shard_index, options.shard_count
+        )
+    )
+    theme_matrix = parse_themes(
+        logger,
+        model,
+        embedding_cache,
+        encode_batch_size=options.encode_batch_size,
+        theme_matrix_file=path.join(output_directory, THEME_MATRIX_FILE_NAME),
+        model_name=model_name,
+    )
+    theme_index = (
+        build_theme_index(logger, theme_matrix, options.ivf_lists, options.ivf_probes)
+        if options.theme_search == THEME_SEARCH.IVF.value
+        else None
+    )
+    company_artifact_writer = (
+        None
+        if options.no_company_artifacts
+        else CompanyArtifactWriter(
+            output_directory,
+            theme_matrix.theme_names,
+            model_name,
+            has_scores=options.company_theme_scores,
+        )
+    )
+    columnar_output_writer = (
+        ColumnarOutputWriter(PATH.OUTPUT_DIRECTORY.value, theme_matrix.theme_names)
+        if options.columnar_output
+        else None
+    )
+
+    if options.incremental:
+        manifest = InputManifest(PATH.INPUT_MANIFEST_FILE.value)
+        companies_with_themes = update_companies_incrementally(
+            logger,
+            theme_matrix,
+            model,
+            manifest,
+            encode_batch_size=options.encode_batch_size,
+            parse_window_size=options.parse_window_size,
+            score_chunk_size=options.score_chunk_size,
+            parse_workers=options.parse_workers,
+            parse_timeout_seconds=options.parse_timeout,
+            html_extractor=options.html_extractor,
+            read_workers=options.read_workers,
+            read_queue_depth=options.read_queue_depth,
+            embedding_cache=embedding_cache,
+            company_artifact_writer=company_artifact_writer,
+            theme_index=theme_index,
+        )
+        if len(companies_with_themes) < 1:
+            logger.error(ERROR.NO_COMPANIES.value)
+            sys.exit()
+
+        save_theme_names(
+            logger, theme_matrix.theme_names, PATH.OUTPUT_THEME_NAMES_FILE.value
+        )
+        save_theme_matrix(logger, theme_matrix, PATH.OUTPUT_THEME_MATRIX_FILE.value)
+        save_processed_data_jsonl(logger, companies_with_themes)
+        if columnar_output_writer is not None:
+            columnar_output_writer.append(companies_with_themes)
+        manifest.save()
+    elif options.stream:
+        company_count = save_processed_data_jsonl_stream(
+            logger,
+            stream_companies_with_themes(
+                logger,
+                theme_matrix,
+                iterate_company_html_files(),
+                model,
+                encode_batch_size=options.encode_batch_size,
+                parse_window_size=options.parse_window_size,
+                score_chunk_size=options.score_chunk_size,
+                parse_workers=options.parse_workers,
+                parse_timeout_seconds=options.parse_timeout,
+                html_extractor=options.html_extractor,
+                read_workers=options.read_workers,
+                read_queue_depth=options.read_queue_depth,
+                embedding_cache=embedding_cache,
+                company_artifact_writer=company_artifact_writer,
+                theme_index=theme_index,
+            ),
+            columnar_output_writer=columnar_output_writer,
+        )
+        if company_count < 1:
+            # The other modes exit before writing any output, so no empty one is left either
+            remove(path.join(PATH.OUTPUT_DIRECTORY.value, "output.jsonl"))
+            for writer in [company_artifact_writer, columnar_output_writer]:
+                if writer is not None:
+                    writer.discard()
+            logger.error(ERROR.NO_COMPANIES.value)
+            sys.exit()
+
+        save_theme_names(
+            logger, theme_matrix.theme_names, PATH.OUTPUT_THEME_NAMES_FILE.value
+        )
+        save_theme_matrix(logger, theme_matrix, PATH.OUTPUT_THEME_MATRIX_FILE.value)
+    else:
+        checkpoint = (
+            None
+            if not (options.checkpoint or options.resume)
+            else PipelineCheckpoint(
+                path.join(output_directory, CHECKPOINT_DIRECTORY_NAME),
+                checkpoint_run_details(options, model_name),
+                checkpoint_every=options.checkpoint_every,
+                checkpoint_seconds=options.checkpoint_interval,
+            )
+        )
+        companies = parse_company_files(
+            logger,
+            model,
+            encode_batch_size=options.encode_batch_size,
+            parse_window_size=options.parse_window_size,
+            parse_workers=options.parse_workers,
+            parse_timeout_seconds=options.parse_timeout,
+            html_extractor=options.html_extractor,
+            read_workers=options.read_workers,
+            read_queue_depth=options.read_queue_depth,
+            embedding_cache=embedding_cache,
+            shard_index=options.shard_index,
+            shard_count=options.shard_count,
+            checkpoint=checkpoint,
+            resume=options.resume,
+            embedding_dtype=options.embedding_dtype,
+        )
+
+        if options.shard_count is None:
+            save_theme_names(
+                logger, theme_matrix.theme_names, PATH.OUTPUT_THEME_NAMES_FILE.value
+            )
+            save_theme_matrix(logger, theme_matrix, PATH.OUTPUT_THEME_MATRIX_FILE.value)
+
+        companies_with_themes = determine_themes(
+            logger,
+            theme_matrix,
+            companies,
+            score_chunk_size=options.score_chunk_size,
+            company_artifact_writer=company_artifact_writer,
+            theme_index=theme_index,
+        )
+        if options.shard_count is None:
+            save_processed_data_jsonl(logger, companies_with_themes)
+            if columnar_output_writer is not None:
+                columnar_output_writer.append(companies_with_themes)
+        else:
+            save_shard(
+                logger,
+                theme_matrix,
+                companies,
+                companies_with_themes,
+                output_directory,
+                options.shard_index,
+                options.shard_count,
+            )
+        if checkpoint is not None:
+            checkpoint.remove()
+
+    if theme_index is not None:
+        log_theme_index_recall(logger, theme_index)
+    if company_artifact_writer is not None:
+        save_company_artifacts(logger, company_artifact_writer)
+    if embedding_cache is not None:
+        save_embedding_cache(logger, embedding_cache)
+    if isinstance(model, (EncoderPool, EncoderClient)):
+        model.close()
+    if columnar_output_writer is not None:
+        save_columnar_output(logger, columnar_output_writer)
+    if options.load_database:
+        load_database(logger)
+    save_pipeline_metrics(logger, options)
     logger.info("FINISHED process_data_pipeline.py")
 
 
@@ -1,7 +1,8 @@
 import json
 import re
+import time
 import uuid
-from typing import List
+from typing import List, Tuple
 
 from fastapi import Depends, FastAPI, HTTPException, Path
 from sqlalchemy import func
@@ -9,21 +10,32 @@ from sqlalchemy.orm import Session
 from typing_extensions import Annotated
 
 from constants.web_constants import (
+    CLASSIFY,
     DOCUMENT_VERSION,
     PATH,
     REGEX_TICKER_PATTERN,
+    ClassifyRequest,
+    ClassifyResponse,
     CompanyDetail,
     CompanyTickerList,
 )
 from db.database import CompaniesTable, SessionLocal, get_db, initialize_data
+from utils.company_html import parse_company_html
 from utils.logger import create_logger
+from utils.micro_batcher import MicroBatcher
+from utils.online_classifier import OnlineClassifier
 
 
 def startup_event():
     """Code block that runs on application startup. Used for initializing database"""
     db = SessionLocal()
-    initialize_data(db)
+    load_statistics = initialize_data(db)
     db.close()
+    if load_statistics is not None:
+        logger.info(
+            f"Done loading {load_statistics['row_count']} companies into the database in "
+            f"{load_statistics['seconds']:.2f}s ({load_statistics['rows_per_second'] or 0:.0f} rows/s)."
+        )
     logger.info("Done application startupa and db initialization.")
 
 
@@ -47,12 +59,33 @@ def get_available_theme_names(path=PATH.THEME_NAMES.value) -> List[str]:
     return themes
 
 
+def classify_batch(requests: List[Tuple[str, int]]) -> List[List[Tuple[str, float]]]:
+    """Classify a micro-batch of (description, top N) requests with one call to the model"""
+    start_time = time.perf_counter()
+    top_themes = online_classifier.classify(
+        [description for description, _ in requests],
+        max(top_n for _, top_n in requests),
+    )
+    logger.info(
+        f"Done classifying a micro-batch of {len(requests)} requests in "
+        f"{time.perf_counter() - start_time:.3f}s."
+    )
+    return [
+        company_top_themes[:top_n]
+        for company_top_themes, (_, top_n) in zip(top_themes, requests)
+    ]
+
+
 ticker_pattern = re.compile(REGEX_TICKER_PATTERN)
 theme_names = get_available_theme_names()
 logger = create_logger("web-api", console_logging=False)
 app = FastAPI(version=DOCUMENT_VERSION)
 logger.info("STARTED serve_web_api.py")
 app.add_event_handler("startup", startup_event)
+online_classifier = OnlineClassifier(PATH.THEME_MATRIX.value, logger)
+classify_batcher = MicroBatcher(
+    classify_batch, CLASSIFY.MAX_BATCH_SIZE.value, CLASSIFY.MAX_WAIT_SECONDS.value
+)
 
 
 @app.get("/v1/companies/{ticker}", tags=["Companies"])
@@ -168,3 +201,79 @@ async def list_company_tickers_by_theme_name(
         f"[{request_uuid}][{endpoint}]Endpoint resolved. Response:{json.dumps(return_object)}."
     )
     return return_object
+
+
+@app.post("/v1/classify", tags=["Classify"])
+async def classify_company(request: ClassifyRequest) -> ClassifyResponse:
+    """
+    This endpoint will classify a company on demand, from either its HTML file or a plain text description.
+    HTML must follow the same format as the data pipeline's inputs.
+    If valid, the response will contain the company's top themes with their scores, along with its ticker and name when HTML was supplied.
+    Otherwise, an error will be given.
+    """
+    endpoint = "/v1/classify"
+    request_uuid = uuid.uuid4()
+    logger.info(f"[{request_uuid}][{endpoint}]Endpoint called. Handling request.")
+
+    if (request.html is None) == (request.text is None):
+        log_and_raise_error(
+            request_uuid,
+            endpoint,
+            HTTPException(
+                status_code=400, detail="Supply either html or text, but not both."
+            ),
+        )
+
+    company_name = company_ticker = None
+    if request.html is not None:
+        company_details, error_message = parse_company_html(request.html)
+        if error_message is not None:
+            log_and_raise_error(
+                request_uuid,
+                endpoint,
+                HTTPException(status_code=400, detail=error_message),
+            )
+        company_name, company_ticker, company_description = company_details
+    else:
+        company_description = request.text.strip()
+        if company_description == "":
+            log_and_raise_error(
+                request_uuid,
+                endpoint,
+                HTTPException(status_code=400, detail="text must not be blank."),
+            )
+
+    try:
+        company_top_themes = await classify_batcher.submit(
+            (company_description, request.top_n)
+        )
+    except FileNotFoundError:
+        log_and_raise_error(
+            request_uuid,
+            endpoint,
+            HTTPException(
+                status_code=503,
+                detail="No theme matrix found. Run the data pipeline first.",
+            ),
+        )
+    except Exception:
+        log_and_raise_error(
+            request_uuid,
+            endpoint,
+            HTTPException(status_code=500, detail="Internal Server Error."),
+        )
+
+    return_object = {
+        "company_ticker": company_ticker,
+        "company_name": company_name,
+        "company_description": company_description,
+        "company_top_themes": [
+            {"theme_name": theme_name, "score": score}
+            for theme_name, score in company_top_themes
+        ],
+    }
+
+    logger.info(
+        f"[{request_uuid}][{endpoint}]Endpoint resolved. Response:{json.dumps(return_object)}."
+    )
+    return return_object
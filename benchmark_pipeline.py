@@ -0,0 +1,338 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List
+
+from A_process_data_pipeline import (
+    list_company_html_files,
+    parse_themes,
+    positive_integer,
+    positive_number,
+    process_list_of_companies,
+    save_processed_data_jsonl,
+    score_companies,
+    theme_matrix_tensor,
+)
+from constants.data_constants import (
+    BATCH,
+    BENCHMARK,
+    CONCURRENCY,
+    ENCODER_BACKEND,
+    HTML_EXTRACTOR,
+    MODEL_NAME,
+    PATH,
+)
+from utils.company_store import CompanyStore
+from utils.lazy_model import LazySentenceTransformer, encoder_model_name
+from utils.logger import create_logger
+from utils.stage_metrics import StageMetrics
+from utils.stub_encoder import STUB_ENCODER_NAME, StubEncoder
+from utils.synthetic_corpus import write_synthetic_companies, write_synthetic_themes
+
+
+def parse_arguments(arguments: List[str] = None) -> argparse.Namespace:
+    """Parse the command line options of the benchmark"""
+    parser = argparse.ArgumentParser(
+        description="Time the stages of the data pipeline on synthetic corpora of increasing size."
+    )
+    parser.add_argument(
+        "--company-counts",
+        type=positive_integer,
+        nargs="+",
+        default=BENCHMARK.COMPANY_COUNTS.value,
+        help="number of synthetic company files of every benchmark run.",
+    )
+    parser.add_argument(
+        "--theme-count",
+        type=positive_integer,
+        default=BENCHMARK.THEME_COUNT.value,
+        help="number of synthetic themes.",
+    )
+    parser.add_argument(
+        "--malformed-share",
+        type=float,
+        default=BENCHMARK.MALFORMED_SHARE.value,
+        help="share of the company files that are malformed and rejected by the parser.",
+    )
+    parser.add_argument(
+        "--encoder",
+        choices=[BENCHMARK.STUB_ENCODER.value]
+        + [backend.value for backend in ENCODER_BACKEND],
+        default=BENCHMARK.STUB_ENCODER.value,
+        help="stub is a cheap hashing encoder that needs no model weights. The other choices "
+        "load the model with that backend.",
+    )
+    parser.add_argument(
+        "--encode-batch-size",
+        type=positive_integer,
+        default=BATCH.ENCODE_BATCH_SIZE.value,
+    )
+    parser.add_argument(
+        "--parse-window-size",
+        type=positive_integer,
+        default=BATCH.PARSE_WINDOW_SIZE.value,
+    )
+    parser.add_argument(
+        "--score-chunk-size",
+        type=positive_integer,
+        default=BATCH.SCORE_CHUNK_SIZE.value,
+    )
+    parser.add_argument(
+        "--parse-workers",
+        type=positive_integer,
+        default=CONCURRENCY.PARSE_WORKERS.value,
+    )
+    parser.add_argument(
+        "--html-extractor",
+        choices=[extractor.value for extractor in HTML_EXTRACTOR],
+        default=HTML_EXTRACTOR.FAST.value,
+    )
+    parser.add_argument(
+        "--work-directory",
+        help="directory the synthetic inputs and the outputs are written to. Defaults to a "
+        "temporary directory that is removed afterwards.",
+    )
+    parser.add_argument(
+        "--report",
+        help="path of the JSON report. Defaults to logs/benchmark-report-<start time>.json.",
+    )
+    parser.add_argument(
+        "--baseline",
+        help="JSON report of an earlier benchmark to compare the throughput of every stage with.",
+    )
+    parser.add_argument(
+        "--max-slowdown",
+        type=positive_number,
+        default=BENCHMARK.MAX_SLOWDOWN.value,
+        help="factor by which a stage may be slower than in the baseline before it is reported "
+        "as a regression.",
+    )
+    options = parser.parse_args(arguments)
+    if not 0 <= options.malformed_share <= 1:
+        parser.error("--malformed-share must be between 0 and 1")
+    return options
+
+
+@contextmanager
+def working_directory(directory: str) -> Iterator[None]:
+    """Run the pipeline functions, which use paths relative to the working directory, in another
+    directory
+    """
+    previous_directory = os.getcwd()
+    os.chdir(directory)
+    try:
+        yield
+    finally:
+        os.chdir(previous_directory)
+
+
+def create_encoder(encoder: str, logger: logging.Logger):
+    """Return the encoder to benchmark and the model name its theme matrix is keyed by. The model is
+    loaded here, so that loading it is not timed as part of encoding.
+    """
+    if encoder == BENCHMARK.STUB_ENCODER.value:
+        return StubEncoder(), STUB_ENCODER_NAME
+    model = LazySentenceTransformer(MODEL_NAME, logger, encoder)
+    model.load()
+    return model, encoder_model_name(MODEL_NAME, encoder)
+
+
+def benchmark_company_count(
+    logger: logging.Logger,
+    options: argparse.Namespace,
+    model,
+    model_name: str,
+    company_count: int,
+    directory: str,
+) -> Dict[str, any]:
+    """Generate a synthetic corpus in a directory, then time parsing and encoding, scoring and
+    writing it with the pipeline functions. Return the metrics of every stage.
+    """
+    os.makedirs(directory, exist_ok=True)
+    with working_directory(directory):
+        os.makedirs(PATH.OUTPUT_DIRECTORY.value, exist_ok=True)
+        # A reused work directory may hold the corpus of an earlier run with other options
+        shutil.rmtree(PATH.INPUT_COMPANIES_DIRECTORY.value, ignore_errors=True)
+        generate_start_time = time.perf_counter()
+        write_synthetic_themes(PATH.INPUT_THEME_FILE.value, options.theme_count)
+        malformed_count = write_synthetic_companies(
+            PATH.INPUT_COMPANIES_DIRECTORY.value,
+            company_count,
+            options.malformed_share,
+        )
+        generate_seconds = time.perf_counter() - generate_start_time
+        html_files = list_company_html_files()
+
+        metrics = StageMetrics()
+        with metrics.stage("encode_themes") as timer:
+            theme_matrix = parse_themes(
+                logger,
+                model,
+                encode_batch_size=options.encode_batch_size,
+                theme_matrix_file=os.path.join(
+                    PATH.OUTPUT_DIRECTORY.value, "benchmark_theme_matrix.npz"
+                ),
+                model_name=model_name,
+            )
+            timer.add_items(len(theme_matrix.theme_names))
+
+        with metrics.stage("parse_and_encode_companies") as timer:
+            companies = process_list_of_companies(
+                logger,
+                html_files,
+                model,
+                encode_batch_size=options.encode_batch_size,
+                parse_window_size=options.parse_window_size,
+                parse_workers=options.parse_workers,
+                html_extractor=options.html_extractor,
+                company_store=CompanyStore(len(html_files)),
+            )
+            timer.add_items(len(html_files))
+
+        with metrics.stage("score") as timer:
+            companies_with_themes = score_companies(
+                theme_matrix.theme_names,
+                theme_matrix_tensor(theme_matrix),
+                companies,
+                score_chunk_size=options.score_chunk_size,
+            )
+            timer.add_items(len(companies_with_themes))
+
+        with metrics.stage("write") as timer:
+            save_processed_data_jsonl(logger, companies_with_themes)
+            timer.add_items(len(companies_with_themes))
+
+    return metrics.summary(
+        company_count=company_count,
+        theme_count=options.theme_count,
+        malformed_count=malformed_count,
+        parsed_count=len(companies),
+        generate_seconds=generate_seconds,
+    )
+
+
+def compare_reports(
+    baseline: Dict[str, any], report: Dict[str, any], max_slowdown: float
+) -> List[str]:
+    """Return a message for every stage whose throughput dropped by more than max_slowdown times
+    since the baseline report, in runs of the same company and theme counts
+    """
+    baseline_runs = {
+        (run["company_count"], run["theme_count"]): run for run in baseline["runs"]
+    }
+    regressions = []
+    for run in report["runs"]:
+        baseline_run = baseline_runs.get((run["company_count"], run["theme_count"]))
+        if baseline_run is None:
+            continue
+        for name, stage in run["stages"].items():
+            baseline_stage = baseline_run["stages"].get(name)
+            if (
+                baseline_stage is None
+                or not baseline_stage["items_per_second"]
+                or not stage["items_per_second"]
+            ):
+                continue
+            slowdown = baseline_stage["items_per_second"] / stage["items_per_second"]
+            if slowdown > max_slowdown:
+                regressions.append(
+                    f"{name} at {run['company_count']} companies: "
+                    f"{stage['items_per_second']:.1f} items/s, "
+                    f"{slowdown:.2f}x slower than {baseline_stage['items_per_second']:.1f} items/s"
+                )
+    return regressions
+
+
+def benchmark_environment() -> Dict[str, any]:
+    import torch
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "torch": torch.__version__,
+        "torch_threads": torch.get_num_threads(),
+    }
+
+
+def run_benchmark(
+    logger: logging.Logger, options: argparse.Namespace, work_directory: str
+) -> Dict[str, any]:
+    """Benchmark every company count in its own directory and return the report"""
+    pipeline_logger = create_logger("benchmark-pipeline", console_logging=False)
+    model, model_name = create_encoder(options.encoder, logger)
+    report = {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "options": {
+            key: value
+            for key, value in vars(options).items()
+            if key not in ["work_directory", "report", "baseline"]
+        },
+        "environment": benchmark_environment(),
+        "runs": [],
+    }
+    for company_count in options.company_counts:
+        run = benchmark_company_count(
+            pipeline_logger,
+            options,
+            model,
+            model_name,
+            company_count,
+            os.path.join(work_directory, f"companies-{company_count}"),
+        )
+        for name, stage in run["stages"].items():
+            logger.info(
+                f"{company_count} companies, stage {name}: {stage['wall_seconds']:.3f}s wall, "
+                f"{stage['items']} items, {stage['items_per_second'] or 0:.1f} items/s"
+            )
+        report["runs"].append(run)
+    return report
+
+
+def main(arguments: List[str] = None) -> None:
+    options = parse_arguments(arguments)
+    logger = create_logger("benchmark")
+    logger.info("STARTED benchmark_pipeline.py")
+
+    report_path = os.path.abspath(
+        options.report
+        or os.path.join(
+            PATH.LOG_DIRECTORY.value,
+            f"benchmark-report-{datetime.now().strftime('%Y%m%dT%H%M%S')}.json",
+        )
+    )
+    if options.work_directory:
+        report = run_benchmark(logger, options, os.path.abspath(options.work_directory))
+    else:
+        with tempfile.TemporaryDirectory() as work_directory:
+            report = run_benchmark(logger, options, work_directory)
+
+    with open(report_path, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    logger.info(f"Done saving benchmark report: {report_path}")
+
+    if options.baseline:
+        with open(options.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compare_reports(baseline, report, options.max_slowdown)
+        for regression in regressions:
+            logger.error(f"Regression: {regression}")
+        logger.info(
+            f"Done comparing with baseline {options.baseline}. Regressions: {len(regressions)}"
+        )
+        if regressions:
+            sys.exit(1)
+
+    logger.info("FINISHED benchmark_pipeline.py")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,124 @@ class FORMAT(Enum):
     HTML_TAG_STRUCTURE = ["html", "head", "title", "body", "h1", "h2", "p"]
 
 
+class BATCH(Enum):
+    """
+    Constants related to batching of the data processing stages
+    """
+
+    ENCODE_BATCH_SIZE = 32
+    PARSE_WINDOW_SIZE = 1000
+    SCORE_CHUNK_SIZE = 4096
+
+
+class CHECKPOINT(Enum):
+    """
+    Constants related to checkpointing a full run of the data pipeline so it can be resumed
+    """
+
+    INTERVAL_SECONDS = 60.0
+
+
+class CACHE(Enum):
+    """
+    Constants related to caching between runs of the data pipeline
+    """
+
+    EMBEDDING_CACHE_MAX_ENTRIES = 2_000_000
+
+
+class THEME_SEARCH(Enum):
+    """
+    Constants naming the available ways of finding the top themes of a company
+    """
+
+    EXACT = "exact"
+    IVF = "ivf"
+
+
+class ANN(Enum):
+    """
+    Constants related to the approximate nearest-neighbour theme index
+    """
+
+    IVF_PROBES = 8
+    KMEANS_ITERATIONS = 20
+    RECALL_SAMPLE_SIZE = 1000
+
+
+class CONCURRENCY(Enum):
+    """
+    Constants related to parallel processing of the data processing stages
+    """
+
+    PARSE_WORKERS = 1
+    PARSE_TIMEOUT_SECONDS = 30
+    PARSE_TASK_CHUNK_SIZE = 16
+    READ_WORKERS = 4
+    READ_QUEUE_DEPTH = 1000
+    ENCODE_WORKERS = 1
+
+
+class WATCH(Enum):
+    """
+    Constants related to watching the inputs for changes with the --watch daemon
+    """
+
+    INTERVAL_SECONDS = 2.0
+    BATCH_SIZE = 64
+
+
+class ENCODER_SERVER(Enum):
+    """
+    Constants related to the local encoder server shared by the data pipeline and the web API
+    """
+
+    SOCKET_PATH = "cache/encoder-server.sock"
+    MAX_BATCH_SIZE = 32
+    MAX_WAIT_SECONDS = 0.005
+    METRICS_LOG_SECONDS = 60.0
+    CONNECT_TIMEOUT_SECONDS = 1.0
+
+
+class HTML_EXTRACTOR(Enum):
+    """
+    Constants naming the available extractors of company information from HTML files
+    """
+
+    FAST = "fast"
+    BEAUTIFULSOUP = "beautifulsoup"
+
+
+class EMBEDDING_DTYPE(Enum):
+    """
+    Constants naming the data types the company encodings can be held in during a full run
+    """
+
+    FLOAT32 = "float32"
+    FLOAT16 = "float16"
+
+
+class ENCODER_BACKEND(Enum):
+    """
+    Constants naming the available inference backends of the sentence transformer model
+    """
+
+    TORCH = "torch"
+    TORCH_INT8 = "torch-int8"
+
+
+class BENCHMARK(Enum):
+    """
+    Constants related to the synthetic-corpus benchmark of the data pipeline
+    """
+
+    COMPANY_COUNTS = [1_000, 10_000, 100_000]
+    THEME_COUNT = 100
+    MALFORMED_SHARE = 0.05
+    MAX_SLOWDOWN = 1.25
+    STUB_ENCODER = "stub"
+
+
 class PATH(Enum):
     """
     Constants Related to path of inputs and outputs
@@ -22,6 +140,10 @@ class PATH(Enum):
     OUTPUT_DIRECTORY = "outputs/"
     LOG_DIRECTORY = "logs"
     OUTPUT_THEME_NAMES_FILE = "outputs/theme_names.txt"
+    OUTPUT_THEME_MATRIX_FILE = "outputs/theme_matrix.npz"
+    EMBEDDING_CACHE_DIRECTORY = "cache/embeddings"
+    INPUT_MANIFEST_FILE = "outputs/manifest.json"
+    OUTPUT_SHARDS_DIRECTORY = "outputs/shards"
 
 
 class PREFIX(Enum):
@@ -64,4 +186,16 @@ class ERROR(Enum):
     HTML_BLANK_COMPANY_DESCRIPTION = (
         "Company description (expected in BODY->P) is blank."
     )
+    HTML_PARSE_TIMEOUT = "HTML took too long to parse. The file will be skipped."
+    PARSE_TIMEOUT_UNAVAILABLE = "The parse timeout needs SIGALRM on the main thread, which is not available here. Files are parsed without a timeout."
+    DUPLICATE_COMPANY_TICKER = "Company ticker was already written by an earlier file in streaming mode. The file will be skipped."
     NO_COMPANIES = "no companies parsed. exiting program because there are no companies to identify themes for."
+    NO_STORED_ENCODINGS = "Themes changed, but some companies have no stored encoding to be rescored with. Processing every company file again."
+    # Related to resuming interrupted runs
+    NO_CHECKPOINT = "No checkpoint of an interrupted run with the same input files and options. Starting over."
+    # Related to merging the outputs of sharded runs
+    SHARD_MISSING = (
+        "Shard output is missing or incomplete. Run the shard before merging."
+    )
+    SHARD_MISMATCH = "Shard was scored with other themes or another model than shard 0. Run every shard with the same inputs before merging."
+    SHARD_NO_COMPANY_ARTIFACTS = "Shard has no company artifacts for its companies, or they were written with other themes or another model. The merged output will have no company artifacts."
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel, Field
 from enum import Enum
 
@@ -14,6 +14,26 @@ class PATH(Enum):
 
     PROCESSED_DATA = "outputs/output.jsonl"
     THEME_NAMES = "outputs/theme_names.txt"
+    THEME_MATRIX = "outputs/theme_matrix.npz"
+
+
+class DATABASE(Enum):
+    """
+    Constants related to loading the processed data into the database
+    """
+
+    LOAD_CHUNK_SIZE = 10_000
+    STAGING_TABLE_NAME = "companies_staging"
+
+
+class CLASSIFY(Enum):
+    """
+    Constants related to classifying companies on demand
+    """
+
+    TOP_N_THEMES = 3
+    MAX_BATCH_SIZE = 32
+    MAX_WAIT_SECONDS = 0.01
 
 
 class CompanyDetail(BaseModel):
@@ -42,3 +62,50 @@ class CompanyTickerList(BaseModel):
         title="data",
         description="the list of companies by ticker symbol where the theme matches the company's top themes.",
     )
+
+
+class ClassifyRequest(BaseModel):
+    html: Optional[str] = Field(
+        default=None,
+        title="html",
+        description="the company's HTML file, in the same format as the data pipeline's inputs.",
+    )
+    text: Optional[str] = Field(
+        default=None,
+        title="text",
+        description="a plain text description of the company, instead of its HTML file.",
+    )
+    top_n: int = Field(
+        default=CLASSIFY.TOP_N_THEMES.value,
+        ge=1,
+        title="top n",
+        description="the number of top themes to return.",
+    )
+
+
+class ThemeScore(BaseModel):
+    theme_name: str = Field(title="theme name", description="the theme's name.")
+    score: float = Field(
+        title="score",
+        description="the cosine similarity between the company and theme descriptions.",
+    )
+
+
+class ClassifyResponse(BaseModel):
+    company_ticker: Optional[str] = Field(
+        default=None,
+        title="company ticker",
+        description="the company's ticker symbol, when HTML was supplied.",
+    )
+    company_name: Optional[str] = Field(
+        default=None,
+        title="company name",
+        description="the company's name, when HTML was supplied.",
+    )
+    company_description: str = Field(
+        title="company description", description="the description that was classified."
+    )
+    company_top_themes: List[ThemeScore] = Field(
+        title="company top themes",
+        description="the top themes of the company with their scores, highest first.",
+    )
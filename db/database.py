@@ -1,10 +1,28 @@
-from constants.web_constants import PATH
+from constants.web_constants import DATABASE, PATH
 import json
+import os
+import time
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional
 
 import jsonlines
-from sqlalchemy import Column, String, create_engine
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    create_engine,
+    delete,
+    func,
+    select,
+)
+from sqlalchemy.engine import Connection, Engine
 from sqlalchemy.orm import Session, sessionmaker, declarative_base
 
+from utils.columnar_output import find_columnar_output, iterate_columnar_rows
+
 # Define a database
 engine = create_engine(
     "sqlite:///db/companies.db", connect_args={"check_same_thread": False}, echo=False
@@ -31,6 +49,30 @@ class CompaniesTable(Base):
         }
 
 
+# Records which processed data file the companies table was last loaded from
+class DataLoadsTable(Base):
+    __tablename__ = "data_loads"
+    source_path = Column(String, nullable=False, primary_key=True)
+    source_size = Column(BigInteger, nullable=False)
+    source_mtime_ns = Column(BigInteger, nullable=False)
+    row_count = Column(Integer, nullable=False)
+
+
+# Same columns as the companies table, without its index, which is only built after the swap
+companies_staging_table = Table(
+    DATABASE.STAGING_TABLE_NAME.value,
+    MetaData(),
+    *[
+        Column(
+            column.name,
+            column.type,
+            nullable=column.nullable,
+            primary_key=column.primary_key,
+        )
+        for column in CompaniesTable.__table__.columns
+    ],
+)
+
 # Drop and create the database tables
 Base.metadata.create_all(bind=engine)
 
@@ -39,20 +81,176 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 session = SessionLocal()
 
 
-def initialize_data(db: Session):
+def source_fingerprint(file_path: str) -> Dict[str, any]:
+    file_stat = os.stat(file_path)
+    return {
+        "source_path": os.path.abspath(file_path),
+        "source_size": file_stat.st_size,
+        "source_mtime_ns": file_stat.st_mtime_ns,
+    }
+
+
+def is_loaded(file_path: str, target_engine: Engine = engine) -> bool:
+    """Return True if the companies table was last loaded from the file as it is now"""
+    fingerprint = source_fingerprint(file_path)
+    with target_engine.connect() as connection:
+        data_load = connection.execute(
+            select(DataLoadsTable.source_size, DataLoadsTable.source_mtime_ns).where(
+                DataLoadsTable.source_path == fingerprint["source_path"]
+            )
+        ).first()
+    return data_load is not None and tuple(data_load) == (
+        fingerprint["source_size"],
+        fingerprint["source_mtime_ns"],
+    )
+
+
+def processed_data_source(file_path: str = PATH.PROCESSED_DATA.value) -> str:
+    """Return the columnar output written next to the processed data file when it is at least as
+    new, since it is faster to read, and the processed data file otherwise
+    """
+    columnar_path = find_columnar_output(os.path.dirname(file_path))
+    if columnar_path is not None and (
+        not os.path.exists(file_path)
+        or os.stat(columnar_path).st_mtime_ns >= os.stat(file_path).st_mtime_ns
+    ):
+        return columnar_path
+    return file_path
+
+
+def iterate_company_chunks(
+    file_path: str, chunk_size: int
+) -> Iterator[List[Dict[str, any]]]:
+    """Yield the companies of a processed data file, either JSON lines or columnar, in chunks"""
+    if not file_path.endswith(".jsonl"):
+        yield from iterate_columnar_rows(file_path, chunk_size)
+        return
+    with jsonlines.open(file_path, "r") as file:
+        while True:
+            lines = list(islice(file, chunk_size))
+            if not lines:
+                return
+            yield lines
+
+
+def record_data_load(
+    connection: Connection, fingerprint: Dict[str, any], row_count: int
+) -> None:
+    """Record that the companies table now matches the processed data file as it is now"""
+    connection.execute(
+        delete(DataLoadsTable).where(
+            DataLoadsTable.source_path == fingerprint["source_path"]
+        )
+    )
+    connection.execute(
+        DataLoadsTable.__table__.insert(), {**fingerprint, "row_count": row_count}
+    )
+
+
+def company_row(line: Dict[str, any]) -> Dict[str, any]:
+    return {**line, "company_top_themes": json.dumps(line["company_top_themes"])}
+
+
+def bulk_load_companies(
+    file_path: str = PATH.PROCESSED_DATA.value,
+    chunk_size: int = DATABASE.LOAD_CHUNK_SIZE.value,
+    target_engine: Engine = engine,
+) -> Dict[str, any]:
+    """
+    Replace the companies table with the processed data file, either JSON lines or a columnar
+    output. The file is streamed in chunks into a staging table with one executemany insert per
+    chunk, and the staging table replaces the companies table in the same transaction, so readers
+    see either the old or the new companies. Returns the number of rows loaded and the load rate.
+
+    Note: as with the previous per-row merge, the last line of a repeated ticker wins.
+    """
+    start_time = time.perf_counter()
+    Base.metadata.create_all(bind=target_engine)
+    fingerprint = source_fingerprint(file_path)
+    insert_staging_rows = companies_staging_table.insert().prefix_with("OR REPLACE")
+    row_count = 0
+
+    with target_engine.begin() as connection:
+        # pysqlite only opens a transaction before DML, so open it before the DDL as well
+        connection.exec_driver_sql("BEGIN")
+        companies_staging_table.drop(connection, checkfirst=True)
+        companies_staging_table.create(connection)
+        for lines in iterate_company_chunks(file_path, chunk_size):
+            connection.execute(
+                insert_staging_rows,
+                [company_row(line) for line in lines],
+            )
+            row_count += len(lines)
+
+        CompaniesTable.__table__.drop(connection)
+        connection.exec_driver_sql(
+            f"ALTER TABLE {DATABASE.STAGING_TABLE_NAME.value} "
+            f"RENAME TO {CompaniesTable.__tablename__}"
+        )
+        for index in CompaniesTable.__table__.indexes:
+            index.create(connection)
+
+        record_data_load(connection, fingerprint, row_count)
+
+    seconds = time.perf_counter() - start_time
+    return {
+        "row_count": row_count,
+        "seconds": seconds,
+        "rows_per_second": row_count / seconds if seconds > 0 else None,
+    }
+
+
+def upsert_companies(
+    companies: Iterable[Dict[str, any]],
+    removed_tickers: Iterable[str] = (),
+    file_path: str = PATH.PROCESSED_DATA.value,
+    target_engine: Engine = engine,
+) -> int:
+    """
+    Insert or replace the given companies and delete the removed tickers in the companies table,
+    in one transaction, for small updates that do not warrant a bulk load. The processed data file
+    the same companies were saved to is then recorded as loaded. Returns the number of companies in
+    the table.
     """
-    Helper function to initialize the database with data from the data pipeline on app startup
+    Base.metadata.create_all(bind=target_engine)
+    rows = [company_row(company) for company in companies]
+    removed_tickers = list(removed_tickers)
+
+    with target_engine.begin() as connection:
+        if removed_tickers:
+            connection.execute(
+                delete(CompaniesTable).where(
+                    CompaniesTable.company_ticker.in_(removed_tickers)
+                )
+            )
+        if rows:
+            connection.execute(
+                CompaniesTable.__table__.insert().prefix_with("OR REPLACE"), rows
+            )
+        row_count = connection.execute(
+            select(func.count()).select_from(CompaniesTable)
+        ).scalar()
+        record_data_load(connection, source_fingerprint(file_path), row_count)
+    return row_count
+
+
+def initialize_data(db: Session) -> Optional[Dict[str, any]]:
+    """
+    Helper function to initialize the database with data from the data pipeline on app startup.
+    Loads the columnar output instead of the JSON lines when it is at least as new. Skipped when
+    the pipeline already loaded the current processed data file. Returns the load
+    statistics, or None when nothing was loaded.
     """
     try:
-        with jsonlines.open(PATH.PROCESSED_DATA.value, "r") as file:
-            for line in file:
-                line["company_top_themes"] = json.dumps(line["company_top_themes"])
-                db.merge(CompaniesTable(**line))
-        db.commit()
-        db.close()
+        file_path = processed_data_source()
+        if is_loaded(file_path, db.get_bind()):
+            return None
+        return bulk_load_companies(file_path, target_engine=db.get_bind())
     except Exception as e:
         db.rollback()
         print(f"Error during initalization: {e}")
+    finally:
+        db.close()
 
 
 def get_db():
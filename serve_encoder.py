@@ -0,0 +1,104 @@
+import argparse
+import asyncio
+import json
+import signal
+import sys
+from typing import List
+
+from A_process_data_pipeline import positive_integer, positive_number
+from constants.data_constants import ENCODER_BACKEND, ENCODER_SERVER, MODEL_NAME
+from utils.encoder_server import EncoderServer, connect_to_server, send_request
+from utils.lazy_model import LazySentenceTransformer, encoder_model_name
+from utils.logger import create_logger
+
+
+def parse_arguments(arguments: List[str] = None) -> argparse.Namespace:
+    """Parse the command line options of the encoder server"""
+    parser = argparse.ArgumentParser(
+        description="Serve the model to the data pipeline and the web API over a Unix domain "
+        "socket, so it is loaded once per machine."
+    )
+    parser.add_argument(
+        "--socket",
+        default=ENCODER_SERVER.SOCKET_PATH.value,
+        help="path of the Unix domain socket to listen on.",
+    )
+    parser.add_argument(
+        "--encoder-backend",
+        choices=[backend.value for backend in ENCODER_BACKEND],
+        default=ENCODER_BACKEND.TORCH.value,
+        help="inference backend of the served model. Clients only use a server with the same "
+        "backend as theirs.",
+    )
+    parser.add_argument(
+        "--max-batch-size",
+        type=positive_integer,
+        default=ENCODER_SERVER.MAX_BATCH_SIZE.value,
+        help="maximum number of sentences of concurrent requests encoded together.",
+    )
+    parser.add_argument(
+        "--max-wait",
+        type=float,
+        default=ENCODER_SERVER.MAX_WAIT_SECONDS.value,
+        help="seconds to wait for more requests before encoding a batch that is not full.",
+    )
+    parser.add_argument(
+        "--metrics-log-interval",
+        type=positive_number,
+        default=ENCODER_SERVER.METRICS_LOG_SECONDS.value,
+        help="seconds between logs of the batching and queue metrics.",
+    )
+    parser.add_argument(
+        "--metrics",
+        action="store_true",
+        help="print the batching and queue metrics of the running server as JSON, and exit.",
+    )
+    options = parser.parse_args(arguments)
+    if options.max_wait < 0:
+        parser.error("--max-wait must not be negative.")
+    return options
+
+
+def print_server_metrics(socket_path: str) -> None:
+    try:
+        connection = connect_to_server(socket_path)
+    except OSError:
+        sys.exit(f"No encoder server at {socket_path}.")
+    with connection:
+        response_header, _ = send_request(connection, {"op": "metrics"})
+    print(json.dumps(response_header["metrics"], indent=2))
+
+
+def main(arguments: List[str] = None) -> None:
+    options = parse_arguments(arguments)
+    if options.metrics:
+        print_server_metrics(options.socket)
+        return
+
+    logger = create_logger("encoder-server")
+    logger.info("STARTED serve_encoder.py")
+    model = LazySentenceTransformer(MODEL_NAME, logger, options.encoder_backend)
+    model.load()
+    encoder_server = EncoderServer(
+        options.socket,
+        model,
+        encoder_model_name(MODEL_NAME, options.encoder_backend),
+        max_batch_size=options.max_batch_size,
+        max_wait_seconds=options.max_wait,
+        metrics_log_seconds=options.metrics_log_interval,
+        logger=logger,
+    )
+    # Stop on SIGTERM as on Ctrl+C, removing the socket
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        asyncio.run(encoder_server.serve())
+    except KeyboardInterrupt:
+        logger.info("Stopped encoder server.")
+    except RuntimeError as exception:
+        logger.error(f"Error starting encoder server: {exception}")
+        sys.exit(1)
+    logger.info("FINISHED serve_encoder.py")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import json
+
+import numpy
+import torch
+
+from benchmark_pipeline import compare_reports, main, parse_arguments
+from utils.stub_encoder import StubEncoder
+
+
+def sample_report(items_per_second):
+    return {
+        "runs": [
+            {
+                "company_count": 1000,
+                "theme_count": 100,
+                "stages": {
+                    "parse_html": {"items_per_second": items_per_second},
+                    "write": {"items_per_second": None},
+                },
+            }
+        ]
+    }
+
+
+class TestingStubEncoder:
+    def testing_encode(self):
+        encodings = StubEncoder(dimension=8).encode(
+            ["solar grid", "Grid solar", "copper mine"]
+        )
+
+        assert encodings.shape == (3, 8)
+        assert encodings.dtype == numpy.float32
+        numpy.testing.assert_array_equal(encodings[0], encodings[1])
+        assert encodings[0].sum() == 2
+
+    def testing_encode_to_tensor(self):
+        encodings = StubEncoder().encode(["solar grid"], convert_to_tensor=True)
+
+        assert isinstance(encodings, torch.Tensor)
+        assert encodings.shape == (1, 384)
+
+
+class TestingCompareReports:
+    def testing_regression(self):
+        regressions = compare_reports(sample_report(100.0), sample_report(50.0), 1.25)
+
+        assert len(regressions) == 1
+        assert regressions[0].startswith("parse_html at 1000 companies")
+
+    def testing_within_max_slowdown(self):
+        assert compare_reports(sample_report(100.0), sample_report(90.0), 1.25) == []
+
+    def testing_other_company_count(self):
+        report = sample_report(10.0)
+        report["runs"][0]["company_count"] = 10
+        assert compare_reports(sample_report(100.0), report, 1.25) == []
+
+
+class TestingBenchmark:
+    def testing_parse_arguments(self):
+        options = parse_arguments(["--company-counts", "10", "20"])
+        assert options.company_counts == [10, 20]
+        assert options.encoder == "stub"
+
+    def testing_stub_benchmark_report(self, tmp_path):
+        report_path = tmp_path / "report.json"
+
+        main(
+            [
+                "--company-counts",
+                "20",
+                "--theme-count",
+                "5",
+                "--malformed-share",
+                "0.5",
+                "--work-directory",
+                str(tmp_path / "work"),
+                "--report",
+                str(report_path),
+            ]
+        )
+
+        report = json.loads(report_path.read_text())
+        run = report["runs"][0]
+        assert run["company_count"] == 20
+        assert run["parsed_count"] == 20 - run["malformed_count"]
+        assert list(run["stages"].keys()) == [
+            "encode_themes",
+            "parse_and_encode_companies",
+            "score",
+            "write",
+        ]
+        assert run["stages"]["parse_and_encode_companies"]["items"] == 20
+        assert run["stages"]["write"]["items"] == run["parsed_count"]
+
+    def testing_reused_work_directory(self, tmp_path):
+        arguments = [
+            "--company-counts",
+            "20",
+            "--theme-count",
+            "5",
+            "--malformed-share",
+            "0",
+            "--work-directory",
+            str(tmp_path / "work"),
+            "--report",
+            str(tmp_path / "report.json"),
+        ]
+        stale_file = tmp_path / "work" / "companies-20" / "inputs" / "companies"
+        stale_file.mkdir(parents=True)
+        (stale_file / "stale.html").write_text("<html></html>")
+
+        main(arguments)
+
+        report = json.loads((tmp_path / "report.json").read_text())
+        assert report["runs"][0]["parsed_count"] == 20
+        assert report["runs"][0]["stages"]["parse_and_encode_companies"]["items"] == 20
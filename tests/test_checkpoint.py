@@ -0,0 +1,127 @@
+import json
+import os
+
+import numpy
+
+from utils.checkpoint import PipelineCheckpoint, run_fingerprint
+
+RUN_DETAILS = {"model_name": "model", "parse_window_size": 2}
+
+
+def window(*tickers):
+    return {
+        ticker: {
+            "company_name": f"{ticker} Incorporated",
+            "company_ticker": ticker,
+            "company_description": f"The description of {ticker}.",
+            "company_html_file": f"{ticker.lower()}.html",
+        }
+        for ticker in tickers
+    }
+
+
+def encodings(*values):
+    return numpy.array([[value, -value] for value in values], dtype=numpy.float32)
+
+
+class TestingRunFingerprint:
+    def testing_changes_with_files_and_details(self, tmp_path):
+        (tmp_path / "a.html").write_text("a")
+        (tmp_path / "b.html").write_text("b")
+        fingerprint = run_fingerprint(str(tmp_path), ["a.html", "b.html"], RUN_DETAILS)
+
+        assert fingerprint == run_fingerprint(
+            str(tmp_path), ["a.html", "b.html"], dict(RUN_DETAILS)
+        )
+        assert fingerprint != run_fingerprint(
+            str(tmp_path), ["b.html", "a.html"], RUN_DETAILS
+        )
+        assert fingerprint != run_fingerprint(
+            str(tmp_path), ["a.html", "b.html"], {**RUN_DETAILS, "parse_window_size": 3}
+        )
+        (tmp_path / "b.html").write_text("changed")
+        assert fingerprint != run_fingerprint(
+            str(tmp_path), ["a.html", "b.html"], RUN_DETAILS
+        )
+
+
+class TestingPipelineCheckpoint:
+    def testing_resumes_committed_windows(self, tmp_path):
+        directory = str(tmp_path / "checkpoint")
+        checkpoint = PipelineCheckpoint(directory, RUN_DETAILS, checkpoint_every=1)
+        checkpoint.start("fingerprint")
+        checkpoint.append_window(window("AAA", "BBB"), encodings(1.0, 2.0))
+        checkpoint.append_window(window("CCC"), encodings(3.0))
+        checkpoint.close()
+
+        resumed_checkpoint = PipelineCheckpoint(directory, RUN_DETAILS)
+        companies = resumed_checkpoint.resume("fingerprint")
+
+        assert resumed_checkpoint.window_count == 2
+        assert [record for record, _ in companies] == [
+            *window("AAA", "BBB").values(),
+            *window("CCC").values(),
+        ]
+        numpy.testing.assert_array_equal(
+            numpy.stack([encoding for _, encoding in companies]),
+            encodings(1.0, 2.0, 3.0),
+        )
+
+    def testing_truncates_uncommitted_windows(self, tmp_path):
+        directory = str(tmp_path / "checkpoint")
+        checkpoint = PipelineCheckpoint(directory, RUN_DETAILS, checkpoint_every=2)
+        checkpoint.start("fingerprint")
+        checkpoint.append_window(window("AAA"), encodings(1.0))
+        checkpoint.append_window(window("BBB"), encodings(2.0))
+        # Written to the files, but not checkpointed before the run stopped
+        checkpoint.append_window(window("CCC"), encodings(3.0))
+        checkpoint.records_file.flush()
+        checkpoint.encodings_file.flush()
+        checkpoint.close()
+
+        resumed_checkpoint = PipelineCheckpoint(
+            directory, RUN_DETAILS, checkpoint_every=1
+        )
+        companies = resumed_checkpoint.resume("fingerprint")
+        assert [record["company_ticker"] for record, _ in companies] == ["AAA", "BBB"]
+
+        resumed_checkpoint.append_window(window("DDD"), encodings(4.0))
+        resumed_checkpoint.close()
+        companies = PipelineCheckpoint(directory, RUN_DETAILS).resume("fingerprint")
+        assert [record["company_ticker"] for record, _ in companies] == [
+            "AAA",
+            "BBB",
+            "DDD",
+        ]
+        assert companies[2][1].tolist() == [4.0, -4.0]
+
+    def testing_checkpoints_by_time(self, tmp_path):
+        directory = str(tmp_path / "checkpoint")
+        checkpoint = PipelineCheckpoint(directory, RUN_DETAILS, checkpoint_seconds=3600)
+        checkpoint.start("fingerprint")
+        checkpoint.append_window(window("AAA"), encodings(1.0))
+        assert checkpoint.pending_window_count == 1
+
+        checkpoint.checkpoint_seconds = 0
+        checkpoint.append_window(window("BBB"), encodings(2.0))
+        checkpoint.close()
+
+        assert checkpoint.pending_window_count == 0
+        companies = PipelineCheckpoint(directory, RUN_DETAILS).resume("fingerprint")
+        assert [record["company_ticker"] for record, _ in companies] == ["AAA", "BBB"]
+
+    def testing_starts_over_for_another_run(self, tmp_path):
+        directory = str(tmp_path / "checkpoint")
+        checkpoint = PipelineCheckpoint(directory, RUN_DETAILS, checkpoint_every=1)
+        checkpoint.start("fingerprint")
+        checkpoint.append_window(window("AAA"), encodings(1.0))
+        checkpoint.close()
+
+        resumed_checkpoint = PipelineCheckpoint(directory, RUN_DETAILS)
+        assert resumed_checkpoint.resume("other fingerprint") == []
+        assert resumed_checkpoint.window_count == 0
+        with open(os.path.join(directory, "state.json"), "r") as file:
+            assert json.load(file)["fingerprint"] == "other fingerprint"
+
+        resumed_checkpoint.remove()
+        assert not os.path.exists(directory)
@@ -0,0 +1,175 @@
+import json
+import os
+
+import pytest
+
+from utils.columnar_output import (
+    COLUMNS,
+    COLUMNS_FILE,
+    PARQUET_FILE,
+    ColumnarOutputWriter,
+    find_columnar_output,
+    iterate_columnar_rows,
+    read_columnar_output,
+)
+
+THEME_NAMES = ["Energy", "Semiconductors", "Retail"]
+
+
+def companies_with_themes(*tickers):
+    return {
+        ticker: {
+            "company_ticker": ticker,
+            "company_name": f"{ticker} Incorporated ü",
+            "company_top_themes": [
+                THEME_NAMES[index % 3],
+                THEME_NAMES[(index + 1) % 3],
+            ],
+            "company_description": f"The description of {ticker}.",
+        }
+        for index, ticker in enumerate(tickers)
+    }
+
+
+@pytest.fixture
+def without_pyarrow(mocker):
+    mocker.patch("utils.columnar_output.pyarrow", None)
+
+
+class TestingColumnarOutputWriter:
+    def testing_round_trip(self, tmp_path, without_pyarrow):
+        writer = ColumnarOutputWriter(str(tmp_path), THEME_NAMES)
+        first_window = companies_with_themes("AAPL", "TSLA")
+        second_window = companies_with_themes("MSFT")
+        writer.append(first_window)
+        writer.append(second_window)
+        file_path = writer.close()
+
+        assert file_path == os.path.join(str(tmp_path), COLUMNS_FILE)
+        assert not os.path.exists(f"{file_path}.tmp")
+        assert writer.row_count == 3
+        rows = [row for chunk in iterate_columnar_rows(file_path, 2) for row in chunk]
+        assert rows == [*first_window.values(), *second_window.values()]
+        assert list(rows[0].keys()) == COLUMNS
+
+    def testing_reads_row_ranges_in_chunks(self, tmp_path, without_pyarrow, mocker):
+        writer = ColumnarOutputWriter(str(tmp_path), THEME_NAMES)
+        companies = companies_with_themes(*[f"T{index}" for index in range(5)])
+        writer.append(companies)
+        file_path = writer.close()
+        read_sizes = []
+        real_open = open
+
+        def recording_open(*args, **kwargs):
+            file = real_open(*args, **kwargs)
+            real_read = file.read
+            file.read = lambda size=-1: read_sizes.append(size) or real_read(size)
+            return file
+
+        mocker.patch("builtins.open", side_effect=recording_open)
+        chunks = list(
+            iterate_columnar_rows(
+                file_path, 2, ["company_ticker", "company_top_themes"]
+            )
+        )
+
+        assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+        assert chunks[2] == [
+            {
+                "company_ticker": "T4",
+                "company_top_themes": companies["T4"]["company_top_themes"],
+            }
+        ]
+        # Every read is bounded by the rows of a chunk, never a whole column
+        assert -1 not in read_sizes
+        assert max(read_sizes[3:]) <= 3 * 8
+
+    def testing_little_endian_layout(self, tmp_path, without_pyarrow):
+        writer = ColumnarOutputWriter(str(tmp_path), THEME_NAMES)
+        writer.append(companies_with_themes("AAPL"))
+        with open(writer.close(), "rb") as file:
+            data = file.read()
+
+        header_length = int.from_bytes(data[8:16], "little")
+        header = json.loads(data[16 : 16 + header_length])
+        data_start = 16 + header_length
+        offsets_position, _ = header["columns"]["company_top_themes"]["offsets"]
+        data_position, _ = header["columns"]["company_top_themes"]["data"]
+        offsets = data[data_start + offsets_position : data_start + data_position]
+        themes = data[data_start + data_position : data_start + data_position + 8]
+        assert offsets == (0).to_bytes(8, "little") + (8).to_bytes(8, "little")
+        assert themes == (0).to_bytes(4, "little") + (1).to_bytes(4, "little")
+
+    def testing_column_projection(self, tmp_path, without_pyarrow):
+        writer = ColumnarOutputWriter(str(tmp_path), THEME_NAMES)
+        writer.append(companies_with_themes("AAPL", "TSLA"))
+        values = read_columnar_output(
+            writer.close(), ["company_ticker", "company_top_themes"]
+        )
+
+        assert values == {
+            "company_ticker": ["AAPL", "TSLA"],
+            "company_top_themes": [
+                ["Energy", "Semiconductors"],
+                ["Semiconductors", "Retail"],
+            ],
+        }
+
+    def testing_unknown_theme_names(self, tmp_path, without_pyarrow):
+        writer = ColumnarOutputWriter(str(tmp_path), [])
+        companies = companies_with_themes("AAPL")
+        writer.append(companies)
+
+        assert read_columnar_output(writer.close(), ["company_top_themes"]) == {
+            "company_top_themes": [companies["AAPL"]["company_top_themes"]]
+        }
+
+    def testing_empty_output(self, tmp_path, without_pyarrow):
+        writer = ColumnarOutputWriter(str(tmp_path), THEME_NAMES)
+        writer.append(dict())
+        file_path = writer.close()
+
+        assert read_columnar_output(file_path) == {column: [] for column in COLUMNS}
+        assert list(iterate_columnar_rows(file_path, 10)) == []
+
+    def testing_discard_keeps_previous_file(self, tmp_path, without_pyarrow):
+        writer = ColumnarOutputWriter(str(tmp_path), THEME_NAMES)
+        writer.append(companies_with_themes("AAPL"))
+        file_path = writer.close()
+        writer = ColumnarOutputWriter(str(tmp_path), THEME_NAMES)
+        writer.append(companies_with_themes("MSFT"))
+
+        writer.discard()
+
+        assert os.listdir(tmp_path) == [COLUMNS_FILE]
+        assert read_columnar_output(file_path)["company_ticker"] == ["AAPL"]
+
+    def testing_rejects_other_files(self, tmp_path):
+        file_path = tmp_path / COLUMNS_FILE
+        file_path.write_bytes(b"not columns")
+        with pytest.raises(ValueError):
+            read_columnar_output(str(file_path))
+
+    def testing_parquet_round_trip(self, tmp_path):
+        pytest.importorskip("pyarrow")
+        writer = ColumnarOutputWriter(str(tmp_path), THEME_NAMES)
+        companies = companies_with_themes("AAPL", "TSLA")
+        writer.append(companies)
+        file_path = writer.close()
+
+        assert file_path == os.path.join(str(tmp_path), PARQUET_FILE)
+        rows = [row for chunk in iterate_columnar_rows(file_path, 1) for row in chunk]
+        assert rows == list(companies.values())
+
+
+class TestingFindColumnarOutput:
+    def testing_newest_output(self, tmp_path):
+        assert find_columnar_output(str(tmp_path)) is None
+
+        columns_path = tmp_path / COLUMNS_FILE
+        parquet_path = tmp_path / PARQUET_FILE
+        columns_path.write_bytes(b"")
+        parquet_path.write_bytes(b"")
+        os.utime(columns_path, ns=(2_000_000_000, 2_000_000_000))
+        os.utime(parquet_path, ns=(1_000_000_000, 1_000_000_000))
+        assert find_columnar_output(str(tmp_path)) == str(columns_path)
@@ -0,0 +1,87 @@
+import numpy
+
+from utils.company_artifacts import CompanyArtifacts, CompanyArtifactWriter
+
+
+def write_sample_artifacts(directory):
+    writer = CompanyArtifactWriter(
+        str(directory), ["east", "north"], "model", has_scores=True
+    )
+    writer.append(
+        ["AAA", "BBB"],
+        numpy.array([[1.0, 0.0], [0.0, 1.0]]),
+        numpy.array([[1.0, 0.0], [0.0, 1.0]]),
+    )
+    writer.append(
+        ["CCC", "AAA"],
+        numpy.array([[0.6, 0.8], [0.8, 0.6]]),
+        numpy.array([[0.6, 0.8], [0.8, 0.6]]),
+    )
+    writer.close()
+
+
+class TestingCompanyArtifacts:
+    def testing_write_and_load(self, tmp_path):
+        write_sample_artifacts(tmp_path)
+
+        artifacts = CompanyArtifacts.load(str(tmp_path))
+
+        assert isinstance(artifacts.embeddings, numpy.memmap)
+        assert artifacts.embeddings.shape == (4, 2)
+        assert artifacts.scores.shape == (4, 2)
+        assert artifacts.model_name == "model"
+        assert artifacts.rows == {"AAA": 3, "BBB": 1, "CCC": 2}
+        numpy.testing.assert_allclose(artifacts.embedding("AAA"), [0.8, 0.6])
+        assert artifacts.theme_scores("CCC") == {
+            "east": numpy.float32(0.6),
+            "north": numpy.float32(0.8),
+        }
+
+    def testing_nearest_companies(self, tmp_path):
+        write_sample_artifacts(tmp_path)
+        artifacts = CompanyArtifacts.load(str(tmp_path))
+
+        nearest = artifacts.nearest_companies("BBB", 2)
+
+        assert [company_ticker for company_ticker, _ in nearest] == ["CCC", "AAA"]
+        assert nearest[0][1] == numpy.float32(0.8)
+
+    def testing_no_artifacts(self, tmp_path):
+        assert CompanyArtifacts.load(str(tmp_path)) is None
+
+    def testing_no_companies(self, tmp_path):
+        CompanyArtifactWriter(str(tmp_path), ["east"], "model", has_scores=True).close()
+
+        artifacts = CompanyArtifacts.load(str(tmp_path))
+
+        assert artifacts.rows == {}
+        assert artifacts.scores.shape == (0, 1)
+
+    def testing_without_scores(self, tmp_path):
+        write_sample_artifacts(tmp_path)
+        writer = CompanyArtifactWriter(str(tmp_path), ["east"], "model")
+        writer.append(["AAA"], numpy.array([[1.0, 0.0]]))
+        writer.close()
+
+        artifacts = CompanyArtifacts.load(str(tmp_path))
+
+        assert artifacts.scores is None
+        # The scores of the previous artifacts are removed
+        assert not (tmp_path / "company_theme_scores.f32").exists()
+        numpy.testing.assert_allclose(artifacts.embedding("AAA"), [1.0, 0.0])
+
+    def testing_discard_keeps_previous_artifacts(self, tmp_path):
+        write_sample_artifacts(tmp_path)
+        writer = CompanyArtifactWriter(
+            str(tmp_path), ["east"], "model", has_scores=True
+        )
+        writer.append(["AAA"], numpy.array([[1.0, 0.0]]), numpy.array([[1.0]]))
+
+        writer.discard()
+
+        assert not list(tmp_path.glob("*.tmp"))
+        assert CompanyArtifacts.load(str(tmp_path)).rows == {
+            "AAA": 3,
+            "BBB": 1,
+            "CCC": 2,
+        }
@@ -0,0 +1,93 @@
+import sys
+
+import numpy
+
+from utils.company_store import CompanyStore
+
+
+def company(ticker, name, html_file=None):
+    return {
+        "company_name": name,
+        "company_ticker": ticker,
+        "company_description": f"{name} description",
+        "company_html_file": html_file or f"{ticker.lower()}.html",
+    }
+
+
+class TestingCompanyStore:
+    def testing_behaves_like_a_dict_of_companies(self):
+        company_store = CompanyStore(4)
+        company_store.add_window(
+            {"AAA": company("AAA", "A"), "BBB": company("BBB", "B")},
+            numpy.array([[1.0, 0.0], [0.0, 1.0]]),
+        )
+        company_store.add(company("AAA", "A 2", "a2.html"), numpy.array([2.0, 2.0]))
+        company_store.add(company("CCC", "C"), numpy.array([3.0, 0.0]))
+
+        # A repeated ticker keeps its position, as with dict.update
+        assert list(company_store.keys()) == ["AAA", "BBB", "CCC"]
+        assert len(company_store) == 3
+        assert "BBB" in company_store and "DDD" not in company_store
+        company_a = company_store["AAA"]
+        assert company_a["company_name"] == "A 2"
+        assert company_a["company_html_file"] == "a2.html"
+        assert company_a["company_description_model_encoding"].tolist() == [2.0, 2.0]
+        assert company_store.row_encodings(1, 3).tolist() == [[0.0, 1.0], [3.0, 0.0]]
+
+    def testing_interns_strings_and_buffers_descriptions(self):
+        company_store = CompanyStore(2)
+        ticker = "".join(["A", "AA"])
+        company_store.add(company(ticker, "A"), numpy.array([1.0]))
+        company_store.add(company("AAA", "Ä 2"), numpy.array([2.0]))
+
+        assert company_store.company_tickers[0] is sys.intern("AAA")
+        assert company_store["AAA"]["company_description"] == "Ä 2 description"
+        assert not hasattr(company_store, "__dict__")
+
+    def testing_set_encodings_of_rows(self):
+        company_store = CompanyStore(1)
+        rows = [
+            company_store.add_record(f"N{index}", f"T{index}", "d", "f.html")
+            for index in range(3)
+        ]
+
+        company_store.set_encodings([rows[2], rows[0]], numpy.array([[2.0], [0.0]]))
+        company_store.set_encodings([rows[1]], numpy.array([[1.0]]))
+
+        assert company_store.row_encodings(0, 3).tolist() == [[0.0], [1.0], [2.0]]
+
+    def testing_grows_past_capacity(self):
+        company_store = CompanyStore(1)
+        for index in range(5):
+            company_store.add(
+                company(f"T{index}", f"N{index}"), numpy.array([index, -index])
+            )
+
+        assert company_store.encodings.shape[0] >= 5
+        assert company_store.row_encodings(0, 5)[:, 0].tolist() == [0, 1, 2, 3, 4]
+
+    def testing_float16_encodings(self):
+        company_store = CompanyStore(2, "float16")
+        company_store.add(company("AAA", "A"), numpy.array([0.1, 0.2], dtype="float32"))
+
+        assert company_store.encodings.dtype == numpy.float16
+        numpy.testing.assert_allclose(
+            company_store["AAA"]["company_description_model_encoding"],
+            [0.1, 0.2],
+            rtol=1e-3,
+        )
+
+    def testing_memory_is_smaller_than_dicts(self):
+        float32_store = CompanyStore(100)
+        float16_store = CompanyStore(100, "float16")
+        for index in range(100):
+            for company_store in [float32_store, float16_store]:
+                company_store.add(
+                    company(f"T{index}", f"N{index}"), numpy.zeros(384, dtype="float32")
+                )
+
+        # The encoding alone of a float32 tensor per company, with no object overhead
+        dict_nbytes = float32_store.dict_nbytes(384 * 4)
+        assert float16_store.nbytes() < float32_store.nbytes() < dict_nbytes
+        assert CompanyStore(10).nbytes() > 0
+        assert CompanyStore(10).dict_nbytes(1536) == 0
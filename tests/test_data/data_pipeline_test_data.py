@@ -1,3 +1,8 @@
+from numpy import array
+from torch import tensor
+
+from utils.theme_matrix import ThemeMatrix
+
 test_company_html = """<HTML>
 <HEAD>
 <TITLE>Company Description: Apple Inc.</TITLE>
@@ -177,32 +182,15 @@ test_company_blank_description = """<HTML>
 </BODY>
 </HTML>"""
 
-test_parse_themes_output = {
-    "theme1": {
-        "theme_name": "theme1",
-        "theme_description": "description1",
-        "theme_description_model_encoding": "test encode value",
-    },
-    "theme2": {
-        "theme_name": "theme2",
-        "theme_description": "description2",
-        "theme_description_model_encoding": "test encode value",
-    },
-}
-
-sample_processed_themes = {
-    "theme1": {
-        "theme_name": "theme1",
-        "theme_description": "description1",
-        "theme_description_model_encoding": "encoded description1",
-    }
-}
+sample_theme_matrix = ThemeMatrix(
+    ["theme1"], array([[1.0, 0.0]]), "themes hash", "model name"
+)
 
 sample_processed_companies = {
     "company1": {
         "company_name": "company1",
         "company_description": "description1",
-        "company_description_model_encoding": "encoded description1",
+        "company_description_model_encoding": tensor([2.0, 0.0]),
     }
 }
 
@@ -0,0 +1,165 @@
+import json
+import os
+
+import jsonlines
+import pytest
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import sessionmaker
+
+from db.database import (
+    CompaniesTable,
+    bulk_load_companies,
+    is_loaded,
+    processed_data_source,
+    upsert_companies,
+)
+from utils.columnar_output import ColumnarOutputWriter
+
+
+def company_line(ticker, name):
+    return {
+        "company_ticker": ticker,
+        "company_name": name,
+        "company_top_themes": ["theme1", "theme2"],
+        "company_description": f"{name} description",
+    }
+
+
+def write_lines(file_path, lines):
+    with jsonlines.open(file_path, "w") as writer:
+        writer.write_all(lines)
+
+
+def load_companies(target_engine):
+    with sessionmaker(bind=target_engine)() as db:
+        return {
+            company.company_ticker: company.to_json()
+            for company in db.query(CompaniesTable).all()
+        }
+
+
+class TestingBulkLoadCompanies:
+    def testing_replaces_companies(self, tmp_path):
+        target_engine = create_engine(f"sqlite:///{tmp_path / 'companies.db'}")
+        file_path = str(tmp_path / "output.jsonl")
+        write_lines(file_path, [company_line("OLD", "Old")])
+        bulk_load_companies(file_path, target_engine=target_engine)
+
+        write_lines(
+            file_path,
+            [
+                company_line("AAPL", "Apple"),
+                company_line("TSLA", "Tesla"),
+                company_line("AAPL", "Apple 2"),
+            ],
+        )
+        load_statistics = bulk_load_companies(
+            file_path, chunk_size=2, target_engine=target_engine
+        )
+
+        assert load_statistics["row_count"] == 3
+        companies = load_companies(target_engine)
+        assert list(sorted(companies.keys())) == ["AAPL", "TSLA"]
+        # The last line of a repeated ticker wins, as with a per-row merge
+        assert companies["AAPL"]["company_name"] == "Apple 2"
+        assert json.loads(companies["AAPL"]["company_top_themes"]) == [
+            "theme1",
+            "theme2",
+        ]
+        inspector = inspect(target_engine)
+        assert "companies_staging" not in inspector.get_table_names()
+        assert [index["name"] for index in inspector.get_indexes("companies")] == [
+            "ix_companies_company_ticker"
+        ]
+
+    def testing_failed_load_keeps_companies(self, tmp_path):
+        target_engine = create_engine(f"sqlite:///{tmp_path / 'companies.db'}")
+        file_path = str(tmp_path / "output.jsonl")
+        write_lines(file_path, [company_line("AAPL", "Apple")])
+        bulk_load_companies(file_path, target_engine=target_engine)
+
+        write_lines(file_path, [company_line("TSLA", "Tesla"), {"company_ticker": "X"}])
+        with pytest.raises(Exception):
+            bulk_load_companies(file_path, chunk_size=1, target_engine=target_engine)
+
+        assert list(load_companies(target_engine).keys()) == ["AAPL"]
+        assert "companies_staging" not in inspect(target_engine).get_table_names()
+
+    def testing_is_loaded(self, tmp_path):
+        target_engine = create_engine(f"sqlite:///{tmp_path / 'companies.db'}")
+        file_path = str(tmp_path / "output.jsonl")
+        write_lines(file_path, [company_line("AAPL", "Apple")])
+
+        bulk_load_companies(file_path, target_engine=target_engine)
+        assert is_loaded(file_path, target_engine)
+
+        write_lines(file_path, [company_line("AAPL", "Apple"), company_line("B", "B")])
+        assert not is_loaded(file_path, target_engine)
+
+    def testing_loads_columnar_output(self, tmp_path, mocker):
+        mocker.patch("utils.columnar_output.pyarrow", None)
+        target_engine = create_engine(f"sqlite:///{tmp_path / 'companies.db'}")
+        writer = ColumnarOutputWriter(str(tmp_path), ["theme1", "theme2"])
+        writer.append({"AAPL": company_line("AAPL", "Apple")})
+        writer.append({"TSLA": company_line("TSLA", "Tesla")})
+        file_path = writer.close()
+
+        load_statistics = bulk_load_companies(
+            file_path, chunk_size=1, target_engine=target_engine
+        )
+
+        assert load_statistics["row_count"] == 2
+        companies = load_companies(target_engine)
+        assert companies["TSLA"]["company_name"] == "Tesla"
+        assert json.loads(companies["AAPL"]["company_top_themes"]) == [
+            "theme1",
+            "theme2",
+        ]
+
+
+class TestingProcessedDataSource:
+    def testing_prefers_newer_columnar_output(self, tmp_path, mocker):
+        mocker.patch("utils.columnar_output.pyarrow", None)
+        file_path = str(tmp_path / "output.jsonl")
+        write_lines(file_path, [company_line("AAPL", "Apple")])
+        assert processed_data_source(file_path) == file_path
+
+        writer = ColumnarOutputWriter(str(tmp_path), ["theme1", "theme2"])
+        writer.append({"AAPL": company_line("AAPL", "Apple")})
+        columnar_path = writer.close()
+        assert processed_data_source(file_path) == columnar_path
+
+        # A later run without the columnar output leaves it stale
+        columnar_mtime_ns = os.stat(columnar_path).st_mtime_ns
+        os.utime(file_path, ns=(columnar_mtime_ns + 1, columnar_mtime_ns + 1))
+        assert processed_data_source(file_path) == file_path
+
+
+class TestingUpsertCompanies:
+    def testing_upserts_and_removes_companies(self, tmp_path):
+        target_engine = create_engine(f"sqlite:///{tmp_path / 'companies.db'}")
+        file_path = str(tmp_path / "output.jsonl")
+        write_lines(file_path, [company_line("AAPL", "Apple")])
+        bulk_load_companies(file_path, target_engine=target_engine)
+
+        write_lines(
+            file_path, [company_line("AAPL", "Apple 2"), company_line("WMT", "Walmart")]
+        )
+        row_count = upsert_companies(
+            [company_line("AAPL", "Apple 2"), company_line("WMT", "Walmart")],
+            ["TSLA"],
+            file_path,
+            target_engine,
+        )
+        assert row_count == 2
+        assert is_loaded(file_path, target_engine)
+
+        row_count = upsert_companies([], ["AAPL"], file_path, target_engine)
+
+        assert row_count == 1
+        companies = load_companies(target_engine)
+        assert list(companies.keys()) == ["WMT"]
+        assert json.loads(companies["WMT"]["company_top_themes"]) == [
+            "theme1",
+            "theme2",
+        ]
@@ -0,0 +1,120 @@
+import os
+
+import numpy
+
+from utils.embedding_cache import EmbeddingCache
+
+
+class TestingEmbeddingCache:
+    def testing_roundtrip_between_runs(self, tmp_path):
+        embedding_cache = EmbeddingCache(str(tmp_path), "test-model", 10)
+        embedding_cache.put_many(["first text", "second text"], numpy.eye(2))
+        embedding_cache.save()
+
+        next_run_cache = EmbeddingCache(str(tmp_path), "test-model", 10)
+        result = next_run_cache.get_many(["second   text", "third text", "first text"])
+
+        assert result[0].tolist() == [0.0, 1.0]
+        assert result[1] is None
+        assert result[2].tolist() == [1.0, 0.0]
+        assert (next_run_cache.hits, next_run_cache.misses) == (2, 1)
+
+    def testing_key_depends_on_model_name(self, tmp_path):
+        embedding_cache = EmbeddingCache(str(tmp_path), "test-model", 10)
+        other_model_cache = EmbeddingCache(str(tmp_path), "other-model", 10)
+        assert embedding_cache.key("text") != other_model_cache.key("text")
+        assert embedding_cache.key("some  text\n") == embedding_cache.key("some text")
+
+    def testing_evicts_least_recently_used(self, tmp_path):
+        embedding_cache = EmbeddingCache(str(tmp_path), "test-model", 2)
+        embedding_cache.put_many(["a", "b"], numpy.array([[1.0], [2.0]]))
+        embedding_cache.save()
+
+        next_run_cache = EmbeddingCache(str(tmp_path), "test-model", 2)
+        next_run_cache.get_many(["b"])
+        next_run_cache.put_many(["c"], numpy.array([[3.0]]))
+        next_run_cache.save()
+
+        assert next_run_cache.evicted == 1
+        last_run_cache = EmbeddingCache(str(tmp_path), "test-model", 2)
+        result = last_run_cache.get_many(["a", "b", "c"])
+        assert result[0] is None
+        assert [encoding.tolist() for encoding in result[1:]] == [[2.0], [3.0]]
+        assert last_run_cache.count_stored_rows() == 2
+
+    def testing_keys_ending_in_null_bytes_survive_save(self, tmp_path):
+        embedding_cache = EmbeddingCache(str(tmp_path), "test-model", 10)
+        embedding_cache.key = lambda description: description.encode("utf-8").ljust(
+            32, b"\0"
+        )
+        embedding_cache.put_many(["a"], numpy.array([[1.0]]))
+        embedding_cache.save()
+
+        next_run_cache = EmbeddingCache(str(tmp_path), "test-model", 10)
+        assert b"a".ljust(32, b"\0") in next_run_cache.rows
+
+    def testing_dimension_change_clears_cache(self, tmp_path):
+        embedding_cache = EmbeddingCache(str(tmp_path), "test-model", 10)
+        embedding_cache.put_many(["a"], numpy.array([[1.0, 2.0]]))
+        embedding_cache.put_many(["b"], numpy.array([[1.0, 2.0, 3.0]]))
+
+        result = embedding_cache.get_many(["a", "b"])
+        assert result[0] is None
+        assert result[1].tolist() == [1.0, 2.0, 3.0]
+
+    def testing_skips_cached_and_repeated_descriptions(self, tmp_path):
+        embedding_cache = EmbeddingCache(str(tmp_path), "test-model", 10)
+        embedding_cache.put_many(["a", "b", "a"], numpy.array([[1.0], [2.0], [1.0]]))
+        embedding_cache.put_many(["b", "c"], numpy.array([[2.0], [3.0]]))
+
+        assert embedding_cache.count_stored_rows() == 3
+        result = embedding_cache.get_many(["a", "b", "c"])
+        assert [encoding.tolist() for encoding in result] == [[1.0], [2.0], [3.0]]
+
+    def testing_compacts_rows_left_by_a_crashed_run(self, tmp_path):
+        embedding_cache = EmbeddingCache(str(tmp_path), "test-model", 10)
+        embedding_cache.put_many(["a"], numpy.array([[1.0]]))
+        embedding_cache.save()
+        # A run that crashed before saving its index
+        crashed_run_cache = EmbeddingCache(str(tmp_path), "test-model", 10)
+        crashed_run_cache.put_many(["b", "c", "d"], numpy.array([[2.0], [3.0], [4.0]]))
+
+        next_run_cache = EmbeddingCache(str(tmp_path), "test-model", 10)
+        assert next_run_cache.count_stored_rows() == 4
+        next_run_cache.save()
+
+        assert next_run_cache.count_stored_rows() == 1
+        last_run_cache = EmbeddingCache(str(tmp_path), "test-model", 10)
+        assert last_run_cache.get_many(["a"])[0].tolist() == [1.0]
+
+    def testing_bounds_the_file_during_a_run(self, tmp_path):
+        embedding_cache = EmbeddingCache(str(tmp_path), "test-model", 2)
+        for index in range(10):
+            embedding_cache.put_many([f"text {index}"], numpy.array([[float(index)]]))
+            assert embedding_cache.count_stored_rows() <= 4
+
+        assert len(embedding_cache.rows) <= 4
+        result = embedding_cache.get_many(["text 8", "text 9"])
+        assert [encoding.tolist() for encoding in result] == [[8.0], [9.0]]
+
+    def testing_compaction_during_a_run_that_does_not_save(self, tmp_path):
+        embedding_cache = EmbeddingCache(str(tmp_path), "test-model", 2)
+        embedding_cache.put_many(["a", "b"], numpy.array([[1.0], [2.0]]))
+        embedding_cache.save()
+        # A run that compacts the file, then stops before saving its index
+        crashed_run_cache = EmbeddingCache(str(tmp_path), "test-model", 2)
+        crashed_run_cache.get_many(["a", "b"])
+        for index in range(3, 6):
+            crashed_run_cache.put_many([f"{index}"], numpy.array([[float(index)]]))
+        assert crashed_run_cache.generation == 1
+
+        next_run_cache = EmbeddingCache(str(tmp_path), "test-model", 2)
+        result = next_run_cache.get_many(["a", "b", "3", "4", "5"])
+
+        for encoding, expected in zip(result, [1.0, 2.0, 3.0, 4.0, 5.0]):
+            assert encoding is None or encoding.tolist() == [expected]
+        assert sorted(os.listdir(tmp_path)) == [
+            "embeddings-1.f32",
+            "index-1.npy",
+            "metadata.json",
+        ]
@@ -0,0 +1,59 @@
+import numpy
+import pytest
+
+from utils.encoder_pool import EncoderPool
+from utils.stub_encoder import StubEncoder
+
+
+class FailingEncoder:
+    def __init__(self):
+        raise OSError("no model weights")
+
+
+@pytest.fixture(scope="module")
+def encoder_pool():
+    encoder_pool = EncoderPool(StubEncoder, 2, 1)
+    yield encoder_pool
+    encoder_pool.close()
+
+
+class TestingEncoderPool:
+    def testing_encodes_in_order_across_workers(self, encoder_pool):
+        sentences = [f"word{index} shared {index % 3}" for index in range(50)]
+
+        encodings = encoder_pool.encode(sentences, batch_size=4)
+
+        assert encodings.dtype == numpy.float32
+        numpy.testing.assert_array_equal(encodings, StubEncoder().encode(sentences))
+
+    def testing_grows_the_shared_memory(self, encoder_pool):
+        encoder_pool.encode(["a"], batch_size=4)
+        sentences = [f"word{index}" for index in range(3 * encoder_pool.row_capacity)]
+
+        encodings = encoder_pool.encode(sentences, batch_size=4, convert_to_tensor=True)
+
+        assert encoder_pool.row_capacity >= len(sentences)
+        numpy.testing.assert_array_equal(
+            encodings.numpy(), StubEncoder().encode(sentences)
+        )
+
+    def testing_no_sentences(self, encoder_pool):
+        assert encoder_pool.encode([], batch_size=4).shape == (0, 384)
+
+    def testing_close_releases_workers_and_memory(self):
+        encoder_pool = EncoderPool(StubEncoder, 1, 1)
+        assert not encoder_pool.is_started
+        encoder_pool.encode(["a"])
+        workers = encoder_pool.workers
+
+        encoder_pool.close()
+
+        assert not encoder_pool.is_started and encoder_pool.block is None
+        assert not any(worker.is_alive() for worker in workers)
+
+    def testing_worker_failure_is_raised(self):
+        encoder_pool = EncoderPool(FailingEncoder, 1, 1)
+
+        with pytest.raises(RuntimeError, match="no model weights"):
+            encoder_pool.encode(["a"])
+        assert not encoder_pool.is_started
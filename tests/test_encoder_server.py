@@ -0,0 +1,204 @@
+import asyncio
+import os
+import socket
+import tempfile
+import threading
+import time
+
+import numpy
+import pytest
+
+from A_process_data_pipeline import encode_descriptions
+from utils.encoder_server import (
+    EncoderClient,
+    EncoderServer,
+    connect_to_server,
+    remove_stale_socket,
+    send_request,
+)
+from utils.stub_encoder import StubEncoder
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(socket, "AF_UNIX"), reason="needs Unix domain sockets"
+)
+
+
+class FailingEncoder:
+    def encode(self, sentences, **kwargs):
+        raise ValueError("model failed")
+
+
+@pytest.fixture
+def socket_path():
+    # Kept short, as Unix domain socket paths are limited to about 100 characters
+    with tempfile.TemporaryDirectory() as directory:
+        yield os.path.join(directory, "encoder.sock")
+
+
+@pytest.fixture
+def run_server(socket_path):
+    encoder_servers = []
+
+    def run(model=None, model_name="test-model", max_wait_seconds=0.01):
+        encoder_server = EncoderServer(
+            socket_path,
+            model or StubEncoder(dimension=16),
+            model_name,
+            max_batch_size=8,
+            max_wait_seconds=max_wait_seconds,
+        )
+        thread = threading.Thread(
+            target=asyncio.run, args=(encoder_server.serve(),), daemon=True
+        )
+        thread.start()
+        assert encoder_server.ready.wait(5)
+        encoder_servers.append((encoder_server, thread))
+        return encoder_server
+
+    yield run
+    for encoder_server, thread in encoder_servers:
+        encoder_server.stop()
+        thread.join(5)
+
+
+class TestingEncoderServer:
+    def testing_client_encodes_like_the_model(self, socket_path, run_server):
+        run_server()
+        encoder_client = EncoderClient(socket_path, "test-model", FailingEncoder())
+        sentences = [f"word{index} shared {index % 3}" for index in range(20)]
+
+        encodings = encoder_client.encode(sentences, batch_size=4)
+        tensor_encodings = encoder_client.encode(sentences[:3], convert_to_tensor=True)
+
+        assert encoder_client.is_connected
+        numpy.testing.assert_array_equal(
+            encodings, StubEncoder(dimension=16).encode(sentences)
+        )
+        numpy.testing.assert_array_equal(
+            tensor_encodings.numpy(), StubEncoder(dimension=16).encode(sentences[:3])
+        )
+        encoder_client.close()
+
+    def testing_pipeline_encodes_through_the_server(self, socket_path, run_server):
+        run_server()
+        encoder_client = EncoderClient(socket_path, "test-model", FailingEncoder())
+        descriptions = ["a", "a b c", "a b", "a b c d", "e"]
+
+        encodings = encode_descriptions(encoder_client, descriptions, 2)
+
+        expected = encode_descriptions(StubEncoder(dimension=16), descriptions, 2)
+        assert all(
+            encoding.tolist() == expected_encoding.tolist()
+            for encoding, expected_encoding in zip(encodings, expected)
+        )
+
+    def testing_coalesces_requests_into_one_model_call(self):
+        calls = []
+
+        class RecordingEncoder(StubEncoder):
+            def encode(self, sentences, batch_size=32, **kwargs):
+                calls.append((list(sentences), batch_size))
+                return super().encode(sentences, batch_size, **kwargs)
+
+        encoder_server = EncoderServer("unused.sock", RecordingEncoder(16), "test")
+
+        request_encodings = encoder_server.encode_batch(
+            [(["a b"], 1), (["c", "d e"], 2)]
+        )
+
+        assert calls == [(["a b", "c", "d e"], 3)]
+        numpy.testing.assert_array_equal(
+            request_encodings[1], StubEncoder(16).encode(["c", "d e"])
+        )
+        # A request alone keeps its batch size
+        encoder_server.encode_batch([(["a", "b", "c"], 2)])
+        assert calls[-1] == (["a", "b", "c"], 2)
+
+    def testing_metrics(self, socket_path, run_server):
+        encoder_server = run_server(max_wait_seconds=0.2)
+        encoder_clients = [
+            EncoderClient(socket_path, "test-model", FailingEncoder()) for _ in range(3)
+        ]
+        threads = [
+            threading.Thread(
+                target=encoder_client.encode, args=([f"sentence {index}", "more"],)
+            )
+            for index, encoder_client in enumerate(encoder_clients)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+
+        with connect_to_server(socket_path) as connection:
+            metrics = send_request(connection, {"op": "metrics"})[0]["metrics"]
+
+        assert metrics["model_name"] == "test-model"
+        assert (metrics["request_count"], metrics["size_count"]) == (3, 6)
+        # Concurrent requests that fit in one batch are encoded together
+        assert metrics["batch_count"] < 3
+        assert metrics["queue_depth"] == 0
+        assert encoder_server.batcher.item_count == 3
+        for encoder_client in encoder_clients:
+            encoder_client.close()
+
+    def testing_model_error_is_raised(self, socket_path, run_server):
+        run_server(model=FailingEncoder())
+        encoder_client = EncoderClient(socket_path, "test-model", StubEncoder(16))
+
+        with pytest.raises(RuntimeError, match="model failed"):
+            encoder_client.encode(["a"])
+        # The connection is kept for the next requests
+        assert encoder_client.is_connected
+        encoder_client.close()
+
+    def testing_refuses_a_running_server_socket(self, socket_path, run_server):
+        run_server()
+        with pytest.raises(RuntimeError, match="already running"):
+            remove_stale_socket(socket_path)
+
+    def testing_removes_a_stale_socket(self, socket_path):
+        stale_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale_socket.bind(socket_path)
+        stale_socket.close()
+
+        remove_stale_socket(socket_path)
+
+        assert not os.path.exists(socket_path)
+
+
+class TestingEncoderClient:
+    def testing_falls_back_without_server(self, socket_path):
+        encoder_client = EncoderClient(socket_path, "test-model", StubEncoder(16))
+
+        encodings = encoder_client.encode(["a b", "c"])
+
+        assert encoder_client.use_fallback and not encoder_client.is_connected
+        numpy.testing.assert_array_equal(
+            encodings, StubEncoder(16).encode(["a b", "c"])
+        )
+
+    def testing_falls_back_on_another_model(self, socket_path, run_server):
+        run_server(model_name="other-model")
+        fallback = StubEncoder(8)
+        encoder_client = EncoderClient(socket_path, "test-model", fallback)
+
+        encodings = encoder_client.encode(["a b"])
+
+        assert encoder_client.use_fallback
+        assert encodings.shape == (1, 8)
+
+    def testing_falls_back_when_the_server_stops(self, socket_path, run_server):
+        encoder_server = run_server()
+        encoder_client = EncoderClient(socket_path, "test-model", StubEncoder(16))
+        encoder_client.encode(["a"])
+        encoder_server.stop()
+
+        for _ in range(100):
+            encodings = encoder_client.encode(["a b"])
+            if encoder_client.use_fallback:
+                break
+            time.sleep(0.05)
+
+        assert encoder_client.use_fallback
+        numpy.testing.assert_array_equal(encodings, StubEncoder(16).encode(["a b"]))
@@ -0,0 +1,40 @@
+from bs4 import BeautifulSoup
+
+from utils.html_tokenizer import has_ambiguous_references, parse_simple_html
+
+
+class TestingParseSimpleHtml:
+    def testing_tags_and_texts(self):
+        document = parse_simple_html(
+            "<HTML><HEAD><TITLE>a &amp; b</TITLE></HEAD><BODY><P>x<B>y</B></P></BODY></HTML>"
+        )
+        assert document.tag_names == ["html", "head", "title", "body", "p", "b"]
+        assert document.text("title") == "a & b"
+        assert document.text("p") == "xy"
+        assert document.enclosing_tags["b"] == ("html", "body", "p")
+
+    def testing_rejects_comments(self):
+        assert parse_simple_html("<p><!-- hidden -->text</p>") is None
+
+    def testing_rejects_mismatched_and_unclosed_tags(self):
+        assert parse_simple_html("<p><b>text</p></b>") is None
+        assert parse_simple_html("<p>text") is None
+
+
+class TestingHasAmbiguousReferences:
+    def testing_references_decoded_the_same_as_beautifulsoup(self):
+        for text in ["R&D", "AT&T", "A & B", "&amp;", "&#8217;", "&#x2019;", "&copy;"]:
+            assert not has_ambiguous_references(text)
+            html_content = f"<p>{text}</p>"
+            assert parse_simple_html(html_content).text("p") == (
+                BeautifulSoup(html_content, "html.parser").p.text
+            )
+
+    def testing_references_that_may_differ(self):
+        for text in ["P&G;", "&ltx", "&notit", "&#0;", "&#xD800;", "&#65", "&#;"]:
+            assert has_ambiguous_references(text)
+
+    def testing_names_known_only_with_a_semicolon(self):
+        for text in ["R&in consumer", "&ne ", "&le ", "&ic ", "&Dagger "]:
+            assert has_ambiguous_references(text)
+            assert parse_simple_html(f"<p>{text}</p>") is None
@@ -0,0 +1,94 @@
+import os
+
+from utils.input_manifest import InputManifest, hash_file
+
+
+def write_file(directory, name, content):
+    with open(os.path.join(directory, name), "w", encoding="utf-8") as file:
+        file.write(content)
+
+
+class TestingHashFile:
+    def testing_same_content_same_hash(self, tmp_path):
+        write_file(tmp_path, "a.html", "content")
+        write_file(tmp_path, "b.html", "content")
+        assert hash_file(tmp_path / "a.html") == hash_file(tmp_path / "b.html")
+
+
+class TestingInputManifest:
+    def testing_first_run_reports_every_file(self, tmp_path):
+        write_file(tmp_path, "a.html", "a")
+        write_file(tmp_path, "b.html", "b")
+        manifest = InputManifest(str(tmp_path / "manifest.json"))
+
+        changed_files, stale_tickers, deleted_file_count = manifest.refresh(
+            str(tmp_path), ["a.html", "b.html"]
+        )
+
+        assert not manifest.exists
+        assert changed_files == ["a.html", "b.html"]
+        assert stale_tickers == []
+        assert deleted_file_count == 0
+
+    def testing_changed_and_deleted_files(self, tmp_path):
+        for name in ["a.html", "b.html", "c.html"]:
+            write_file(tmp_path, name, name)
+        manifest = InputManifest(str(tmp_path / "manifest.json"))
+        manifest.refresh(str(tmp_path), ["a.html", "b.html", "c.html"])
+        manifest.record_company("a.html", "AAA")
+        manifest.record_company("b.html", "BBB")
+        manifest.record_company("c.html", "CCC")
+        manifest.save()
+
+        write_file(tmp_path, "b.html", "b changed")
+        write_file(tmp_path, "d.html", "d")
+        os.utime(tmp_path / "c.html", ns=(0, 0))
+        next_manifest = InputManifest(str(tmp_path / "manifest.json"))
+        changed_files, stale_tickers, deleted_file_count = next_manifest.refresh(
+            str(tmp_path), ["b.html", "c.html", "d.html"]
+        )
+
+        assert next_manifest.exists
+        assert changed_files == ["b.html", "d.html"]
+        assert sorted(stale_tickers) == ["AAA", "BBB"]
+        assert deleted_file_count == 1
+        assert next_manifest.company_files == {"CCC": ["c.html"]}
+
+    def testing_ticker_of_several_files_is_rebuilt_from_the_remaining_ones(
+        self, tmp_path
+    ):
+        for name in ["a.html", "b.html", "c.html"]:
+            write_file(tmp_path, name, name)
+        manifest = InputManifest(str(tmp_path / "manifest.json"))
+        manifest.refresh(str(tmp_path), ["a.html", "b.html", "c.html"])
+        manifest.record_company("a.html", "AAA")
+        manifest.record_company("b.html", "AAA")
+        manifest.record_company("c.html", "CCC")
+        file_order = {"a.html": 0, "b.html": 1, "c.html": 2}
+        assert manifest.source_file("AAA", file_order) == "b.html"
+        manifest.save()
+
+        os.remove(tmp_path / "b.html")
+        next_manifest = InputManifest(str(tmp_path / "manifest.json"))
+        changed_files, stale_tickers, deleted_file_count = next_manifest.refresh(
+            str(tmp_path), ["a.html", "c.html"]
+        )
+
+        # The unchanged file that still produces the ticker is processed again
+        assert (changed_files, stale_tickers, deleted_file_count) == (
+            ["a.html"],
+            ["AAA"],
+            1,
+        )
+        assert next_manifest.company_files == {"AAA": ["a.html"], "CCC": ["c.html"]}
+        assert next_manifest.source_file("AAA", file_order) == "a.html"
+
+    def testing_file_producing_another_ticker(self, tmp_path):
+        write_file(tmp_path, "a.html", "a")
+        manifest = InputManifest(str(tmp_path / "manifest.json"))
+        manifest.refresh(str(tmp_path), ["a.html"])
+        manifest.record_company("a.html", "AAA")
+
+        manifest.record_company("a.html", "BBB")
+
+        assert manifest.company_files == {"BBB": ["a.html"]}
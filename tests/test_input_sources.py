@@ -0,0 +1,113 @@
+import io
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from utils.input_manifest import InputManifest
+from utils.input_sources import (
+    hash_input_file,
+    input_file_signature,
+    iterate_input_files,
+    read_input_file,
+)
+
+
+def write_file(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(content)
+
+
+def write_zip(path, members):
+    with zipfile.ZipFile(path, "w") as archive:
+        for member_name, content in members.items():
+            archive.writestr(member_name, content)
+
+
+def write_tar(path, members):
+    with tarfile.open(path, "w:gz") as archive:
+        for member_name, content in members.items():
+            data = content.encode("utf-8")
+            member = tarfile.TarInfo(member_name)
+            member.size = len(data)
+            archive.addfile(member, io.BytesIO(data))
+
+
+@pytest.fixture
+def input_directory(tmp_path):
+    write_file(tmp_path / "apple.html", "apple")
+    write_file(tmp_path / "notes.html.bak", "not a company file")
+    write_file(tmp_path / "2024" / "q1" / "tesla.HTML", "tesla")
+    write_zip(
+        tmp_path / "vendor.zip",
+        {"bundle/ford.html": "ford", "bundle/readme.txt": "readme"},
+    )
+    write_tar(tmp_path / "2024" / "vendor.tar.gz", {"gm.htm": "gm ü"})
+    return str(tmp_path)
+
+
+class TestingIterateInputFiles:
+    def testing_nested_directories_and_archives(self, input_directory):
+        assert sorted(iterate_input_files(input_directory)) == [
+            "2024/q1/tesla.HTML",
+            "2024/vendor.tar.gz/gm.htm",
+            "apple.html",
+            "vendor.zip/bundle/ford.html",
+        ]
+
+    def testing_flat_directory_in_listdir_order(self, tmp_path):
+        for name in ["b.html", "a.html", "c.html"]:
+            write_file(tmp_path / name, name)
+
+        assert list(iterate_input_files(str(tmp_path))) == [
+            name for name in os.listdir(tmp_path) if name.endswith(".html")
+        ]
+
+
+class TestingReadInputFile:
+    def testing_reads_plain_files_and_archive_members(self, input_directory):
+        assert read_input_file(input_directory, "apple.html") == "apple"
+        assert read_input_file(input_directory, "2024/q1/tesla.HTML") == "tesla"
+        assert read_input_file(input_directory, "vendor.zip/bundle/ford.html") == "ford"
+        assert read_input_file(input_directory, "2024/vendor.tar.gz/gm.htm") == "gm ü"
+
+    def testing_missing_member(self, input_directory):
+        with pytest.raises(KeyError):
+            read_input_file(input_directory, "vendor.zip/missing.html")
+
+    def testing_signature_and_hash(self, input_directory):
+        plain_file = os.path.join(input_directory, "apple.html")
+        assert input_file_signature(input_directory, "apple.html") == (
+            os.stat(plain_file).st_size,
+            os.stat(plain_file).st_mtime_ns,
+        )
+        assert input_file_signature(input_directory, "vendor.zip/bundle/ford.html") == (
+            4,
+            os.stat(os.path.join(input_directory, "vendor.zip")).st_mtime_ns,
+        )
+        assert hash_input_file(
+            input_directory, "vendor.zip/bundle/ford.html"
+        ) != hash_input_file(input_directory, "apple.html")
+
+
+class TestingInputManifestWithArchives:
+    def testing_changed_archive_member(self, tmp_path):
+        input_directory = tmp_path / "companies"
+        input_directory.mkdir()
+        archive_path = input_directory / "vendor.zip"
+        write_zip(archive_path, {"a.html": "a", "b.html": "b"})
+        manifest = InputManifest(str(tmp_path / "manifest.json"))
+        html_files = list(iterate_input_files(str(input_directory)))
+        manifest.refresh(str(input_directory), html_files)
+
+        write_zip(archive_path, {"a.html": "a", "b.html": "changed"})
+        stat = os.stat(archive_path)
+        os.utime(archive_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        changed_files, _, deleted_file_count = manifest.refresh(
+            str(input_directory), html_files
+        )
+
+        assert changed_files == ["vendor.zip/b.html"]
+        assert deleted_file_count == 0
@@ -0,0 +1,54 @@
+from unittest.mock import MagicMock, patch
+
+from constants.data_constants import ENCODER_BACKEND
+from utils.lazy_model import (
+    LazySentenceTransformer,
+    encoder_model_name,
+    split_encoder_model_name,
+)
+
+
+class TestingLazySentenceTransformer:
+    def testing_loads_model_on_first_encode(self):
+        with patch("sentence_transformers.SentenceTransformer") as mock_model_class:
+            mock_model_class.return_value.encode.return_value = "encodings"
+            model = LazySentenceTransformer("model name", MagicMock())
+
+            assert not model.is_loaded
+            mock_model_class.assert_not_called()
+
+            assert model.encode(["a"], batch_size=1) == "encodings"
+            model.encode(["b"], batch_size=1)
+
+        assert model.is_loaded
+        mock_model_class.assert_called_once_with("model name")
+        mock_model_class.return_value.encode.assert_called_with(["b"], batch_size=1)
+
+    def testing_int8_backend_quantizes_on_cpu(self):
+        with patch(
+            "sentence_transformers.SentenceTransformer"
+        ) as mock_model_class, patch(
+            "torch.ao.quantization.quantize_dynamic"
+        ) as mock_quantize_dynamic:
+            model = LazySentenceTransformer(
+                "model name", encoder_backend=ENCODER_BACKEND.TORCH_INT8.value
+            )
+            model.encode(["a"])
+
+        mock_model_class.assert_called_once_with("model name", device="cpu")
+        mock_quantize_dynamic.return_value.encode.assert_called_once_with(["a"])
+
+
+class TestingEncoderModelName:
+    def testing_backends_do_not_share_names(self):
+        assert encoder_model_name("model", ENCODER_BACKEND.TORCH.value) == "model"
+        assert (
+            encoder_model_name("model", ENCODER_BACKEND.TORCH_INT8.value)
+            == "model@torch-int8"
+        )
+
+    def testing_split_name(self):
+        for encoder_backend in ENCODER_BACKEND:
+            assert split_encoder_model_name(
+                encoder_model_name("org/model", encoder_backend.value)
+            ) == ("org/model", encoder_backend.value)
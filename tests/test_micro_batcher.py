@@ -0,0 +1,80 @@
+import asyncio
+import threading
+
+from utils.micro_batcher import MicroBatcher
+
+
+class TestingMicroBatcher:
+    def testing_coalesces_concurrent_items(self):
+        batches = []
+        batch_threads = set()
+
+        def process_batch(items):
+            batches.append(items)
+            batch_threads.add(threading.current_thread().name)
+            return [item * 10 for item in items]
+
+        micro_batcher = MicroBatcher(process_batch, 4, 0.05)
+
+        async def submit_all():
+            return await asyncio.gather(
+                *[micro_batcher.submit(item) for item in range(6)]
+            )
+
+        assert asyncio.run(submit_all()) == [0, 10, 20, 30, 40, 50]
+        assert batches == [[0, 1, 2, 3], [4, 5]]
+        # Batches are processed off the event loop
+        assert batch_threads != {threading.current_thread().name}
+        assert (micro_batcher.batch_count, micro_batcher.item_count) == (2, 6)
+
+    def testing_does_not_wait_past_max_wait(self):
+        micro_batcher = MicroBatcher(lambda items: items, 100, 0.01)
+
+        async def submit_one():
+            return await asyncio.wait_for(micro_batcher.submit("a"), 5)
+
+        assert asyncio.run(submit_one()) == "a"
+        # A new event loop starts a new worker
+        assert asyncio.run(submit_one()) == "a"
+
+    def testing_failed_batch_fails_its_items(self):
+        def process_batch(items):
+            raise ValueError("model failed")
+
+        micro_batcher = MicroBatcher(process_batch, 4, 0.01)
+
+        async def submit_two():
+            return await asyncio.gather(
+                micro_batcher.submit(1),
+                micro_batcher.submit(2),
+                return_exceptions=True,
+            )
+
+        results = asyncio.run(submit_two())
+        assert all(isinstance(result, ValueError) for result in results)
+        assert [str(result) for result in results] == ["model failed"] * 2
+
+    def testing_batches_by_item_size(self):
+        batches = []
+
+        def process_batch(items):
+            batches.append(items)
+            return [len(item) for item in items]
+
+        micro_batcher = MicroBatcher(process_batch, 4, 0.05, item_size=len)
+
+        async def submit_all():
+            return await asyncio.gather(
+                *[
+                    micro_batcher.submit(item)
+                    for item in ["ab", "c", "def", "ghijk", "l"]
+                ]
+            )
+
+        assert asyncio.run(submit_all()) == [2, 1, 3, 5, 1]
+        # An item that would overflow a batch starts the next one, and an oversized item is alone
+        assert batches == [["ab", "c"], ["def"], ["ghijk"], ["l"]]
+        metrics = micro_batcher.metrics()
+        assert (metrics["batch_count"], metrics["item_count"]) == (4, 5)
+        assert (metrics["size_count"], metrics["mean_batch_size"]) == (12, 3.0)
+        assert metrics["queue_depth"] == 0
@@ -0,0 +1,64 @@
+import os
+from unittest.mock import patch
+
+import numpy
+import pytest
+
+from utils.online_classifier import OnlineClassifier
+from utils.stub_encoder import StubEncoder
+from utils.theme_matrix import ThemeMatrix
+
+THEME_DESCRIPTIONS = {
+    "electric-vehicles": "electric cars and batteries",
+    "solar-energy": "solar panels and renewable energy",
+    "retail": "stores selling groceries",
+}
+
+
+def save_theme_matrix(file_path, theme_descriptions, model_name="test-model"):
+    encodings = StubEncoder(dimension=32).encode(list(theme_descriptions.values()))
+    matrix = encodings / numpy.linalg.norm(encodings, axis=1, keepdims=True)
+    ThemeMatrix(list(theme_descriptions), matrix, "hash", model_name).save(file_path)
+
+
+class TestingOnlineClassifier:
+    def testing_top_themes_with_scores(self, tmp_path):
+        file_path = str(tmp_path / "theme_matrix.npz")
+        save_theme_matrix(file_path, THEME_DESCRIPTIONS)
+        online_classifier = OnlineClassifier(file_path)
+
+        with patch.object(
+            online_classifier, "load_model", return_value=StubEncoder(dimension=32)
+        ) as mock_load_model:
+            top_themes = online_classifier.classify(
+                ["electric cars", "rooftop solar panels"], 2
+            )
+            online_classifier.classify(["groceries"], 1)
+
+        assert [[theme for theme, _ in themes] for themes in top_themes] == [
+            ["electric-vehicles", "solar-energy"],
+            ["solar-energy", "electric-vehicles"],
+        ]
+        assert top_themes[0][0][1] > top_themes[0][1][1]
+        assert top_themes[0][0][1] == pytest.approx(2 / (2**0.5 * 4**0.5))
+        # The model named by the matrix is loaded once and kept
+        mock_load_model.assert_called_once_with("test-model")
+
+    def testing_reloads_replaced_theme_matrix(self, tmp_path):
+        file_path = str(tmp_path / "theme_matrix.npz")
+        save_theme_matrix(file_path, THEME_DESCRIPTIONS)
+        online_classifier = OnlineClassifier(file_path)
+        assert online_classifier.current_theme_matrix().theme_names[0] == (
+            "electric-vehicles"
+        )
+
+        save_theme_matrix(file_path, {"retail": "stores selling groceries"})
+        os.utime(file_path, ns=(1, 1))
+
+        assert online_classifier.current_theme_matrix().theme_names == ["retail"]
+
+    def testing_missing_theme_matrix(self, tmp_path):
+        online_classifier = OnlineClassifier(str(tmp_path / "theme_matrix.npz"))
+
+        with pytest.raises(FileNotFoundError):
+            online_classifier.current_theme_matrix()
@@ -0,0 +1,69 @@
+import threading
+
+from utils.prefetch_reader import PrefetchingFileReader
+
+
+class TestingPrefetchingFileReader:
+    def testing_reads_in_order(self, tmp_path):
+        file_names = [f"file{index}.html" for index in range(20)]
+        for file_name in file_names:
+            (tmp_path / file_name).write_text(f"content of {file_name}")
+        html_reader = PrefetchingFileReader(str(tmp_path), 4, 3)
+
+        read_files = list(html_reader.read_all(file_names))
+
+        assert read_files == [
+            (file_name, f"content of {file_name}") for file_name in file_names
+        ]
+        assert html_reader.file_count == 20
+
+    def testing_reads_ahead_while_the_consumer_processes(self, tmp_path):
+        file_names = [f"file{index}.html" for index in range(10)]
+        for file_name in file_names:
+            (tmp_path / file_name).write_text("content")
+        html_reader = PrefetchingFileReader(str(tmp_path), 2, 3)
+        read_events = {file_name: threading.Event() for file_name in file_names}
+        read_file = html_reader.read_file
+
+        def signalling_read_file(file_name):
+            content = read_file(file_name)
+            read_events[file_name].set()
+            return content
+
+        html_reader.read_file = signalling_read_file
+        read_files = html_reader.read_all(file_names)
+
+        assert next(read_files) == ("file0.html", "content")
+        # The next files are read while the consumer still holds the first one
+        assert all(read_events[file_name].wait(5) for file_name in file_names[1:4])
+        assert html_reader.file_count == 1
+        read_files.close()
+
+    def testing_unreadable_file_has_no_content(self, tmp_path):
+        (tmp_path / "present.html").write_text("content")
+        html_reader = PrefetchingFileReader(str(tmp_path), 2, 10)
+
+        read_files = list(html_reader.read_all(["missing.html", "present.html"]))
+
+        assert read_files == [("missing.html", None), ("present.html", "content")]
+
+    def testing_reads_at_most_queue_depth_ahead(self, tmp_path):
+        file_names = [f"file{index}.html" for index in range(10)]
+        for file_name in file_names:
+            (tmp_path / file_name).write_text("content")
+        html_reader = PrefetchingFileReader(str(tmp_path), 2, 3)
+        submitted = []
+        lock = threading.Lock()
+        read_file = html_reader.read_file
+
+        def counting_read_file(file_name):
+            with lock:
+                submitted.append(file_name)
+            return read_file(file_name)
+
+        html_reader.read_file = counting_read_file
+        read_files = html_reader.read_all(file_names)
+
+        next(read_files)
+        assert len(submitted) <= 4
+        read_files.close()
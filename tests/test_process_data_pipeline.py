@@ -1,31 +1,80 @@
 import logging
+import os
 import re
-from unittest.mock import MagicMock, mock_open, patch
+import shutil
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from unittest.mock import MagicMock, call, mock_open, patch
 
-from torch import Tensor
+import jsonlines
+import numpy
+import torch
+from torch import tensor
 import pytest
 from bs4 import BeautifulSoup
 from sentence_transformers import SentenceTransformer
 
 from A_process_data_pipeline import (
+    checkpoint_run_details,
     determine_themes,
-    extract_company_description,
-    extract_company_details,
-    extract_company_name,
-    extract_company_ticker,
+    encode_descriptions,
     extract_theme_details,
-    is_expected_html_format,
     is_valid_theme_name,
+    iterate_company_html_files,
+    iterate_html_file_windows,
+    list_company_html_files,
+    merge_shards,
+    open_checkpoint,
+    parse_arguments,
+    parse_company_file,
+    parse_company_file_with_timeout,
     parse_company_files,
     parse_themes,
+    parse_window_of_companies,
     process_list_of_companies,
     read_lines_from_file,
+    save_processed_data_jsonl,
+    save_processed_data_jsonl_stream,
+    save_shard,
+    search_theme_index,
+    select_top_theme_indices,
+    stream_companies_with_themes,
+    top_theme_agreement,
+    update_companies_incrementally,
+    validate_inputs,
+    watch_inputs,
+)
+from constants.data_constants import (
+    ENCODER_SERVER,
+    ERROR,
+    HTML_EXTRACTOR,
+    MODEL_NAME,
+    PATH,
+)
+from utils.checkpoint import PipelineCheckpoint
+from utils.company_artifacts import CompanyArtifacts, CompanyArtifactWriter
+from utils.company_html import (
+    extract_company_description,
+    extract_company_details,
+    extract_company_details_fast,
+    extract_company_name,
+    extract_company_ticker,
+    is_expected_html_format,
 )
-from constants.data_constants import ERROR
+from utils.company_store import CompanyStore
+from utils.embedding_cache import EmbeddingCache
+from utils.encoder_pool import EncoderPool
+from utils.input_manifest import InputManifest
+from utils.stub_encoder import StubEncoder
+from utils.theme_index import IvfThemeIndex
+from utils.theme_matrix import ThemeMatrix
+from tests.test_data import data_pipeline_test_data
 from tests.test_data.data_pipeline_test_data import (
     sample_determine_themes_output,
     sample_processed_companies,
-    sample_processed_themes,
+    sample_theme_matrix,
     test_company_blank_company_name,
     test_company_blank_description,
     test_company_blank_ticker_prefix,
@@ -36,16 +85,11 @@ from tests.test_data.data_pipeline_test_data import (
     test_company_missing_ticker_prefix,
     test_company_missing_title_prefix,
     test_invalid_html_format,
-    test_parse_themes_output,
 )
 
 
 class TestingParseThemes:
-    def testing_parse_themes(self):
-        mock_logger = MagicMock(spec=logging.Logger)
-        mock_model = MagicMock(spec=SentenceTransformer)
-        mock_model.encode.return_value = "test encode value"
-
+    def parse_themes_with_mocks(self, mock_logger, mock_model, theme_matrix_file):
         test_output_read_line_from_files = [
             "theme1: description1",
             "theme2: description2",
@@ -55,20 +99,77 @@ class TestingParseThemes:
             ("theme2", "description2"),
         ]
 
-        expected_log_info = (
-            "Done parsing themes. There are 2 themes: ['theme1', 'theme2']"
-        )
-
         with patch(
             "A_process_data_pipeline.read_lines_from_file",
             return_value=test_output_read_line_from_files,
         ), patch(
             "A_process_data_pipeline.extract_theme_details",
             side_effect=test_output_extract_theme_details,
+        ), patch(
+            "A_process_data_pipeline.hash_file", return_value="themes hash"
         ):
-            result = parse_themes(mock_logger, mock_model)
-            assert result == test_parse_themes_output
-            mock_logger.info.assert_called_once_with(expected_log_info)
+            return parse_themes(
+                mock_logger, mock_model, theme_matrix_file=theme_matrix_file
+            )
+
+    def testing_parse_themes(self, tmp_path):
+        mock_logger = MagicMock(spec=logging.Logger)
+        mock_model = MagicMock(spec=SentenceTransformer)
+        mock_model.encode.side_effect = lambda sentences, **kwargs: tensor(
+            [[3.0, 4.0] for _ in sentences]
+        )
+
+        expected_log_info = (
+            "Done parsing themes. There are 2 themes: ['theme1', 'theme2']"
+        )
+
+        result = self.parse_themes_with_mocks(
+            mock_logger, mock_model, str(tmp_path / "theme_matrix.npz")
+        )
+        assert result.theme_names == ["theme1", "theme2"]
+        assert result.themes_hash == "themes hash"
+        numpy.testing.assert_allclose(result.matrix, [[0.6, 0.8], [0.6, 0.8]])
+        mock_model.encode.assert_called_once()
+        mock_logger.info.assert_called_once_with(expected_log_info)
+
+    def testing_loads_current_theme_matrix(self, tmp_path):
+        mock_logger = MagicMock(spec=logging.Logger)
+        mock_model = MagicMock(spec=SentenceTransformer)
+        theme_matrix_file = str(tmp_path / "theme_matrix.npz")
+        ThemeMatrix(
+            ["theme1", "theme2"],
+            numpy.array([[1.0, 0.0], [0.0, 1.0]]),
+            "themes hash",
+            MODEL_NAME,
+        ).save(theme_matrix_file)
+
+        result = self.parse_themes_with_mocks(
+            mock_logger, mock_model, theme_matrix_file
+        )
+
+        numpy.testing.assert_array_equal(result.matrix, [[1.0, 0.0], [0.0, 1.0]])
+        mock_model.encode.assert_not_called()
+
+    def testing_encodes_again_for_another_model(self, tmp_path):
+        mock_logger = MagicMock(spec=logging.Logger)
+        mock_model = MagicMock(spec=SentenceTransformer)
+        mock_model.encode.side_effect = lambda sentences, **kwargs: tensor(
+            [[0.0, 2.0] for _ in sentences]
+        )
+        theme_matrix_file = str(tmp_path / "theme_matrix.npz")
+        ThemeMatrix(
+            ["theme1", "theme2"],
+            numpy.array([[1.0, 0.0], [0.0, 1.0]]),
+            "themes hash",
+            "another model",
+        ).save(theme_matrix_file)
+
+        result = self.parse_themes_with_mocks(
+            mock_logger, mock_model, theme_matrix_file
+        )
+
+        numpy.testing.assert_array_equal(result.matrix, [[0.0, 1.0], [0.0, 1.0]])
+        assert result.model_name == MODEL_NAME
 
 
 class TestingReadLinesFromFile:
@@ -167,7 +268,9 @@ class TestingProcessListOfCompanies:
     def test_happy_path(self):
         mock_logger = MagicMock(spec=logging.Logger)
         mock_model = MagicMock(spec=SentenceTransformer)
-        mock_model.encode.return_value = "test encode value"
+        mock_model.encode.side_effect = lambda sentences, **kwargs: [
+            "test encode value" for _ in sentences
+        ]
 
         open_file_test_output = "html content"
         beautiful_soup_test_output = "processed html"
@@ -186,16 +289,17 @@ class TestingProcessListOfCompanies:
                 "company_ticker": "company ticker",
                 "company_description": "company description",
                 "company_description_model_encoding": "test encode value",
+                "company_html_file": "file2.html",
             }
         }
 
         with patch("builtins.open", mock_open(read_data=open_file_test_output)), patch(
             "bs4.BeautifulSoup", return_value=beautiful_soup_test_output
         ), patch(
-            "A_process_data_pipeline.is_expected_html_format",
+            "utils.company_html.is_expected_html_format",
             return_value=is_expected_html_format_test__output,
         ), patch(
-            "A_process_data_pipeline.extract_company_details",
+            "utils.company_html.extract_company_details",
             return_value=(extract_company_details_test_output),
         ):
             companies = process_list_of_companies(
@@ -203,6 +307,438 @@ class TestingProcessListOfCompanies:
             )
             assert companies == expected_result
 
+    def test_encodes_once_per_window(self):
+        mock_logger = MagicMock(spec=logging.Logger)
+        mock_model = MagicMock(spec=SentenceTransformer)
+        mock_model.encode.side_effect = lambda sentences, **kwargs: [
+            f"encoding of {sentence}" for sentence in sentences
+        ]
+        extract_company_details_test_output = [
+            (f"name {index}", f"TICKER{index}", f"description {index}")
+            for index in range(5)
+        ]
+
+        with patch("builtins.open", mock_open(read_data="html content")), patch(
+            "utils.company_html.is_expected_html_format", return_value=True
+        ), patch(
+            "utils.company_html.extract_company_details",
+            side_effect=extract_company_details_test_output,
+        ):
+            companies = process_list_of_companies(
+                mock_logger,
+                [f"file{index}.html" for index in range(5)],
+                mock_model,
+                encode_batch_size=10,
+                parse_window_size=2,
+            )
+
+        assert mock_model.encode.call_count == 3
+        assert list(companies.keys()) == [f"TICKER{index}" for index in range(5)]
+        assert companies["TICKER3"]["company_description_model_encoding"] == (
+            "encoding of description 3"
+        )
+
+    def testing_resumes_from_checkpoint(self, tmp_path):
+        mock_logger = MagicMock(spec=logging.Logger)
+        list_of_html_files = [f"file{index}.html" for index in range(5)]
+        company_details = {
+            html_file: (
+                f"name {index % 4}",
+                f"TICKER{index % 4}",
+                f"description {index}",
+            )
+            for index, html_file in enumerate(list_of_html_files)
+        }
+
+        def process(model, checkpoint=None, resume=False):
+            with patch(
+                "A_process_data_pipeline.parse_company_file",
+                side_effect=lambda html_file, *args, **kwargs: (
+                    company_details[html_file],
+                    None,
+                ),
+            ), patch(
+                "A_process_data_pipeline.run_fingerprint", return_value="fingerprint"
+            ):
+                return process_list_of_companies(
+                    mock_logger,
+                    list_of_html_files,
+                    model,
+                    parse_window_size=2,
+                    read_workers=0,
+                    checkpoint=checkpoint,
+                    resume=resume,
+                )
+
+        def encode(sentences, **kwargs):
+            return torch.tensor(
+                [[float(sentence.split()[-1]), 1.0] for sentence in sentences]
+            )
+
+        mock_model = MagicMock(spec=SentenceTransformer)
+        mock_model.encode.side_effect = encode
+        uninterrupted_companies = process(mock_model)
+
+        # The run stops while encoding the third window
+        checkpoint_directory = str(tmp_path / "checkpoint")
+        mock_model.encode.side_effect = [
+            encode(["description 0", "description 1"]),
+            encode(["description 2", "description 3"]),
+            RuntimeError("pre-empted"),
+        ]
+        with pytest.raises(RuntimeError):
+            process(
+                mock_model,
+                PipelineCheckpoint(checkpoint_directory, {}, checkpoint_every=1),
+            )
+
+        mock_model.encode.reset_mock()
+        mock_model.encode.side_effect = encode
+        checkpoint = PipelineCheckpoint(checkpoint_directory, {})
+        resumed_companies = process(mock_model, checkpoint, resume=True)
+
+        mock_model.encode.assert_called_once()
+        assert checkpoint.window_count == 3
+        assert list(resumed_companies.keys()) == list(uninterrupted_companies.keys())
+        for company_ticker, company in uninterrupted_companies.items():
+            resumed_company = resumed_companies[company_ticker]
+            assert torch.equal(
+                resumed_company.pop("company_description_model_encoding"),
+                company.pop("company_description_model_encoding"),
+            )
+            assert resumed_company == company
+
+    def testing_encodes_into_company_store(self, tmp_path):
+        mock_logger = MagicMock(spec=logging.Logger)
+        list_of_html_files = [f"file{index}.html" for index in range(7)]
+        company_details = {
+            html_file: (
+                f"name {index % 4}",
+                f"TICKER{index % 4}",
+                " ".join(["description"] * (index + 1)),
+            )
+            for index, html_file in enumerate(list_of_html_files)
+        }
+
+        def process(company_store=None, checkpoint=None):
+            file_tickers = dict()
+            with patch(
+                "A_process_data_pipeline.parse_company_file",
+                side_effect=lambda html_file, *args, **kwargs: (
+                    company_details[html_file],
+                    None,
+                ),
+            ), patch(
+                "A_process_data_pipeline.run_fingerprint", return_value="fingerprint"
+            ):
+                companies = process_list_of_companies(
+                    mock_logger,
+                    list_of_html_files,
+                    StubEncoder(8),
+                    encode_batch_size=2,
+                    parse_window_size=3,
+                    read_workers=0,
+                    checkpoint=checkpoint,
+                    company_store=company_store,
+                    file_tickers=file_tickers,
+                )
+            return companies, file_tickers
+
+        companies, file_tickers = process()
+        checkpoint_directory = str(tmp_path / "checkpoint")
+        company_store, store_file_tickers = process(
+            CompanyStore(2),
+            PipelineCheckpoint(checkpoint_directory, {}, checkpoint_every=1),
+        )
+
+        assert store_file_tickers == file_tickers
+        assert list(company_store.keys()) == list(companies.keys())
+        for company_ticker, company in companies.items():
+            stored_company = company_store[company_ticker]
+            numpy.testing.assert_array_equal(
+                stored_company.pop("company_description_model_encoding"),
+                company.pop("company_description_model_encoding").numpy(),
+            )
+            assert stored_company == company
+        # The checkpoint holds every window as stored
+        resumed_store = CompanyStore(1)
+        with patch(
+            "A_process_data_pipeline.run_fingerprint", return_value="fingerprint"
+        ):
+            open_checkpoint(
+                mock_logger,
+                PipelineCheckpoint(checkpoint_directory, {}),
+                list_of_html_files,
+                resume=True,
+                company_store=resumed_store,
+            )
+        assert list(resumed_store.keys()) == list(company_store.keys())
+        numpy.testing.assert_array_equal(
+            resumed_store.row_encodings(0, 4), company_store.row_encodings(0, 4)
+        )
+
+
+class TestingParseCompanyFile:
+    def testing_happy_path(self):
+        company_details, error_message = parse_company_file("apple.html")
+        assert company_details[:2] == ("Apple Inc.", "AAPL")
+        assert error_message is None
+
+    def testing_malformed_html(self):
+        with patch("builtins.open", mock_open(read_data=test_invalid_html_format)):
+            company_details, error_message = parse_company_file("bad.html")
+        assert company_details is None
+        assert error_message == (
+            f"[inputs/companies/bad.html]:{ERROR.HTML_MALFORMED_DATA.value}"
+        )
+
+    def testing_invalid_company_details(self):
+        with patch("builtins.open", mock_open(read_data=test_company_html_no_ticker)):
+            company_details, error_message = parse_company_file("bad.html")
+        assert company_details is None
+        assert error_message == (
+            f"[inputs/companies/bad.html]:{ERROR.HTML_MISSING_TICKER_PREFIX.value}"
+        )
+
+
+class TestingParseCompanyFileWithTimeout:
+    def testing_timeout(self):
+        with patch(
+            "A_process_data_pipeline.parse_company_file",
+            side_effect=lambda *args: time.sleep(5),
+        ):
+            company_details, error_message = parse_company_file_with_timeout(
+                "slow.html", timeout_seconds=0.1
+            )
+        assert company_details is None
+        assert error_message == (
+            f"[inputs/companies/slow.html]:{ERROR.HTML_PARSE_TIMEOUT.value}"
+        )
+
+    def testing_unexpected_error(self):
+        company_details, error_message = parse_company_file_with_timeout(
+            "missing.html", timeout_seconds=5
+        )
+        assert company_details is None
+        assert error_message.startswith("[inputs/companies/missing.html]:")
+
+
+class TestingParseWindowOfCompanies:
+    def testing_pool_matches_in_process_parsing(self):
+        mock_logger = MagicMock(spec=logging.Logger)
+        html_files = ["apple.html", "missing.html", "tesla.html", "wallmart.html"]
+
+        with ProcessPoolExecutor(max_workers=2) as parse_pool:
+            pooled = parse_window_of_companies(mock_logger, html_files, parse_pool)
+
+        assert [html_file for html_file, _ in pooled] == [
+            "apple.html",
+            "tesla.html",
+            "wallmart.html",
+        ]
+        assert [ticker for _, (_, ticker, _) in pooled] == ["AAPL", "TSLA", "WMT"]
+        assert pooled[0][1] == parse_company_file("apple.html")[0]
+        mock_logger.error.assert_called_once()
+        assert mock_logger.error.call_args.args[0].startswith(
+            "[inputs/companies/missing.html]:"
+        )
+
+    def testing_prefetched_contents_match_reading_files(self):
+        mock_logger = MagicMock(spec=logging.Logger)
+        html_files = ["apple.html", "tesla.html"]
+        html_contents = []
+        for html_file in html_files:
+            with open(f"inputs/companies/{html_file}", "r", encoding="utf-8") as file:
+                html_contents.append(file.read())
+
+        with patch("builtins.open") as mock_open_file:
+            prefetched = parse_window_of_companies(
+                mock_logger, html_files, html_contents=html_contents
+            )
+
+        mock_open_file.assert_not_called()
+        assert prefetched == parse_window_of_companies(mock_logger, html_files)
+
+    def testing_in_process_skips_failing_and_slow_files(self):
+        mock_logger = MagicMock(spec=logging.Logger)
+        parse_company_file_function = parse_company_file
+
+        def slow_parse_company_file(html_file, *args):
+            if html_file == "slow.html":
+                time.sleep(5)
+            return parse_company_file_function(html_file, *args)
+
+        with patch(
+            "A_process_data_pipeline.parse_company_file",
+            side_effect=slow_parse_company_file,
+        ):
+            parsed = parse_window_of_companies(
+                mock_logger,
+                ["apple.html", "missing.html", "slow.html", "tesla.html"],
+                parse_timeout_seconds=0.1,
+            )
+
+        assert [html_file for html_file, _ in parsed] == ["apple.html", "tesla.html"]
+        missing_error, slow_error = [
+            call.args[0] for call in mock_logger.error.call_args_list
+        ]
+        assert missing_error.startswith("[inputs/companies/missing.html]:")
+        assert slow_error == (
+            f"[inputs/companies/slow.html]:{ERROR.HTML_PARSE_TIMEOUT.value}"
+        )
+        mock_logger.warning.assert_not_called()
+
+    def testing_warns_without_timeout_off_the_main_thread(self):
+        mock_logger = MagicMock(spec=logging.Logger)
+        parsed = []
+        thread = threading.Thread(
+            target=lambda: parsed.extend(
+                parse_window_of_companies(mock_logger, ["apple.html"])
+            )
+        )
+        thread.start()
+        thread.join(10)
+
+        assert [html_file for html_file, _ in parsed] == ["apple.html"]
+        mock_logger.warning.assert_called_once_with(
+            ERROR.PARSE_TIMEOUT_UNAVAILABLE.value
+        )
+
+
+class TestingIterateHtmlFileWindows:
+    def testing_prefetched_windows(self):
+        mock_logger = MagicMock(spec=logging.Logger)
+        html_files = ["apple.html", "missing.html", "tesla.html"]
+
+        windows = list(
+            iterate_html_file_windows(
+                mock_logger, html_files, parse_window_size=2, read_workers=2
+            )
+        )
+
+        assert [window_of_html_files for window_of_html_files, _ in windows] == [
+            ["apple.html", "missing.html"],
+            ["tesla.html"],
+        ]
+        apple_content, missing_content = windows[0][1]
+        assert "Apple Inc." in apple_content
+        assert missing_content is None
+        assert mock_logger.info.call_args.args[0].startswith(
+            "Done reading 3 company files with 2 reader threads"
+        )
+
+    def testing_lazy_files_from_archive(self, tmp_path, monkeypatch):
+        with open("inputs/companies/apple.html", "r", encoding="utf-8") as file:
+            apple_content = file.read()
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "inputs" / "companies").mkdir(parents=True)
+        with zipfile.ZipFile("inputs/companies/vendor.zip", "w") as archive:
+            archive.writestr("2024/apple.html", apple_content)
+        mock_logger = MagicMock(spec=logging.Logger)
+
+        windows = list(
+            iterate_html_file_windows(
+                mock_logger, iterate_company_html_files(), read_workers=2
+            )
+        )
+
+        assert windows == [(["vendor.zip/2024/apple.html"], [apple_content])]
+        assert parse_company_file("vendor.zip/2024/apple.html")[0][1] == "AAPL"
+
+    def testing_without_reader_threads(self):
+        mock_logger = MagicMock(spec=logging.Logger)
+
+        windows = list(
+            iterate_html_file_windows(
+                mock_logger, ["apple.html", "tesla.html"], read_workers=0
+            )
+        )
+
+        assert windows == [(["apple.html", "tesla.html"], None)]
+        mock_logger.info.assert_not_called()
+
+
+class TestingValidateInputs:
+    def testing_counts_rejects_without_model(self):
+        mock_logger = MagicMock(spec=logging.Logger)
+
+        with patch(
+            "A_process_data_pipeline.read_lines_from_file",
+            return_value=["theme1: description1", "no colon"],
+        ), patch(
+            "A_process_data_pipeline.list_company_html_files",
+            return_value=["apple.html", "missing.html", "tesla.html"],
+        ), patch(
+            "A_process_data_pipeline.LazySentenceTransformer"
+        ) as mock_model_class:
+            rejected_count = validate_inputs(
+                mock_logger, parse_window_size=2, parse_workers=2
+            )
+
+        assert rejected_count == 2
+        mock_model_class.assert_not_called()
+        mock_logger.info.assert_called_with(
+            "Done validating inputs. Rejected theme lines: 1 of 2, "
+            "rejected company files: 1 of 3"
+        )
+
+
+class TestingEncodeDescriptions:
+    def test_batches_sorted_by_length_and_keeps_input_order(self):
+        mock_model = MagicMock(spec=SentenceTransformer)
+        mock_model.encode.side_effect = lambda sentences, **kwargs: [
+            f"encoding of {sentence}" for sentence in sentences
+        ]
+        descriptions = ["a", "a b c", "a b", "a b c d"]
+
+        encodings = encode_descriptions(mock_model, descriptions, batch_size=2)
+
+        assert encodings == [f"encoding of {text}" for text in descriptions]
+        batches = [call.args[0] for call in mock_model.encode.call_args_list]
+        assert batches == [["a b c d", "a b c"], ["a b", "a"]]
+
+    def test_empty_list(self):
+        mock_model = MagicMock(spec=SentenceTransformer)
+        assert encode_descriptions(mock_model, [], batch_size=2) == []
+        mock_model.encode.assert_not_called()
+
+    def test_only_encodes_descriptions_missing_from_cache(self, tmp_path):
+        mock_model = MagicMock(spec=SentenceTransformer)
+        mock_model.encode.side_effect = lambda sentences, **kwargs: tensor(
+            [[float(len(sentence)), 1.0] for sentence in sentences]
+        )
+        embedding_cache = EmbeddingCache(str(tmp_path), "test-model", 10)
+        embedding_cache.put_many(["cached text"], numpy.array([[7.0, 7.0]]))
+
+        encodings = encode_descriptions(
+            mock_model, ["new", "cached  text"], 2, embedding_cache
+        )
+
+        assert [encoding.tolist() for encoding in encodings] == [
+            [3.0, 1.0],
+            [7.0, 7.0],
+        ]
+        mock_model.encode.assert_called_once()
+        assert mock_model.encode.call_args.args[0] == ["new"]
+        assert (embedding_cache.hits, embedding_cache.misses) == (1, 1)
+        assert embedding_cache.get_many(["new"])[0].tolist() == [3.0, 1.0]
+
+    def test_encoder_pool_gets_every_description_at_once(self, tmp_path):
+        mock_pool = MagicMock(spec=EncoderPool)
+        mock_pool.encode.side_effect = lambda sentences, **kwargs: tensor(
+            [[float(len(sentence)), 1.0] for sentence in sentences]
+        )
+        embedding_cache = EmbeddingCache(str(tmp_path), "test-model", 10)
+        descriptions = ["a", "a b c", "a b", "a b c d"]
+
+        encodings = encode_descriptions(mock_pool, descriptions, 2, embedding_cache)
+
+        assert [encoding[0].item() for encoding in encodings] == [1.0, 5.0, 3.0, 7.0]
+        mock_pool.encode.assert_called_once()
+        assert mock_pool.encode.call_args.args[0] == ["a b c d", "a b c", "a b", "a"]
+        assert mock_pool.encode.call_args.kwargs["batch_size"] == 2
+        assert embedding_cache.get_many(["a b"])[0].tolist() == [3.0, 1.0]
+
 
 class TestingIsExpectedHtmlFormat:
     def testing_expected_html(self):
@@ -233,6 +769,71 @@ class TestingExtractCompanyDetails:
         assert str(error.value) == expected_error_message
 
 
+def html_fixtures():
+    """All HTML documents of the test data and the input companies directory"""
+    fixtures = [
+        value
+        for name, value in vars(data_pipeline_test_data).items()
+        if name.startswith("test_") and isinstance(value, str) and "<HTML>" in value
+    ]
+    for html_file in ["apple.html", "tesla.html", "wallmart.html"]:
+        with open(f"inputs/companies/{html_file}", "r", encoding="utf-8") as file:
+            fixtures.append(file.read())
+    return fixtures + [
+        test_company_html.replace("Apple Inc.</H1>", "Apple &amp; Co.</H1>").replace(
+            "Apple Inc.</TITLE>", "Apple &amp; Co.</TITLE>"
+        ),
+        test_company_html.replace("<P>", "<P>Caf&eacute; &#8217;s &nbsp; &unknown;"),
+        test_company_html.replace("<P>", "<P>R&in consumer &ne &le &ic goods. "),
+        test_company_html.replace("Apple Inc.</H1>", "Apple &ne Inc.</H1>").replace(
+            "Apple Inc.</TITLE>", "Apple &ne Inc.</TITLE>"
+        ),
+        test_company_html.replace("<H1>", "<!-- comment --><H1>"),
+        test_company_html.replace("</BODY>", "").replace("<H1>", "</BODY><H1>"),
+        test_company_html.replace("<H2>Ticker: AAPL</H2>", "").replace(
+            "Apple Inc.</H1>", "Apple Inc.<H2>Ticker: AAPL</H2></H1>"
+        ),
+        "<!DOCTYPE html>\n" + test_company_html.replace("<BODY>", '<BODY class="x">'),
+    ]
+
+
+class TestingExtractCompanyDetailsFast:
+    @pytest.mark.parametrize("html_content", html_fixtures())
+    def testing_parity_with_beautifulsoup(self, html_content):
+        processed_html = BeautifulSoup(html_content, "html.parser")
+        try:
+            expected_details = (
+                extract_company_details(processed_html)
+                if is_expected_html_format(processed_html)
+                else None
+            )
+        except Exception:
+            expected_details = None
+
+        fast_details = extract_company_details_fast(html_content)
+        assert fast_details is None or fast_details == expected_details
+
+    @pytest.mark.parametrize("html_content", html_fixtures())
+    def testing_same_result_and_errors_as_beautifulsoup(self, html_content):
+        with patch("builtins.open", mock_open(read_data=html_content)):
+            fast_result = parse_company_file("file.html", HTML_EXTRACTOR.FAST.value)
+            beautifulsoup_result = parse_company_file(
+                "file.html", HTML_EXTRACTOR.BEAUTIFULSOUP.value
+            )
+        assert fast_result == beautifulsoup_result
+
+    def testing_accepts_expected_format(self):
+        assert extract_company_details_fast(test_company_html) == (
+            "Apple Inc.",
+            "AAPL",
+            test_company_description,
+        )
+
+    def testing_rejects_other_formats(self):
+        assert extract_company_details_fast(test_invalid_html_format) is None
+        assert extract_company_details_fast(test_company_html_no_ticker) is None
+
+
 class TestingExtractCompanyName:
     def testing_happy_path(self):
         test_data = BeautifulSoup(test_company_html, "html.parser")
@@ -302,18 +903,707 @@ class TestingExtractCompanyDescription:
 class TestingDetermineThemes:
     def testing_determine_themes(self):
         mock_logger = MagicMock(spec=logging.Logger)
-        themes = sample_processed_themes
         companies = sample_processed_companies
 
         expected_log_info = "Done determining top 1 themes for every company."
 
-        mock_cos_similarity_result = MagicMock(spec=Tensor)
-        mock_cos_similarity_result.item.return_value = 1
+        result = determine_themes(
+            mock_logger, sample_theme_matrix, companies, topNThemes=1
+        )
+        assert result == sample_determine_themes_output
+        mock_logger.info.assert_called_once_with(expected_log_info)
+
+    def testing_top_themes_across_chunks(self):
+        mock_logger = MagicMock(spec=logging.Logger)
+        theme_matrix = ThemeMatrix(
+            ["north", "east", "south"],
+            numpy.array([[0.0, 1.0], [1.0, 0.0], [0.0, -1.0]]),
+            "themes hash",
+            MODEL_NAME,
+        )
+        companies = {
+            ticker: {
+                "company_name": ticker,
+                "company_description": ticker,
+                "company_description_model_encoding": tensor(encoding),
+            }
+            for ticker, encoding in [
+                ("AAA", [0.1, 5.0]),
+                ("BBB", [3.0, -0.5]),
+                ("CCC", [0.0, -2.0]),
+            ]
+        }
+
+        result = determine_themes(
+            mock_logger, theme_matrix, companies, topNThemes=2, score_chunk_size=2
+        )
+        assert list(result.keys()) == ["AAA", "BBB", "CCC"]
+        assert result["AAA"]["company_top_themes"] == ["north", "east"]
+        assert result["BBB"]["company_top_themes"] == ["east", "south"]
+        assert result["CCC"]["company_top_themes"] == ["south", "east"]
+
+    def testing_scores_company_store(self):
+        mock_logger = MagicMock(spec=logging.Logger)
+        theme_matrix = ThemeMatrix(
+            ["north", "east", "south"],
+            numpy.array([[0.0, 1.0], [1.0, 0.0], [0.0, -1.0]]),
+            "themes hash",
+            MODEL_NAME,
+        )
+        companies = {
+            ticker: {
+                "company_name": ticker,
+                "company_ticker": ticker,
+                "company_description": ticker,
+                "company_description_model_encoding": tensor(encoding),
+                "company_html_file": f"{ticker}.html",
+            }
+            for ticker, encoding in [
+                ("AAA", [0.1, 5.0]),
+                ("BBB", [3.0, -0.5]),
+                ("CCC", [0.0, -2.0]),
+            ]
+        }
+        company_store = CompanyStore(2)
+        company_store.add_window(
+            companies,
+            numpy.stack(
+                [
+                    company["company_description_model_encoding"].numpy()
+                    for company in companies.values()
+                ]
+            ),
+        )
+
+        assert determine_themes(
+            mock_logger, theme_matrix, company_store, topNThemes=2, score_chunk_size=2
+        ) == determine_themes(
+            mock_logger, theme_matrix, companies, topNThemes=2, score_chunk_size=2
+        )
+
+    def testing_writes_company_artifacts(self, tmp_path):
+        mock_logger = MagicMock(spec=logging.Logger)
+        company_artifact_writer = CompanyArtifactWriter(
+            str(tmp_path),
+            sample_theme_matrix.theme_names,
+            "model name",
+            has_scores=True,
+        )
+
+        determine_themes(
+            mock_logger,
+            sample_theme_matrix,
+            sample_processed_companies,
+            topNThemes=1,
+            company_artifact_writer=company_artifact_writer,
+        )
+        company_artifact_writer.close()
+
+        artifacts = CompanyArtifacts.load(str(tmp_path))
+        numpy.testing.assert_allclose(artifacts.embedding("company1"), [1.0, 0.0])
+        assert artifacts.theme_scores("company1") == {"theme1": 1.0}
+
+
+class TestingStreamCompaniesWithThemes:
+    def testing_yields_scored_windows_and_skips_duplicates(self):
+        mock_logger = MagicMock(spec=logging.Logger)
+        mock_model = MagicMock(spec=SentenceTransformer)
+        encodings = {
+            "a1": [2.0, 0.0],
+            "a2": [0.0, 2.0],
+            "b": [0.0, 1.0],
+            "b2": [1.0, 0.0],
+        }
+        mock_model.encode.side_effect = lambda sentences, **kwargs: tensor(
+            [encodings[sentence] for sentence in sentences]
+        )
+        windows = [
+            [("a1.html", ("AAA", "AAA", "a1"))],
+            [
+                ("a2.html", ("AAA", "AAA", "a2")),
+                ("b.html", ("BBB", "BBB", "b")),
+                ("b2.html", ("BBB 2", "BBB", "b2")),
+            ],
+        ]
+        theme_matrix = ThemeMatrix(
+            ["east", "north"],
+            numpy.array([[1.0, 0.0], [0.0, 1.0]]),
+            "themes hash",
+            MODEL_NAME,
+        )
 
         with patch(
-            "sentence_transformers.util.pytorch_cos_sim",
-            return_value=mock_cos_similarity_result,
+            "A_process_data_pipeline.iterate_parsed_company_windows",
+            return_value=iter(windows),
         ):
-            result = determine_themes(mock_logger, themes, companies, topNThemes=1)
-            assert result == sample_determine_themes_output
-            mock_logger.info.assert_called_once_with(expected_log_info)
+            result = list(
+                stream_companies_with_themes(
+                    mock_logger, theme_matrix, ["file.html"], mock_model, topNThemes=1
+                )
+            )
+
+        # The first file of a ticker is kept, across windows and within a window
+        assert [list(window.keys()) for window in result] == [["AAA"], ["BBB"]]
+        assert result[0]["AAA"]["company_top_themes"] == ["east"]
+        assert result[1]["BBB"]["company_name"] == "BBB"
+        assert result[1]["BBB"]["company_top_themes"] == ["north"]
+        assert mock_logger.error.call_args_list == [
+            call(f"[AAA]:{ERROR.DUPLICATE_COMPANY_TICKER.value}"),
+            call(f"[BBB]:{ERROR.DUPLICATE_COMPANY_TICKER.value}"),
+        ]
+        # Skipped files are not encoded
+        assert [
+            sentence
+            for encode_call in mock_model.encode.call_args_list
+            for sentence in encode_call.args[0]
+        ] == ["a1", "b"]
+
+
+class TestingSaveProcessedDataJsonlStream:
+    def testing_writes_every_window(self):
+        mock_logger = MagicMock(spec=logging.Logger)
+        windows = [
+            {"AAA": {"company_ticker": "AAA"}},
+            {"BBB": {"company_ticker": "BBB"}},
+        ]
+
+        with patch("A_process_data_pipeline.jsonlines.open") as mock_open_jsonl:
+            writer = mock_open_jsonl.return_value.__enter__.return_value
+            count = save_processed_data_jsonl_stream(mock_logger, iter(windows))
+
+        assert count == 2
+        assert writer.write_all.call_count == 2
+        mock_logger.info.assert_called_once_with(
+            "Done streaming 2 processed companies."
+        )
+
+    def testing_appends_every_window_to_the_columnar_output(self):
+        mock_logger = MagicMock(spec=logging.Logger)
+        columnar_output_writer = MagicMock()
+        windows = [{"AAA": {"company_ticker": "AAA"}}]
+
+        with patch("A_process_data_pipeline.jsonlines.open"):
+            count = save_processed_data_jsonl_stream(
+                mock_logger,
+                iter(windows),
+                columnar_output_writer=columnar_output_writer,
+            )
+
+        assert count == 1
+        columnar_output_writer.append.assert_called_once_with(windows[0])
+
+
+class TestingSelectTopThemeIndices:
+    def testing_ties_keep_theme_order(self):
+        similarities = tensor([[0.5, 0.9, 0.5, 0.9, 0.1], [0.2, 0.2, 0.2, 0.2, 0.2]])
+        result = select_top_theme_indices(similarities, 3)
+        assert result.tolist() == [[1, 3, 0], [0, 1, 2]]
+
+    def testing_top_n_larger_than_number_of_themes(self):
+        similarities = tensor([[0.1, 0.3, 0.2]])
+        assert select_top_theme_indices(similarities, 5).tolist() == [[1, 2, 0]]
+
+    def testing_top_n_zero(self):
+        similarities = tensor([[0.1, 0.3, 0.2]])
+        assert select_top_theme_indices(similarities, 0).tolist() == [[]]
+
+
+class TestingSearchThemeIndex:
+    def sample_matrices(self):
+        generator = torch.Generator().manual_seed(2)
+        themes = torch.nn.functional.normalize(
+            torch.randn(30, 6, generator=generator), dim=1
+        )
+        companies = torch.nn.functional.normalize(
+            torch.randn(50, 6, generator=generator), dim=1
+        )
+        return themes, companies
+
+    def testing_probing_every_list_matches_exact(self):
+        themes, companies = self.sample_matrices()
+        theme_index = IvfThemeIndex(themes, list_count=5, probe_count=5)
+
+        result = search_theme_index(theme_index, themes, companies, 3)
+
+        assert torch.equal(result, select_top_theme_indices(companies @ themes.T, 3))
+        assert theme_index.recall == 1.0
+        assert theme_index.sampled_company_count == 50
+
+    def testing_recall_sample_size(self):
+        themes, companies = self.sample_matrices()
+        theme_index = IvfThemeIndex(
+            themes, list_count=5, probe_count=1, recall_sample_size=20
+        )
+
+        search_theme_index(theme_index, themes, companies[:15], 3)
+        search_theme_index(theme_index, themes, companies[15:], 3)
+
+        assert theme_index.sampled_company_count == 20
+        assert 0 < theme_index.recall <= 1
+
+    def testing_too_few_candidates_scored_exactly(self):
+        themes, companies = self.sample_matrices()
+        theme_index = IvfThemeIndex(themes, list_count=30, probe_count=1)
+
+        result = search_theme_index(theme_index, themes, companies, 3)
+
+        assert torch.equal(result, select_top_theme_indices(companies @ themes.T, 3))
+
+
+class TestingTopThemeAgreement:
+    def testing_agreement_rates(self):
+        baseline = {
+            "AAA": ["a", "b", "c"],
+            "BBB": ["a", "b", "c"],
+            "CCC": ["a", "b", "c"],
+            "DDD": ["a", "b", "c"],
+        }
+        candidate = {
+            "AAA": ["a", "b", "c"],
+            "BBB": ["b", "a", "c"],
+            "CCC": ["a", "b", "d"],
+            "DDD": ["d", "e", "f"],
+        }
+
+        agreement = top_theme_agreement(baseline, candidate)
+
+        assert agreement["identical_top_themes"] == 0.25
+        assert agreement["same_top_themes"] == 0.5
+        assert agreement["mean_overlap"] == pytest.approx((1 + 1 + 2 / 3 + 0) / 4)
+
+    def testing_no_companies(self):
+        assert top_theme_agreement({}, {})["identical_top_themes"] == 1.0
+
+
+class TestingShards:
+    def testing_list_company_html_files_of_shard(self):
+        with patch(
+            "A_process_data_pipeline.iterate_input_files",
+            side_effect=lambda directory: iter(
+                [f"file{index}.html" for index in range(10)]
+            ),
+        ):
+            all_files = list_company_html_files()
+            shards = [list_company_html_files(index, 3) for index in range(3)]
+
+        assert sorted(sum(shards, [])) == sorted(all_files)
+        assert all(shard == sorted(shard) for shard in shards)
+
+    def testing_save_and_merge_shards(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "outputs").mkdir()
+        mock_logger = MagicMock(spec=logging.Logger)
+        theme_matrix = ThemeMatrix(["theme1"], numpy.array([[1.0]]), "hash", "model")
+        shard_companies = [
+            {"AAPL": ("apple.html", "Apple"), "TSLA": ("tesla.html", "Tesla")},
+            {"AAPL": ("apple2.html", "Apple 2")},
+        ]
+        for shard_index, companies in enumerate(shard_companies):
+            output_directory = f"outputs/shards/shard-{shard_index}-of-2"
+            save_shard(
+                mock_logger,
+                theme_matrix,
+                {
+                    ticker: {"company_html_file": html_file}
+                    for ticker, (html_file, _) in companies.items()
+                },
+                {
+                    ticker: {"company_ticker": ticker, "company_name": name}
+                    for ticker, (_, name) in companies.items()
+                },
+                output_directory,
+                shard_index,
+                2,
+            )
+            company_artifact_writer = CompanyArtifactWriter(
+                output_directory, ["theme1"], "model", has_scores=True
+            )
+            company_artifact_writer.append(
+                list(companies.keys()),
+                numpy.array([[float(shard_index), 1.0]] * len(companies)),
+                numpy.array([[float(shard_index)]] * len(companies)),
+            )
+            company_artifact_writer.close()
+
+        merged = merge_shards(mock_logger, 2, score_chunk_size=1)
+
+        assert merged == {
+            "AAPL": {"company_ticker": "AAPL", "company_name": "Apple 2"},
+            "TSLA": {"company_ticker": "TSLA", "company_name": "Tesla"},
+        }
+        assert (tmp_path / "outputs" / "theme_names.txt").read_text() == "theme1"
+        assert (
+            len((tmp_path / "outputs" / "output.jsonl").read_text().splitlines()) == 2
+        )
+        assert ThemeMatrix.load("outputs/shards/shard-1-of-2/theme_matrix.npz")
+        assert ThemeMatrix.load("outputs/theme_matrix.npz").theme_names == ["theme1"]
+        # The artifacts of every company come from the shard its output comes from
+        artifacts = CompanyArtifacts.load("outputs")
+        assert artifacts.rows == {"AAPL": 0, "TSLA": 1}
+        numpy.testing.assert_array_equal(artifacts.embedding("AAPL"), [1.0, 1.0])
+        numpy.testing.assert_array_equal(artifacts.embedding("TSLA"), [0.0, 1.0])
+        assert artifacts.theme_scores("AAPL") == {"theme1": 1.0}
+
+    def testing_merge_removes_outdated_artifacts(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        mock_logger = MagicMock(spec=logging.Logger)
+        theme_matrix = ThemeMatrix(["theme1"], numpy.array([[1.0]]), "hash", "model")
+        company_artifact_writer = CompanyArtifactWriter("outputs", ["theme1"], "model")
+        company_artifact_writer.append(["OLD"], numpy.array([[1.0, 0.0]]))
+        company_artifact_writer.close()
+        save_shard(
+            mock_logger,
+            theme_matrix,
+            {"AAPL": {"company_html_file": "apple.html"}},
+            {"AAPL": {"company_ticker": "AAPL", "company_name": "Apple"}},
+            "outputs/shards/shard-0-of-1",
+            0,
+            1,
+        )
+
+        merge_shards(mock_logger, 1)
+
+        assert CompanyArtifacts.load("outputs") is None
+        assert "shard-0-of-1" in mock_logger.warning.call_args.args[0]
+
+    def testing_merge_missing_shard(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        mock_logger = MagicMock(spec=logging.Logger)
+
+        with pytest.raises(SystemExit):
+            merge_shards(mock_logger, 2)
+
+        assert "shard-0-of-2" in mock_logger.error.call_args.args[0]
+
+
+class RecordingEncoder(StubEncoder):
+    def __init__(self, dimension: int = 16):
+        super().__init__(dimension)
+        self.sentences = []
+
+    def encode(self, sentences, **kwargs):
+        self.sentences.extend(sentences)
+        return super().encode(sentences, **kwargs)
+
+
+class TestingUpdateCompaniesIncrementally:
+    def run_incrementally(self, model, write_company_artifacts=True):
+        logger = MagicMock(spec=logging.Logger)
+        theme_matrix = parse_themes(logger, model, model_name="test-model")
+        company_artifact_writer = (
+            CompanyArtifactWriter(
+                PATH.OUTPUT_DIRECTORY.value, theme_matrix.theme_names, "test-model"
+            )
+            if write_company_artifacts
+            else None
+        )
+        manifest = InputManifest(PATH.INPUT_MANIFEST_FILE.value)
+        companies_with_themes = update_companies_incrementally(
+            logger,
+            theme_matrix,
+            model,
+            manifest,
+            read_workers=0,
+            company_artifact_writer=company_artifact_writer,
+        )
+        save_processed_data_jsonl(logger, companies_with_themes)
+        if company_artifact_writer is not None:
+            company_artifact_writer.close()
+        manifest.save()
+        return companies_with_themes, logger
+
+    def change_themes(self):
+        with open(PATH.INPUT_THEME_FILE.value, "a", encoding="utf-8") as file:
+            file.write(
+                "\nGroceries: supermarkets and stores selling groceries and food\n"
+            )
+
+    def testing_rescores_changed_themes_from_stored_encodings(
+        self, tmp_path, monkeypatch
+    ):
+        shutil.copytree("inputs", tmp_path / "inputs")
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "outputs").mkdir()
+        self.run_incrementally(StubEncoder(16))
+        self.change_themes()
+        model = RecordingEncoder()
+
+        companies_with_themes, _ = self.run_incrementally(model)
+
+        # Only the themes are encoded, and the companies are rescored from their artifacts
+        assert len(model.sentences) == len(read_lines_from_file("inputs/themes.txt"))
+        for file_name in ["manifest.json", "output.jsonl", "company_index.json"]:
+            os.remove(f"outputs/{file_name}")
+        assert companies_with_themes == self.run_incrementally(StubEncoder(16))[0]
+
+    def testing_runs_in_full_without_stored_encodings(self, tmp_path, monkeypatch):
+        shutil.copytree("inputs", tmp_path / "inputs")
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "outputs").mkdir()
+        self.run_incrementally(StubEncoder(16), write_company_artifacts=False)
+        self.change_themes()
+        model = RecordingEncoder()
+
+        companies_with_themes, logger = self.run_incrementally(
+            model, write_company_artifacts=False
+        )
+
+        logger.warning.assert_any_call(ERROR.NO_STORED_ENCODINGS.value)
+        assert set(companies_with_themes) == {"AAPL", "TSLA", "WMT"}
+        # Every company is encoded again
+        assert all(
+            company["company_description"] in model.sentences
+            for company in companies_with_themes.values()
+        )
+        for file_name in ["manifest.json", "output.jsonl"]:
+            os.remove(f"outputs/{file_name}")
+        assert (
+            companies_with_themes
+            == self.run_incrementally(StubEncoder(16), write_company_artifacts=False)[0]
+        )
+
+    def run_in_full(self):
+        for file_name in ["manifest.json", "output.jsonl", "company_index.json"]:
+            if os.path.exists(f"outputs/{file_name}"):
+                os.remove(f"outputs/{file_name}")
+        return self.run_incrementally(StubEncoder(16))[0]
+
+    @pytest.mark.parametrize("deleted_file", ["apple.html", "apple-two.html"])
+    def testing_keeps_ticker_of_a_remaining_file(
+        self, tmp_path, monkeypatch, deleted_file
+    ):
+        shutil.copytree("inputs", tmp_path / "inputs")
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "outputs").mkdir()
+        apple_html = (tmp_path / "inputs/companies/apple.html").read_text()
+        (tmp_path / "inputs/companies/apple-two.html").write_text(
+            apple_html.replace("Apple", "Apple Two")
+        )
+        self.run_incrementally(StubEncoder(16))
+
+        os.remove(f"inputs/companies/{deleted_file}")
+        companies_with_themes, _ = self.run_incrementally(StubEncoder(16))
+
+        # The company of the remaining file with the same ticker is kept, as in a full run
+        assert set(companies_with_themes) == {"AAPL", "TSLA", "WMT"}
+        assert companies_with_themes == self.run_in_full()
+
+    def testing_added_file_with_a_known_ticker(self, tmp_path, monkeypatch):
+        shutil.copytree("inputs", tmp_path / "inputs")
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "outputs").mkdir()
+        self.run_incrementally(StubEncoder(16))
+        apple_html = (tmp_path / "inputs/companies/apple.html").read_text()
+        for file_name in ["aa-apple.html", "zz-apple.html"]:
+            (tmp_path / "inputs/companies" / file_name).write_text(
+                apple_html.replace("Apple", file_name)
+            )
+
+        companies_with_themes, _ = self.run_incrementally(StubEncoder(16))
+
+        assert companies_with_themes == self.run_in_full()
+
+
+class TestingWatchInputs:
+    def watch_once(self):
+        return watch_inputs(
+            MagicMock(spec=logging.Logger),
+            StubEncoder(dimension=16),
+            InputManifest(PATH.INPUT_MANIFEST_FILE.value),
+            watch_interval_seconds=0.01,
+            watch_batch_size=1,
+            read_workers=0,
+            poll_count=1,
+        )
+
+    def read_output_tickers(self):
+        with jsonlines.open("outputs/output.jsonl", "r") as reader:
+            return [line["company_ticker"] for line in reader]
+
+    def testing_classifies_added_changed_and_deleted_files(self, tmp_path, monkeypatch):
+        shutil.copytree("inputs", tmp_path / "inputs")
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "outputs").mkdir()
+
+        companies_with_themes = self.watch_once()
+
+        assert set(companies_with_themes) == {"AAPL", "TSLA", "WMT"}
+        # The first micro-batch rewrites the output, and the others are appended to it
+        assert sorted(self.read_output_tickers()) == ["AAPL", "TSLA", "WMT"]
+        assert os.path.exists(PATH.INPUT_MANIFEST_FILE.value)
+        assert len(companies_with_themes["AAPL"]["company_top_themes"]) == 3
+
+        os.remove("inputs/companies/tesla.html")
+        apple_html = (tmp_path / "inputs/companies/apple.html").read_text()
+        (tmp_path / "inputs/companies/apple.html").write_text(
+            apple_html.replace("Ticker: AAPL", "Ticker: APLE")
+        )
+
+        companies_with_themes = self.watch_once()
+
+        assert set(companies_with_themes) == {"APLE", "WMT"}
+        assert sorted(self.read_output_tickers()) == ["APLE", "WMT"]
+
+
+class TestingParseArguments:
+    def testing_defaults(self):
+        options = parse_arguments([])
+        assert options.encode_batch_size == 32
+        assert options.parse_window_size == 1000
+
+    def testing_batch_options(self):
+        options = parse_arguments(
+            ["--encode-batch-size", "8", "--parse-window-size", "100"]
+        )
+        assert options.encode_batch_size == 8
+        assert options.parse_window_size == 100
+
+    def testing_encode_workers(self):
+        options = parse_arguments([])
+        assert (options.encode_workers, options.encode_threads) == (1, None)
+        options = parse_arguments(["--encode-workers", "4", "--encode-threads", "2"])
+        assert (options.encode_workers, options.encode_threads) == (4, 2)
+
+    def testing_encoder_server_options(self):
+        options = parse_arguments([])
+        assert options.encoder_socket == ENCODER_SERVER.SOCKET_PATH.value
+        assert not options.no_encoder_server
+        options = parse_arguments(
+            ["--encoder-socket", "/tmp/encoder.sock", "--no-encoder-server"]
+        )
+        assert (options.encoder_socket, options.no_encoder_server) == (
+            "/tmp/encoder.sock",
+            True,
+        )
+
+    def testing_watch_options(self):
+        options = parse_arguments(["--watch", "--watch-interval", "0.5"])
+        assert (options.watch, options.watch_interval) == (True, 0.5)
+        for arguments in [
+            ["--watch", "--incremental"],
+            ["--watch", "--stream"],
+            ["--watch", "--shard-index", "0", "--shard-count", "2"],
+            ["--watch", "--watch-batch-size", "0"],
+        ]:
+            with pytest.raises(SystemExit):
+                parse_arguments(arguments)
+
+    def testing_rejects_non_positive(self):
+        with pytest.raises(SystemExit):
+            parse_arguments(["--encode-batch-size", "0"])
+
+    def testing_shard_options(self):
+        options = parse_arguments(["--shard-index", "1", "--shard-count", "3"])
+        assert (options.shard_index, options.shard_count) == (1, 3)
+        assert parse_arguments(["--merge-shards", "--shard-count", "3"]).merge_shards
+        for arguments in [
+            ["--shard-index", "1"],
+            ["--shard-index", "3", "--shard-count", "3"],
+            ["--merge-shards"],
+            ["--merge-shards", "--shard-index", "0", "--shard-count", "3"],
+            ["--shard-index", "0", "--shard-count", "3", "--stream"],
+        ]:
+            with pytest.raises(SystemExit):
+                parse_arguments(arguments)
+
+    def testing_load_database(self):
+        assert parse_arguments(["--load-database"]).load_database
+        assert parse_arguments(
+            ["--merge-shards", "--shard-count", "2", "--load-database"]
+        ).load_database
+        for arguments in [
+            ["--load-database", "--validate-only"],
+            ["--load-database", "--shard-index", "0", "--shard-count", "2"],
+        ]:
+            with pytest.raises(SystemExit):
+                parse_arguments(arguments)
+
+    def testing_resume(self):
+        options = parse_arguments(["--resume", "--checkpoint-every", "5"])
+        assert options.resume and options.checkpoint_every == 5
+        options = parse_arguments(["--checkpoint-interval", "0.5"])
+        assert options.checkpoint_interval == 0.5
+        assert not parse_arguments([]).checkpoint
+        assert parse_arguments(["--checkpoint"]).checkpoint
+        assert parse_arguments([]).checkpoint_every is None
+        assert parse_arguments([]).checkpoint_interval == 60.0
+        for arguments in [
+            ["--resume", "--stream"],
+            ["--checkpoint", "--incremental"],
+            ["--resume", "--merge-shards", "--shard-count", "2"],
+            ["--checkpoint-every", "0"],
+            ["--checkpoint-interval", "0"],
+        ]:
+            with pytest.raises(SystemExit):
+                parse_arguments(arguments)
+
+    def testing_checkpoint_run_details(self):
+        run_details = checkpoint_run_details(parse_arguments([]), "model")
+        assert run_details == checkpoint_run_details(parse_arguments([]), "model")
+        assert run_details != checkpoint_run_details(
+            parse_arguments(["--embedding-dtype", "float16"]), "model"
+        )
+        assert run_details != checkpoint_run_details(parse_arguments([]), "other")
+
+    def testing_embedding_dtype(self):
+        assert parse_arguments([]).embedding_dtype == "float32"
+        assert (
+            parse_arguments(["--embedding-dtype", "float16"]).embedding_dtype
+            == "float16"
+        )
+        with pytest.raises(SystemExit):
+            parse_arguments(["--embedding-dtype", "int8"])
+
+    def testing_columnar_output(self):
+        assert parse_arguments(["--columnar-output", "--stream"]).columnar_output
+        for arguments in [
+            ["--columnar-output", "--validate-only"],
+            ["--columnar-output", "--shard-index", "0", "--shard-count", "2"],
+        ]:
+            with pytest.raises(SystemExit):
+                parse_arguments(arguments)
+
+    def testing_company_theme_scores(self):
+        assert not parse_arguments([]).company_theme_scores
+        assert parse_arguments(["--company-theme-scores"]).company_theme_scores
+        for arguments in [
+            ["--company-theme-scores", "--no-company-artifacts"],
+            ["--company-theme-scores", "--theme-search", "ivf"],
+        ]:
+            with pytest.raises(SystemExit):
+                parse_arguments(arguments)
+
+    def testing_read_options(self):
+        options = parse_arguments([])
+        assert options.read_workers == 4
+        assert options.read_queue_depth == 1000
+        assert parse_arguments(["--read-workers", "0"]).read_workers == 0
+        with pytest.raises(SystemExit):
+            parse_arguments(["--read-workers", "-1"])
+        with pytest.raises(SystemExit):
+            parse_arguments(["--read-queue-depth", "0"])
+
+    def testing_encoder_backend(self):
+        assert parse_arguments([]).encoder_backend == "torch"
+        assert (
+            parse_arguments(["--encoder-backend", "torch-int8"]).encoder_backend
+            == "torch-int8"
+        )
+        with pytest.raises(SystemExit):
+            parse_arguments(["--encoder-backend", "onnx"])
+        with pytest.raises(SystemExit):
+            parse_arguments(["--parity-check", "--validate-only"])
+
+    def testing_theme_search(self):
+        options = parse_arguments(
+            ["--theme-search", "ivf", "--ivf-lists", "64", "--ivf-probes", "4"]
+        )
+        assert options.theme_search == "ivf"
+        assert options.ivf_lists == 64
+        assert options.ivf_probes == 4
+        assert parse_arguments([]).ivf_lists is None
+
+    def testing_validate_only(self):
+        assert parse_arguments(["--validate-only"]).validate_only
+        with pytest.raises(SystemExit):
+            parse_arguments(["--validate-only", "--stream"])
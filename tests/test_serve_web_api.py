@@ -1,6 +1,8 @@
 import uuid
 from unittest.mock import MagicMock, mock_open, patch
 
+import pytest
+
 from fastapi import HTTPException
 from fastapi.testclient import TestClient
 from sqlalchemy.exc import SQLAlchemyError
@@ -11,7 +13,9 @@ from B_serve_web_api import (
     get_available_theme_names,
     is_valid_ticker,
     log_and_raise_error,
+    online_classifier,
 )
+from constants.data_constants import ERROR
 from tests.test_data.web_api_test_data import (
     companies_by_ticker_bad_request_response,
     companies_by_ticker_not_found_response,
@@ -21,6 +25,12 @@ from tests.test_data.web_api_test_data import (
     company_tickers_by_theme_name_response,
     internal_server_error_response,
 )
+from tests.test_data.data_pipeline_test_data import (
+    test_company_html,
+    test_invalid_html_format,
+)
+from tests.test_online_classifier import THEME_DESCRIPTIONS, save_theme_matrix
+from utils.stub_encoder import StubEncoder
 
 client = TestClient(app)
 
@@ -77,6 +87,59 @@ class TestingListCompanyTickersByThemeName:
             assert response.json() == internal_server_error_response
 
 
+@pytest.fixture
+def classifier_theme_matrix(tmp_path):
+    file_path = str(tmp_path / "theme_matrix.npz")
+    save_theme_matrix(file_path, THEME_DESCRIPTIONS)
+    with patch.object(online_classifier, "theme_matrix_file", file_path), patch.object(
+        online_classifier, "load_model", return_value=StubEncoder(dimension=32)
+    ):
+        yield file_path
+
+
+class TestingClassifyCompany:
+    def testing_200_text(self, classifier_theme_matrix):
+        response = client.post(
+            "/v1/classify", json={"text": "solar panels on roofs", "top_n": 2}
+        )
+        assert response.status_code == 200
+        body = response.json()
+        assert body["company_ticker"] is None
+        assert body["company_description"] == "solar panels on roofs"
+        assert [theme["theme_name"] for theme in body["company_top_themes"]] == [
+            "solar-energy",
+            "electric-vehicles",
+        ]
+        scores = [theme["score"] for theme in body["company_top_themes"]]
+        assert scores == sorted(scores, reverse=True)
+
+    def testing_200_html(self, classifier_theme_matrix):
+        response = client.post("/v1/classify", json={"html": test_company_html})
+        assert response.status_code == 200
+        body = response.json()
+        assert (body["company_ticker"], body["company_name"]) == ("AAPL", "Apple Inc.")
+        assert len(body["company_top_themes"]) == 3
+
+    def testing_400(self, classifier_theme_matrix):
+        response = client.post("/v1/classify", json={"html": test_invalid_html_format})
+        assert response.status_code == 400
+        assert response.json() == {"detail": ERROR.HTML_MALFORMED_DATA.value}
+
+        for request in [{}, {"html": test_company_html, "text": "a"}, {"text": " "}]:
+            assert client.post("/v1/classify", json=request).status_code == 400
+        assert (
+            client.post("/v1/classify", json={"text": "a", "top_n": 0}).status_code
+            == 422
+        )
+
+    def testing_503(self, tmp_path):
+        with patch.object(
+            online_classifier, "theme_matrix_file", str(tmp_path / "missing.npz")
+        ):
+            response = client.post("/v1/classify", json={"text": "solar panels"})
+        assert response.status_code == 503
+
+
 class TestingIsValidTicker:
     def test_return_true(self):
         assert is_valid_ticker("AAA")
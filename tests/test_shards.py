@@ -0,0 +1,61 @@
+from utils.shards import (
+    load_shard_metadata,
+    merge_shard_companies,
+    save_shard_metadata,
+    shard_directory,
+    shard_of_file,
+)
+
+
+def company(ticker, name):
+    return {"company_ticker": ticker, "company_name": name}
+
+
+class TestingShardOfFile:
+    def testing_stable_partition(self):
+        file_names = [f"company{index}.html" for index in range(100)]
+        shards = [shard_of_file(file_name, 4) for file_name in file_names]
+
+        assert set(shards) == {0, 1, 2, 3}
+        # crc32 does not depend on the process, unlike hash()
+        assert shard_of_file("apple.html", 4) == 1
+        assert all(shard_of_file(file_name, 1) == 0 for file_name in file_names)
+
+
+class TestingShardMetadata:
+    def testing_save_and_load(self, tmp_path):
+        directory = shard_directory(str(tmp_path), 1, 3)
+        assert directory.endswith("shard-1-of-3")
+        tmp_path.joinpath("shard-1-of-3").mkdir()
+
+        save_shard_metadata(
+            directory, 1, 3, ["theme1"], "hash", "model", {"AAPL": "apple.html"}
+        )
+
+        metadata = load_shard_metadata(directory)
+        assert metadata["shard_index"] == 1
+        assert metadata["company_files"] == {"AAPL": "apple.html"}
+        assert load_shard_metadata(str(tmp_path)) is None
+
+
+class TestingMergeShardCompanies:
+    def testing_duplicate_tickers(self):
+        first_shard = (
+            {"AAPL": company("AAPL", "from b"), "TSLA": company("TSLA", "tesla")},
+            {"AAPL": "b.html", "TSLA": "t.html"},
+        )
+        second_shard = (
+            {"AAPL": company("AAPL", "from c"), "WMT": company("WMT", "walmart")},
+            {"AAPL": "c.html", "WMT": "a.html"},
+        )
+
+        merged, duplicate_count, company_shards = merge_shard_companies(
+            [first_shard, second_shard]
+        )
+        reversed_merged, _, _ = merge_shard_companies([second_shard, first_shard])
+
+        assert duplicate_count == 1
+        assert company_shards == {"WMT": 1, "AAPL": 1, "TSLA": 0}
+        assert merged["AAPL"]["company_name"] == "from c"
+        assert list(merged.keys()) == ["WMT", "AAPL", "TSLA"]
+        assert list(reversed_merged.items()) == list(merged.items())
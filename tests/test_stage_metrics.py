@@ -0,0 +1,73 @@
+import json
+import os
+
+from utils.stage_metrics import StageMetrics
+
+
+class TestingStageMetrics:
+    def testing_stage_accumulates_calls(self):
+        metrics = StageMetrics()
+
+        with metrics.stage("parse") as timer:
+            timer.add_items(3)
+        with metrics.stage("parse") as timer:
+            timer.add_items(2)
+
+        stage = metrics.summary()["stages"]["parse"]
+        assert stage["calls"] == 2
+        assert stage["items"] == 5
+        assert stage["wall_seconds"] >= 0
+        assert stage["cpu_seconds"] >= 0
+
+    def testing_timed_counts_items(self):
+        metrics = StageMetrics()
+
+        @metrics.timed("double", lambda result, values: len(values))
+        def double(values):
+            return [value * 2 for value in values]
+
+        assert double([1, 2, 3]) == [2, 4, 6]
+        assert double.__name__ == "double"
+        assert metrics.summary()["stages"]["double"]["items"] == 3
+
+    def testing_stage_is_recorded_on_error(self):
+        metrics = StageMetrics()
+
+        @metrics.timed("failing")
+        def failing():
+            raise ValueError()
+
+        try:
+            failing()
+        except ValueError:
+            pass
+
+        assert metrics.summary()["stages"]["failing"]["calls"] == 1
+
+    def testing_reset(self):
+        metrics = StageMetrics()
+        with metrics.stage("parse"):
+            pass
+
+        metrics.add_details(company_store={"bytes_per_company": 100})
+        assert metrics.summary()["company_store"] == {"bytes_per_company": 100}
+
+        metrics.reset()
+
+        assert metrics.summary()["stages"] == {}
+        assert "company_store" not in metrics.summary()
+
+    def testing_save(self, tmp_path):
+        metrics = StageMetrics()
+        with metrics.stage("parse") as timer:
+            timer.add_items(4)
+
+        file_path = metrics.save(str(tmp_path), "pipeline", mode="full")
+
+        assert os.path.basename(file_path).startswith("pipeline-metrics-")
+        with open(file_path, "r", encoding="utf-8") as file:
+            summary = json.load(file)
+        assert summary["mode"] == "full"
+        assert summary["stages"]["parse"]["items"] == 4
+        assert "items_per_second" in summary["stages"]["parse"]
+        assert "peak_rss_mb" in summary
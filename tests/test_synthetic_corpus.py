@@ -0,0 +1,59 @@
+import os
+
+from A_process_data_pipeline import parse_company_file, parse_theme_descriptions
+from constants.data_constants import PATH
+from utils.synthetic_corpus import (
+    MALFORMED_KINDS,
+    write_synthetic_companies,
+    write_synthetic_themes,
+)
+
+
+class TestingSyntheticCorpus:
+    def testing_valid_companies_parse(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        malformed_count = write_synthetic_companies(
+            PATH.INPUT_COMPANIES_DIRECTORY.value, 5
+        )
+
+        assert malformed_count == 0
+        html_files = sorted(os.listdir(PATH.INPUT_COMPANIES_DIRECTORY.value))
+        company_details, error_message = parse_company_file(html_files[1])
+        assert error_message is None
+        assert company_details[:2] == ("Company 1 Holdings", "C000001")
+        assert company_details[2]
+
+    def testing_malformed_companies_are_rejected(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        malformed_count = write_synthetic_companies(
+            PATH.INPUT_COMPANIES_DIRECTORY.value, 10, malformed_share=1.0
+        )
+
+        assert malformed_count == 10
+        parse_results = [
+            parse_company_file(html_file)
+            for html_file in os.listdir(PATH.INPUT_COMPANIES_DIRECTORY.value)
+        ]
+        error_messages = {error_message for _, error_message in parse_results}
+        assert None not in error_messages
+        # Every kind of malformed file is rejected with its own error
+        assert len({message.split("]:")[1] for message in error_messages}) == len(
+            MALFORMED_KINDS
+        )
+
+    def testing_same_seed_writes_same_files(self, tmp_path):
+        write_synthetic_companies(str(tmp_path / "first"), 3, 0.5)
+        write_synthetic_companies(str(tmp_path / "second"), 3, 0.5)
+
+        for html_file in os.listdir(tmp_path / "first"):
+            assert (tmp_path / "first" / html_file).read_text() == (
+                tmp_path / "second" / html_file
+            ).read_text()
+
+    def testing_themes_parse(self, tmp_path, monkeypatch, mocker):
+        monkeypatch.chdir(tmp_path)
+        write_synthetic_themes(PATH.INPUT_THEME_FILE.value, 4)
+
+        themes = parse_theme_descriptions(mocker.MagicMock())
+
+        assert list(themes.keys()) == ["theme0", "theme1", "theme2", "theme3"]
@@ -0,0 +1,57 @@
+import torch
+
+from utils.theme_index import IvfThemeIndex, spherical_kmeans
+
+
+def sample_themes():
+    generator = torch.Generator().manual_seed(1)
+    return torch.nn.functional.normalize(torch.randn(40, 8, generator=generator), dim=1)
+
+
+class TestingSphericalKmeans:
+    def testing_every_row_in_one_cluster(self):
+        themes = sample_themes()
+        centroids, assignments = spherical_kmeans(themes, 5, 10)
+
+        assert centroids.shape == (5, 8)
+        torch.testing.assert_close(centroids.norm(dim=1), torch.ones(5))
+        assert assignments.shape == (40,)
+        assert torch.equal(assignments, spherical_kmeans(themes, 5, 10)[1])
+
+
+class TestingIvfThemeIndex:
+    def testing_lists_partition_themes(self):
+        theme_index = IvfThemeIndex(sample_themes(), list_count=5, probe_count=2)
+
+        members = torch.cat(theme_index.lists).sort().values
+        assert torch.equal(members, torch.arange(40))
+        assert theme_index.max_list_size == max(len(m) for m in theme_index.lists)
+
+    def testing_default_list_count(self):
+        theme_index = IvfThemeIndex(sample_themes(), probe_count=100)
+        assert theme_index.list_count == 6
+        assert theme_index.probe_count == 6
+
+    def testing_probing_every_list_finds_every_theme(self):
+        themes = sample_themes()
+        companies = themes[:3] + 0.01
+        theme_index = IvfThemeIndex(themes, list_count=4, probe_count=4)
+
+        candidate_themes, candidate_scores = theme_index.candidates(companies)
+
+        for row in range(3):
+            found = candidate_themes[row][candidate_themes[row] >= 0]
+            assert torch.equal(found.sort().values, torch.arange(40))
+            torch.testing.assert_close(
+                candidate_scores[row][candidate_themes[row] >= 0],
+                companies[row] @ themes[found].T,
+            )
+
+    def testing_record_recall(self):
+        theme_index = IvfThemeIndex(sample_themes(), list_count=2, probe_count=1)
+        assert theme_index.recall is None
+
+        theme_index.record_recall([[1, 2, 3], [4, 5, 6]], [[1, 2, 3], [4, 5, 7]])
+
+        assert theme_index.recall == 5 / 6
+        assert theme_index.sampled_company_count == 2
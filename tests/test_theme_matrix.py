@@ -0,0 +1,46 @@
+import numpy
+
+from utils.theme_matrix import ThemeMatrix
+
+
+def sample_theme_matrix():
+    return ThemeMatrix(
+        ["east", "north"], numpy.array([[1.0, 0.0], [0.0, 1.0]]), "hash", "model"
+    )
+
+
+class TestingThemeMatrix:
+    def testing_save_and_load(self, tmp_path):
+        path = str(tmp_path / "theme_matrix.npz")
+        sample_theme_matrix().save(path)
+
+        theme_matrix = ThemeMatrix.load(path)
+
+        assert theme_matrix.theme_names == ["east", "north"]
+        assert theme_matrix.matrix.dtype == numpy.float32
+        numpy.testing.assert_array_equal(theme_matrix.matrix, [[1.0, 0.0], [0.0, 1.0]])
+        assert theme_matrix.is_current(["east", "north"], "hash", "model")
+
+    def testing_is_current(self):
+        theme_matrix = sample_theme_matrix()
+        assert not theme_matrix.is_current(["east", "north"], "other hash", "model")
+        assert not theme_matrix.is_current(["east", "north"], "hash", "other model")
+        assert not theme_matrix.is_current(["north", "east"], "hash", "model")
+
+    def testing_missing_or_unreadable_artifact(self, tmp_path):
+        assert ThemeMatrix.load(str(tmp_path / "missing.npz")) is None
+
+        path = tmp_path / "theme_matrix.npz"
+        path.write_bytes(b"not an artifact")
+        assert ThemeMatrix.load(str(path)) is None
+
+    def testing_other_format_version(self, tmp_path):
+        path = str(tmp_path / "theme_matrix.npz")
+        with open(path, "wb") as file:
+            numpy.savez(
+                file,
+                theme_names=numpy.array(["east"]),
+                matrix=numpy.array([[1.0]]),
+                metadata=numpy.array('{"format_version": 0}'),
+            )
+        assert ThemeMatrix.load(path) is None
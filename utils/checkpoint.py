@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from constants.data_constants import CHECKPOINT
+from utils.input_sources import input_file_signature
+
+CHECKPOINT_FORMAT_VERSION = 1
+CHECKPOINT_DIRECTORY_NAME = "checkpoint"
+RECORD_KEYS = [
+    "company_name",
+    "company_ticker",
+    "company_description",
+    "company_html_file",
+]
+
+
+def run_fingerprint(
+    directory: str, html_files: List[str], run_details: Dict[str, any]
+) -> str:
+    """Return the sha256 of the run details and the name, size and mtime of every input file, in
+    order. A checkpoint is only resumed by a run with the same fingerprint, as the companies it
+    holds would otherwise differ from those of an uninterrupted run.
+    """
+    digest = hashlib.sha256(json.dumps(run_details, sort_keys=True).encode("utf-8"))
+    for html_file in html_files:
+        file_size, file_mtime_ns = input_file_signature(directory, html_file)
+        digest.update(f"{html_file}\n{file_size}\n{file_mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class PipelineCheckpoint:
+    """Checkpoint of the companies parsed and encoded so far by a run of the data pipeline.
+
+    Every window of companies is appended to a JSON lines file of records and a flat float32 file
+    of encodings, in the order the windows were processed. Once checkpoint_seconds passed since the
+    last checkpoint, or with checkpoint_every, once that many windows were appended, both files are
+    flushed to disk and the state file is replaced with how many windows, bytes of records and rows
+    of encodings were written. Checkpointing by time keeps the cost of the fsyncs independent of
+    the parse window size. A run that stops mid-window resumes from the last
+    checkpoint, and whatever was written after it is truncated. The run details, such as the model
+    and the parse window size, are part of the fingerprint of the run.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        run_details: Dict[str, any],
+        checkpoint_every: Optional[int] = None,
+        checkpoint_seconds: float = CHECKPOINT.INTERVAL_SECONDS.value,
+    ):
+        self.directory = directory
+        self.run_details = run_details
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_seconds = checkpoint_seconds
+        self.state_path = os.path.join(directory, "state.json")
+        self.records_path = os.path.join(directory, "records.jsonl")
+        self.encodings_path = os.path.join(directory, "encodings.f32")
+
+        self.fingerprint: Optional[str] = None
+        self.window_count = 0
+        self.record_bytes = 0
+        self.encoding_rows = 0
+        self.dimension: Optional[int] = None
+        self.pending_window_count = 0
+        self.last_commit_time = time.monotonic()
+        self.records_file = None
+        self.encodings_file = None
+
+    def read_state(self) -> Optional[Dict[str, any]]:
+        if not os.path.exists(self.state_path):
+            return None
+        with open(self.state_path, "r", encoding="utf-8") as file:
+            state = json.load(file)
+        if state.get("format_version") != CHECKPOINT_FORMAT_VERSION:
+            return None
+        return state
+
+    def resume(self, fingerprint: str) -> List[Tuple[Dict[str, any], np.ndarray]]:
+        """Return the record and encoding of every company of the last checkpoint, in the order
+        they were processed. Return nothing, and start a new checkpoint, when there is none or it
+        belongs to another run.
+        """
+        state = self.read_state()
+        if state is None or state["fingerprint"] != fingerprint:
+            self.start(fingerprint)
+            return []
+
+        self.fingerprint = fingerprint
+        self.window_count = state["window_count"]
+        self.record_bytes = state["record_bytes"]
+        self.encoding_rows = state["encoding_rows"]
+        self.dimension = state["dimension"]
+
+        with open(self.records_path, "rb") as file:
+            record_lines = file.read(self.record_bytes).splitlines()
+        encodings = np.zeros((0, self.dimension or 0), dtype=np.float32)
+        if self.encoding_rows > 0:
+            encodings = np.fromfile(
+                self.encodings_path,
+                dtype="<f4",
+                count=self.encoding_rows * self.dimension,
+            ).reshape(self.encoding_rows, self.dimension)
+
+        self.open_files(truncate=True)
+        return [
+            (json.loads(record_line), encoding)
+            for record_line, encoding in zip(record_lines, encodings)
+        ]
+
+    def start(self, fingerprint: str) -> None:
+        """Discard any previous checkpoint and start an empty one"""
+        self.remove()
+        os.makedirs(self.directory, exist_ok=True)
+        self.fingerprint = fingerprint
+        self.window_count = 0
+        self.record_bytes = 0
+        self.encoding_rows = 0
+        self.dimension = None
+        for file_path in [self.records_path, self.encodings_path]:
+            open(file_path, "wb").close()
+        self.open_files(truncate=False)
+        self.commit()
+
+    def open_files(self, truncate: bool) -> None:
+        if truncate:
+            os.truncate(self.records_path, self.record_bytes)
+            os.truncate(
+                self.encodings_path, self.encoding_rows * (self.dimension or 0) * 4
+            )
+        self.records_file = open(self.records_path, "ab")
+        self.encodings_file = open(self.encodings_path, "ab")
+
+    def append_window(self, companies: Dict[str, any], encodings: np.ndarray) -> None:
+        """Append the companies of a window with their encodings, one row per company, and
+        checkpoint once the interval passed
+        """
+        for company in companies.values():
+            record_line = (
+                json.dumps({key: company[key] for key in RECORD_KEYS}) + "\n"
+            ).encode("utf-8")
+            self.records_file.write(record_line)
+            self.record_bytes += len(record_line)
+        if len(encodings) > 0:
+            self.dimension = encodings.shape[1]
+            self.encodings_file.write(encodings.astype("<f4").tobytes())
+            self.encoding_rows += len(encodings)
+
+        self.window_count += 1
+        self.pending_window_count += 1
+        if (
+            self.checkpoint_every is not None
+            and self.pending_window_count >= self.checkpoint_every
+        ) or time.monotonic() - self.last_commit_time >= self.checkpoint_seconds:
+            self.commit()
+
+    def commit(self) -> None:
+        """Flush the appended windows to disk, then record them in the state file"""
+        for file in [self.records_file, self.encodings_file]:
+            file.flush()
+            os.fsync(file.fileno())
+        with open(f"{self.state_path}.tmp", "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "format_version": CHECKPOINT_FORMAT_VERSION,
+                    "fingerprint": self.fingerprint,
+                    "window_count": self.window_count,
+                    "record_bytes": self.record_bytes,
+                    "encoding_rows": self.encoding_rows,
+                    "dimension": self.dimension,
+                },
+                file,
+            )
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(f"{self.state_path}.tmp", self.state_path)
+        self.pending_window_count = 0
+        self.last_commit_time = time.monotonic()
+
+    def close(self) -> None:
+        for file in [self.records_file, self.encodings_file]:
+            if file is not None:
+                file.close()
+        self.records_file = None
+        self.encodings_file = None
+
+    def remove(self) -> None:
+        """Delete the checkpoint, once the output it was kept for is saved"""
+        self.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,284 @@
+import json
+import os
+import shutil
+import struct
+import tempfile
+from array import array
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pyarrow is optional
+    pyarrow = None
+
+COLUMNAR_FORMAT_VERSION = 1
+PARQUET_FILE = "output.parquet"
+COLUMNS_FILE = "output.columns"
+COLUMNS_MAGIC = b"THEIACOL"
+STRING_COLUMNS = ["company_ticker", "company_name", "company_description"]
+THEMES_COLUMN = "company_top_themes"
+COLUMNS = ["company_ticker", "company_name", THEMES_COLUMN, "company_description"]
+
+
+class ColumnarOutputWriter:
+    """Writes the processed companies column by column, next to output.jsonl.
+
+    With pyarrow installed, this is a Parquet file. Otherwise it is a compact self-describing
+    binary file: a magic number, the length of a JSON header and the header itself, followed by
+    every column as an array of little-endian uint64 offsets into its data. String columns hold
+    UTF-8 bytes, and the top themes column holds little-endian uint32 indices into the theme names
+    of the header. Either way, a reader can load some of the columns, or a range of rows, without
+    reading the rest.
+
+    Companies are appended a window at a time, and the data of every column is spooled to a
+    temporary file, so only the offsets are held in memory.
+    """
+
+    def __init__(self, directory: str, theme_names: List[str]):
+        self.directory = directory
+        self.theme_names = list(theme_names)
+        self.theme_indices = {
+            theme_name: index for index, theme_name in enumerate(theme_names)
+        }
+        self.row_count = 0
+        os.makedirs(directory, exist_ok=True)
+        if pyarrow is not None:
+            self.path = os.path.join(directory, PARQUET_FILE)
+            self.parquet_writer = None
+        else:
+            self.path = os.path.join(directory, COLUMNS_FILE)
+            self.offsets = {column: array("Q", [0]) for column in COLUMNS}
+            self.column_files = {column: tempfile.TemporaryFile() for column in COLUMNS}
+
+    def append(self, companies_with_themes: Dict[str, any]) -> None:
+        companies = list(companies_with_themes.values())
+        if not companies:
+            return
+        if pyarrow is not None:
+            self.append_parquet(companies)
+        else:
+            self.append_columns(companies)
+        self.row_count += len(companies)
+
+    def append_parquet(self, companies: List[Dict[str, any]]) -> None:
+        table = pyarrow.table(
+            {column: [company[column] for company in companies] for column in COLUMNS}
+        )
+        if self.parquet_writer is None:
+            self.parquet_writer = pyarrow.parquet.ParquetWriter(
+                f"{self.path}.tmp", table.schema
+            )
+        self.parquet_writer.write_table(table)
+
+    def append_columns(self, companies: List[Dict[str, any]]) -> None:
+        for column in STRING_COLUMNS:
+            for company in companies:
+                self.write_value(column, company[column].encode("utf-8"))
+        for company in companies:
+            self.write_value(
+                THEMES_COLUMN,
+                np.array(
+                    [
+                        self.theme_index(theme_name)
+                        for theme_name in company[THEMES_COLUMN]
+                    ],
+                    dtype="<u4",
+                ).tobytes(),
+            )
+
+    def write_value(self, column: str, value: bytes) -> None:
+        self.column_files[column].write(value)
+        self.offsets[column].append(self.offsets[column][-1] + len(value))
+
+    def theme_index(self, theme_name: str) -> int:
+        if theme_name not in self.theme_indices:
+            self.theme_indices[theme_name] = len(self.theme_names)
+            self.theme_names.append(theme_name)
+        return self.theme_indices[theme_name]
+
+    def close(self) -> str:
+        """Write the file, replacing the previous one, and return its path"""
+        if pyarrow is not None:
+            if self.parquet_writer is None:
+                pyarrow.parquet.write_table(
+                    pyarrow.table(
+                        {
+                            column: pyarrow.array(
+                                [],
+                                (
+                                    pyarrow.list_(pyarrow.string())
+                                    if column == THEMES_COLUMN
+                                    else pyarrow.string()
+                                ),
+                            )
+                            for column in COLUMNS
+                        }
+                    ),
+                    f"{self.path}.tmp",
+                )
+            else:
+                self.parquet_writer.close()
+        else:
+            self.close_columns()
+        os.replace(f"{self.path}.tmp", self.path)
+        return self.path
+
+    def discard(self) -> None:
+        """Close and remove the temporary files, keeping the previous file"""
+        if pyarrow is not None:
+            if self.parquet_writer is not None:
+                self.parquet_writer.close()
+            if os.path.exists(f"{self.path}.tmp"):
+                os.remove(f"{self.path}.tmp")
+        else:
+            for column_file in self.column_files.values():
+                column_file.close()
+
+    def close_columns(self) -> None:
+        columns = dict()
+        position = 0
+        for column in COLUMNS:
+            offsets_length = len(self.offsets[column]) * 8
+            data_length = self.offsets[column][-1]
+            columns[column] = {
+                "offsets": [position, offsets_length],
+                "data": [position + offsets_length, data_length],
+            }
+            position += offsets_length + data_length
+        header = json.dumps(
+            {
+                "format_version": COLUMNAR_FORMAT_VERSION,
+                "row_count": self.row_count,
+                "theme_names": self.theme_names,
+                "columns": columns,
+            }
+        ).encode("utf-8")
+
+        with open(f"{self.path}.tmp", "wb") as file:
+            file.write(COLUMNS_MAGIC)
+            file.write(struct.pack("<Q", len(header)))
+            file.write(header)
+            for column in COLUMNS:
+                file.write(np.asarray(self.offsets[column], dtype="<u8").tobytes())
+                self.column_files[column].seek(0)
+                shutil.copyfileobj(self.column_files[column], file)
+                self.column_files[column].close()
+
+
+def find_columnar_output(directory: str) -> Optional[str]:
+    """Return the path of the columnar output in a directory, the newest if there are both kinds,
+    or None if there is none
+    """
+    paths = [
+        os.path.join(directory, file_name)
+        for file_name in [PARQUET_FILE, COLUMNS_FILE]
+        if os.path.exists(os.path.join(directory, file_name))
+    ]
+    if not paths:
+        return None
+    return max(paths, key=lambda path: os.stat(path).st_mtime_ns)
+
+
+def read_columnar_output(
+    path: str, columns: Optional[List[str]] = None
+) -> Dict[str, List[any]]:
+    """Read some or all of the columns of a columnar output, as lists keyed by column name. The
+    other columns are not read.
+    """
+    columns = columns or COLUMNS
+    if path.endswith(PARQUET_FILE):
+        if pyarrow is None:
+            raise ImportError("pyarrow is needed to read a Parquet output")
+        return pyarrow.parquet.read_table(path, columns=columns).to_pydict()
+
+    with open(path, "rb") as file:
+        header, data_start = read_columns_header(file, path)
+        return {
+            column: read_column_rows(
+                file, header, data_start, column, 0, header["row_count"]
+            )
+            for column in columns
+        }
+
+
+def read_columns_header(file: BinaryIO, path: str) -> Tuple[Dict[str, any], int]:
+    """Read the header of a columns file, and return it with the position its columns start at"""
+    if file.read(len(COLUMNS_MAGIC)) != COLUMNS_MAGIC:
+        raise ValueError(f"not a columnar output file: {path}")
+    (header_length,) = struct.unpack("<Q", file.read(8))
+    header = json.loads(file.read(header_length).decode("utf-8"))
+    if header["format_version"] != COLUMNAR_FORMAT_VERSION:
+        raise ValueError(f"unsupported columnar output version: {path}")
+    return header, len(COLUMNS_MAGIC) + 8 + header_length
+
+
+def read_column_rows(
+    file: BinaryIO,
+    header: Dict[str, any],
+    data_start: int,
+    column: str,
+    start: int,
+    stop: int,
+) -> List[any]:
+    """Read the values of a range of rows of one column of a columns file, reading only the
+    offsets and data of those rows
+    """
+    if start >= stop:
+        return []
+    offsets_position, _ = header["columns"][column]["offsets"]
+    data_position, _ = header["columns"][column]["data"]
+    file.seek(data_start + offsets_position + start * 8)
+    offsets = np.frombuffer(file.read((stop - start + 1) * 8), dtype="<u8").tolist()
+    file.seek(data_start + data_position + offsets[0])
+    data = file.read(offsets[-1] - offsets[0])
+    offsets = [offset - offsets[0] for offset in offsets]
+    if column == THEMES_COLUMN:
+        theme_indices = np.frombuffer(data, dtype="<u4").tolist()
+        return [
+            [
+                header["theme_names"][index]
+                for index in theme_indices[value_start // 4 : value_end // 4]
+            ]
+            for value_start, value_end in zip(offsets, offsets[1:])
+        ]
+    return [
+        data[value_start:value_end].decode("utf-8")
+        for value_start, value_end in zip(offsets, offsets[1:])
+    ]
+
+
+def iterate_columnar_rows(
+    path: str, chunk_size: int, columns: Optional[List[str]] = None
+) -> Iterator[List[Dict[str, any]]]:
+    """Yield the companies of a columnar output as lists of at most chunk_size rows. Only one chunk
+    of rows is read into memory at a time.
+    """
+    columns = columns or COLUMNS
+    if path.endswith(PARQUET_FILE):
+        if pyarrow is None:
+            raise ImportError("pyarrow is needed to read a Parquet output")
+        parquet_file = pyarrow.parquet.ParquetFile(path)
+        for record_batch in parquet_file.iter_batches(
+            batch_size=chunk_size, columns=columns
+        ):
+            yield record_batch.to_pylist()
+        return
+
+    with open(path, "rb") as file:
+        header, data_start = read_columns_header(file, path)
+        row_count = header["row_count"]
+        for chunk_start in range(0, row_count, chunk_size):
+            chunk_stop = min(chunk_start + chunk_size, row_count)
+            values = {
+                column: read_column_rows(
+                    file, header, data_start, column, chunk_start, chunk_stop
+                )
+                for column in columns
+            }
+            yield [
+                {column: values[column][row] for column in columns}
+                for row in range(chunk_stop - chunk_start)
+            ]
@@ -0,0 +1,192 @@
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+COMPANY_ARTIFACTS_FORMAT_VERSION = 2
+EMBEDDINGS_FILE = "company_embeddings.f32"
+SCORES_FILE = "company_theme_scores.f32"
+INDEX_FILE = "company_index.json"
+
+
+class CompanyArtifactWriter:
+    """Writes the normalized encoding of each scored company to a flat float32 file, one row per
+    company, along with an index of the row of every ticker. With has_scores, the similarity of
+    every company to every theme is also written, one row per company with one column per theme.
+    That matrix grows with companies times themes, so it is only written on request.
+
+    Rows are appended as companies are scored, so that only one chunk is held in memory. The files
+    replace the previous artifacts when the writer is closed. If a ticker is written again, the
+    index points to its last row.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        theme_names: List[str],
+        model_name: str,
+        has_scores: bool = False,
+    ):
+        self.directory = directory
+        self.theme_names = theme_names
+        self.model_name = model_name
+        self.has_scores = has_scores
+        self.dimension: Optional[int] = None
+        self.rows: Dict[str, int] = dict()
+        self.row_count = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self.embeddings_file = open(self.temporary_path(EMBEDDINGS_FILE), "wb")
+        self.scores_file = (
+            open(self.temporary_path(SCORES_FILE), "wb") if has_scores else None
+        )
+
+    def temporary_path(self, file_name: str) -> str:
+        return os.path.join(self.directory, f"{file_name}.tmp")
+
+    def append(
+        self,
+        company_tickers: List[str],
+        embeddings: np.ndarray,
+        scores: Optional[np.ndarray] = None,
+    ) -> None:
+        """Append the normalized encodings and theme scores of a chunk of companies"""
+        if self.dimension is None:
+            self.dimension = int(embeddings.shape[1])
+        self.embeddings_file.write(
+            np.ascontiguousarray(embeddings, dtype=np.float32).tobytes()
+        )
+        if self.has_scores:
+            self.scores_file.write(
+                np.ascontiguousarray(scores, dtype=np.float32).tobytes()
+            )
+        for offset, company_ticker in enumerate(company_tickers):
+            self.rows[company_ticker] = self.row_count + offset
+        self.row_count += len(company_tickers)
+
+    def close(self) -> None:
+        """Write the index and replace the previous artifacts"""
+        self.embeddings_file.close()
+        if self.scores_file is not None:
+            self.scores_file.close()
+        index = {
+            "format_version": COMPANY_ARTIFACTS_FORMAT_VERSION,
+            "model_name": self.model_name,
+            "dimension": self.dimension or 0,
+            "row_count": self.row_count,
+            "has_scores": self.has_scores,
+            "theme_names": self.theme_names,
+            "rows": self.rows,
+        }
+        with open(self.temporary_path(INDEX_FILE), "w", encoding="utf-8") as file:
+            json.dump(index, file)
+
+        file_names = [EMBEDDINGS_FILE, SCORES_FILE, INDEX_FILE]
+        if not self.has_scores:
+            file_names.remove(SCORES_FILE)
+        for file_name in file_names:
+            os.replace(
+                self.temporary_path(file_name), os.path.join(self.directory, file_name)
+            )
+        scores_path = os.path.join(self.directory, SCORES_FILE)
+        if not self.has_scores and os.path.exists(scores_path):
+            # The scores of the previous artifacts no longer match their rows
+            os.remove(scores_path)
+
+    def discard(self) -> None:
+        """Close and remove the temporary files, keeping the previous artifacts"""
+        self.embeddings_file.close()
+        if self.scores_file is not None:
+            self.scores_file.close()
+        for file_name in [EMBEDDINGS_FILE, SCORES_FILE]:
+            if os.path.exists(self.temporary_path(file_name)):
+                os.remove(self.temporary_path(file_name))
+
+
+class CompanyArtifacts:
+    """Read-only view of the artifacts written by a CompanyArtifactWriter.
+
+    The embedding and score matrices are memory-mapped, so opening them copies nothing and does not
+    need torch.
+    """
+
+    def __init__(self, directory: str, index: Dict[str, any]):
+        self.directory = directory
+        self.model_name: str = index["model_name"]
+        self.theme_names: List[str] = index["theme_names"]
+        self.rows: Dict[str, int] = index["rows"]
+        self.embeddings = open_matrix(
+            os.path.join(directory, EMBEDDINGS_FILE),
+            index["row_count"],
+            index["dimension"],
+        )
+        self.scores: Optional[np.ndarray] = (
+            open_matrix(
+                os.path.join(directory, SCORES_FILE),
+                index["row_count"],
+                len(self.theme_names),
+            )
+            if index["has_scores"]
+            else None
+        )
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["CompanyArtifacts"]:
+        """Open the artifacts in a directory. Return None if there are none, or they have another
+        format version
+        """
+        index_path = os.path.join(directory, INDEX_FILE)
+        if not os.path.exists(index_path):
+            return None
+        with open(index_path, "r", encoding="utf-8") as file:
+            index = json.load(file)
+        if index["format_version"] != COMPANY_ARTIFACTS_FORMAT_VERSION:
+            return None
+        return cls(directory, index)
+
+    @property
+    def saved_time(self) -> float:
+        """Return the time the artifacts were written, as a file modification time"""
+        return os.path.getmtime(os.path.join(self.directory, INDEX_FILE))
+
+    def embedding(self, company_ticker: str) -> np.ndarray:
+        return self.embeddings[self.rows[company_ticker]]
+
+    def theme_scores(self, company_ticker: str) -> Dict[str, float]:
+        """Return the similarity of a company to every theme, keyed by theme name. Only available
+        when the artifacts were written with theme scores.
+        """
+        return dict(
+            zip(self.theme_names, self.scores[self.rows[company_ticker]].tolist())
+        )
+
+    def nearest_companies(
+        self, company_ticker: str, top_n: int
+    ) -> List[Tuple[str, float]]:
+        """Return the top N other companies with the most similar description encodings, with their
+        similarity, highest first
+        """
+        row_tickers = {row: ticker for ticker, row in self.rows.items()}
+        similarities = self.embeddings @ self.embedding(company_ticker)
+        nearest = []
+        for row in np.argsort(-similarities, kind="stable").tolist():
+            if row in row_tickers and row_tickers[row] != company_ticker:
+                nearest.append((row_tickers[row], float(similarities[row])))
+                if len(nearest) == top_n:
+                    break
+        return nearest
+
+
+def remove_company_artifacts(directory: str) -> None:
+    """Delete the artifacts in a directory, e.g. once they no longer match its output"""
+    for file_name in [INDEX_FILE, EMBEDDINGS_FILE, SCORES_FILE]:
+        file_path = os.path.join(directory, file_name)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+
+def open_matrix(path: str, row_count: int, column_count: int) -> np.ndarray:
+    if row_count == 0 or column_count == 0:
+        return np.zeros((row_count, column_count), dtype=np.float32)
+    return np.memmap(path, dtype=np.float32, mode="r", shape=(row_count, column_count))
@@ -0,0 +1,137 @@
+from typing import Optional, Tuple
+
+from bs4 import BeautifulSoup
+
+from constants.data_constants import ERROR, FORMAT, HTML_EXTRACTOR, PREFIX
+from utils.html_tokenizer import parse_simple_html
+
+
+def parse_company_html(
+    html_content: str, html_extractor: str = HTML_EXTRACTOR.FAST.value
+) -> Tuple[Optional[tuple], Optional[str]]:
+    """Parse the HTML of one company. Return its (name, ticker, description) tuple, or the reason
+    it does not follow the expected format.
+    """
+    if html_extractor == HTML_EXTRACTOR.FAST.value:
+        company_details = extract_company_details_fast(html_content)
+        if company_details is not None:
+            return company_details, None
+
+    processed_html = BeautifulSoup(html_content, "html.parser")
+
+    if not is_expected_html_format(processed_html):
+        return None, ERROR.HTML_MALFORMED_DATA.value
+
+    try:
+        return extract_company_details(processed_html), None
+    except Exception as exception_message:
+        return None, str(exception_message)
+
+
+def is_expected_html_format(processed_html: BeautifulSoup) -> bool:
+    """Return boolean if the tag structure is the same expected structure"""
+    list_of_tags = [tag.name for tag in processed_html.find_all()]
+    if list_of_tags != FORMAT.HTML_TAG_STRUCTURE.value:
+        return False
+    return True
+
+
+def extract_company_details(processed_html: BeautifulSoup) -> tuple:
+    """Call helper functions to obtain the respective company information and return the tuple of
+    information, otherwise raise exception.
+    """
+    try:
+        company_name = extract_company_name(processed_html)
+        company_ticker = extract_company_ticker(processed_html)
+        company_description = extract_company_description(processed_html)
+    except Exception as error_message:
+        raise Exception(error_message)
+
+    return company_name, company_ticker, company_description
+
+
+def extract_company_details_fast(html_content: str) -> Optional[tuple]:
+    """Extract the company information from the HTML in a single pass, without building a
+    BeautifulSoup tree. Return None for any document that is not in exactly the expected format,
+    so the caller can fall back to BeautifulSoup and report the same errors as before.
+    """
+    document = parse_simple_html(html_content)
+    if document is None or document.tag_names != FORMAT.HTML_TAG_STRUCTURE.value:
+        return None
+    if "head" not in document.enclosing_tags["title"] or any(
+        "body" not in document.enclosing_tags[tag] for tag in ["h1", "h2", "p"]
+    ):
+        return None
+
+    try:
+        return (
+            company_name_from_text(document.text("title"), document.text("h1")),
+            company_ticker_from_text(document.text("h2")),
+            company_description_from_text(document.text("p")),
+        )
+    except Exception:
+        return None
+
+
+def extract_company_name(processed_html: BeautifulSoup):
+    """Return the company name from where it is expected in HTML, otherwise raise exception."""
+    return company_name_from_text(
+        processed_html.head.title.text, processed_html.body.h1.text
+    )
+
+
+def company_name_from_text(title_line: str, company_name_from_h1: str) -> str:
+    """Return the company name given the TITLE and H1 text, otherwise raise exception."""
+    if not company_name_from_h1:
+        raise Exception(ERROR.HTML_BLANK_COMPANY_NAME.value)
+
+    index_start_of_name = title_line.find(PREFIX.TITLE_NAME.value)
+    if index_start_of_name == -1:
+        raise Exception(ERROR.HTML_MISSING_TITLE_PREFIX.value)
+
+    name_from_title = title_line[
+        index_start_of_name + len(PREFIX.TITLE_NAME.value) :
+    ].strip()
+    if name_from_title != company_name_from_h1:
+        raise Exception(ERROR.HTML_MISMATCH_NAME.value)
+
+    return company_name_from_h1
+
+
+def extract_company_ticker(processed_html: BeautifulSoup):
+    """Return the company ticker from where it is expected in HTML, otherwise raise exception."""
+    return company_ticker_from_text(processed_html.body.h2.text)
+
+
+def company_ticker_from_text(company_ticker_line: str) -> str:
+    """Return the company ticker given the H2 text, otherwise raise exception."""
+    index_ticker = company_ticker_line.find(PREFIX.TICKER.value)
+
+    if index_ticker == -1:
+        raise Exception(ERROR.HTML_MISSING_TICKER_PREFIX.value)
+
+    company_ticker = (
+        company_ticker_line[index_ticker + len(PREFIX.TICKER.value) :].strip().upper()
+    )
+
+    if not company_ticker:
+        raise Exception(ERROR.HTML_BLANK_COMPANY_TICKER.value)
+
+    return company_ticker
+
+
+def extract_company_description(processed_html: BeautifulSoup):
+    """Return the company description from where it is expected in HTML, otherwise raise exception."""
+    return company_description_from_text(processed_html.body.p.text)
+
+
+def company_description_from_text(company_description_line: str) -> str:
+    """Return the company description given the P text, otherwise raise exception."""
+    company_description = " ".join(
+        [line.strip() for line in company_description_line.split("\n")]
+    ).strip()
+
+    if not company_description:
+        raise Exception(ERROR.HTML_BLANK_COMPANY_DESCRIPTION.value)
+
+    return company_description
@@ -0,0 +1,203 @@
+import sys
+from array import array
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+
+class CompanyStore(Mapping):
+    """The parsed companies of a run, held in columns rather than as one dict and one tensor per
+    company.
+
+    The encodings are rows of one preallocated contiguous array, float32 or float16, which the
+    encode stage writes into a batch at a time. The tickers, names and html files are interned
+    strings in lists indexed by the same row, and the descriptions are UTF-8 bytes in one buffer,
+    located by arrays of offsets and lengths, so they cost no object per company. Looking up a
+    ticker builds the same dict as before, with its encoding as a numpy row, so code written for
+    a dict of companies works unchanged, while scoring reads whole chunks of rows straight from
+    the array.
+
+    As with a dict, storing a ticker again replaces its row in place and keeps its position, so
+    the rows are in the order the tickers were first seen. The bytes of a replaced description
+    stay in the buffer.
+    """
+
+    __slots__ = (
+        "capacity",
+        "embedding_dtype",
+        "encodings",
+        "rows",
+        "company_tickers",
+        "company_names",
+        "company_html_files",
+        "description_bytes",
+        "description_offsets",
+        "description_lengths",
+    )
+
+    def __init__(self, capacity: int, embedding_dtype: str = "float32"):
+        self.capacity = max(capacity, 1)
+        self.embedding_dtype = np.dtype(embedding_dtype)
+        self.encodings: Optional[np.ndarray] = None
+        self.rows: Dict[str, int] = dict()
+        self.company_tickers: List[str] = []
+        self.company_names: List[str] = []
+        self.company_html_files: List[str] = []
+        self.description_bytes = bytearray()
+        self.description_offsets = array("Q")
+        self.description_lengths = array("Q")
+
+    def __len__(self) -> int:
+        return len(self.company_tickers)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.company_tickers)
+
+    def __contains__(self, company_ticker: object) -> bool:
+        return company_ticker in self.rows
+
+    def __getitem__(self, company_ticker: str) -> Dict[str, any]:
+        row = self.rows[company_ticker]
+        return {
+            "company_name": self.company_names[row],
+            "company_ticker": self.company_tickers[row],
+            "company_description": self.company_description(row),
+            "company_description_model_encoding": self.encodings[row],
+            "company_html_file": self.company_html_files[row],
+        }
+
+    def company_description(self, row: int) -> str:
+        offset = self.description_offsets[row]
+        return self.description_bytes[
+            offset : offset + self.description_lengths[row]
+        ].decode("utf-8")
+
+    def add_record(
+        self,
+        company_name: str,
+        company_ticker: str,
+        company_description: str,
+        company_html_file: str,
+    ) -> int:
+        """Store the details of a company, and return its row. Its encoding is stored separately,
+        with set_encodings.
+        """
+        description = company_description.encode("utf-8")
+        row = self.rows.get(company_ticker)
+        if row is None:
+            row = len(self.company_tickers)
+            company_ticker = sys.intern(company_ticker)
+            self.rows[company_ticker] = row
+            self.company_tickers.append(company_ticker)
+            self.company_names.append(sys.intern(company_name))
+            self.company_html_files.append(sys.intern(company_html_file))
+            self.description_offsets.append(len(self.description_bytes))
+            self.description_lengths.append(len(description))
+        else:
+            self.company_names[row] = sys.intern(company_name)
+            self.company_html_files[row] = sys.intern(company_html_file)
+            self.description_offsets[row] = len(self.description_bytes)
+            self.description_lengths[row] = len(description)
+        self.description_bytes += description
+        return row
+
+    def set_encodings(self, rows: Sequence[int], encodings: np.ndarray) -> None:
+        """Write the encodings of the given rows, one per row, into the encoding array"""
+        if len(rows) == 0:
+            return
+        self.reserve(max(rows) + 1, encodings.shape[1])
+        self.encodings[list(rows)] = encodings
+
+    def add(self, company: Dict[str, any], encoding: np.ndarray) -> None:
+        """Store a company, given as a dict with at least the name, ticker, description and html
+        file, with its encoding
+        """
+        row = self.add_record(
+            company["company_name"],
+            company["company_ticker"],
+            company["company_description"],
+            company["company_html_file"],
+        )
+        self.set_encodings([row], np.asarray(encoding)[np.newaxis])
+
+    def add_window(self, companies: Dict[str, any], encodings: np.ndarray) -> None:
+        """Store a window of companies, with their encodings as one row per company"""
+        for company, encoding in zip(companies.values(), encodings):
+            self.add(company, encoding)
+
+    def reserve(self, row_count: int, dimension: int) -> None:
+        """Allocate the encoding array for the capacity on first use, and double it if it is full"""
+        if self.encodings is None:
+            self.capacity = max(self.capacity, row_count)
+            self.encodings = np.empty(
+                (self.capacity, dimension), dtype=self.embedding_dtype
+            )
+        elif row_count > len(self.encodings):
+            self.capacity = max(row_count, 2 * len(self.encodings))
+            encodings = np.empty((self.capacity, dimension), dtype=self.embedding_dtype)
+            encodings[: len(self.encodings)] = self.encodings
+            self.encodings = encodings
+
+    def row_encodings(self, start: int, stop: int) -> np.ndarray:
+        """Return the encodings of a range of rows, without copying them"""
+        return self.encodings[start:stop]
+
+    def string_nbytes(self) -> int:
+        """Return the bytes of the distinct string objects, counting each interned string once"""
+        strings = {
+            id(value): value
+            for values in [
+                self.company_tickers,
+                self.company_names,
+                self.company_html_files,
+            ]
+            for value in values
+        }
+        return sum(sys.getsizeof(value) for value in strings.values())
+
+    def nbytes(self) -> int:
+        """Return the bytes held by the store: the encoding array, the lists, the row index, the
+        strings and the description buffer
+        """
+        return (
+            (0 if self.encodings is None else self.encodings.nbytes)
+            + sys.getsizeof(self.rows)
+            + sum(
+                sys.getsizeof(values)
+                for values in [
+                    self.company_tickers,
+                    self.company_names,
+                    self.company_html_files,
+                    self.description_bytes,
+                    self.description_offsets,
+                    self.description_lengths,
+                ]
+            )
+            + self.string_nbytes()
+        )
+
+    def dict_nbytes(self, encoding_nbytes: int) -> int:
+        """Estimate the bytes the same companies would take as a dict of one dict per company, each
+        with its own string objects and an encoding object of encoding_nbytes, for comparison. This
+        is a lower bound, as it leaves out the allocator overhead of every object.
+        """
+        if not self.company_tickers:
+            return 0
+        company = {**self[self.company_tickers[0]]}
+        return (
+            sys.getsizeof(dict.fromkeys(self.company_tickers))
+            + len(self) * (sys.getsizeof(company) + encoding_nbytes)
+            + sum(
+                sys.getsizeof(value)
+                for values in [
+                    self.company_tickers,
+                    self.company_names,
+                    self.company_html_files,
+                ]
+                for value in values
+            )
+            + sum(
+                sys.getsizeof(self.company_description(row)) for row in range(len(self))
+            )
+        )
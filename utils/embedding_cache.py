@@ -0,0 +1,237 @@
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+INDEX_DTYPE = np.dtype([("key", "V32"), ("row", "<i8"), ("last_used", "<i8")])
+COMPACTION_CHUNK_ROWS = 65536
+# The embeddings file is compacted once it holds this many times more rows than it should
+COMPACTION_RATIO = 2
+
+
+class EmbeddingCache:
+    """Persistent, content-addressed cache of description encodings.
+
+    Encodings are appended to a flat float32 file. An index maps the sha256 of the model name and
+    the normalized description to a row of that file, along with the run that last used it. A
+    description already in the cache is not appended again. When the cache holds more than
+    max_entries on save, the least recently used entries are evicted and the file is compacted.
+    The file is also compacted on save when it holds many more rows than the index points to,
+    e.g. after a run that crashed before saving its index, and during a run once it holds many
+    more rows than max_entries, so it stays bounded.
+
+    Compacting writes the kept rows and their index as a new generation of files, which the
+    metadata file then names, so a run that stops at any point leaves an index that matches its
+    embeddings file. The files of older generations are removed once they are no longer named.
+    """
+
+    def __init__(self, directory: str, model_name: str, max_entries: int):
+        self.directory = directory
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.metadata_path = os.path.join(directory, "metadata.json")
+
+        self.dimension: Optional[int] = None
+        self.run = 1
+        self.generation = 0
+        self.rows: Dict[bytes, List[int]] = dict()
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.load()
+
+    @property
+    def embeddings_path(self) -> str:
+        return self.generation_path("embeddings", self.generation, "f32")
+
+    @property
+    def index_path(self) -> str:
+        return self.generation_path("index", self.generation, "npy")
+
+    def generation_path(self, name: str, generation: int, extension: str) -> str:
+        return os.path.join(self.directory, f"{name}-{generation}.{extension}")
+
+    def load(self) -> None:
+        """Read the index of a previous run, if there is one"""
+        if not os.path.exists(self.metadata_path):
+            return
+
+        with open(self.metadata_path, "r", encoding="utf-8") as file:
+            metadata = json.load(file)
+        if "generation" not in metadata or not os.path.exists(
+            self.generation_path("index", metadata["generation"], "npy")
+        ):
+            self.clear()
+            return
+        self.dimension = metadata["dimension"]
+        self.run = metadata["run"] + 1
+        self.generation = metadata["generation"]
+        self.remove_generations()
+
+        index = np.load(self.index_path)
+        self.rows = {
+            bytes(key): [int(row), int(last_used)]
+            for key, row, last_used in index.tolist()
+        }
+
+    def key(self, description: str) -> bytes:
+        normalized_description = " ".join(description.split())
+        return hashlib.sha256(
+            f"{self.model_name}\n{normalized_description}".encode("utf-8")
+        ).digest()
+
+    def get_many(self, descriptions: List[str]) -> List[Optional[np.ndarray]]:
+        """Return the cached encoding of every description, or None where it is not cached"""
+        entries = [self.rows.get(self.key(description)) for description in descriptions]
+        if not any(entries):
+            self.misses += len(entries)
+            return [None] * len(entries)
+
+        embeddings = self.open_embeddings()
+        results = []
+        for entry in entries:
+            if entry is None:
+                self.misses += 1
+                results.append(None)
+                continue
+            entry[1] = self.run
+            self.hits += 1
+            results.append(np.array(embeddings[entry[0]]))
+        return results
+
+    def put_many(self, descriptions: List[str], encodings: np.ndarray) -> None:
+        """Append the encodings of the given descriptions to the cache, skipping descriptions that
+        are already cached or repeated
+        """
+        if self.dimension is not None and encodings.shape[1] != self.dimension:
+            self.clear()
+        if self.dimension is None:
+            self.dimension = int(encodings.shape[1])
+            os.makedirs(self.directory, exist_ok=True)
+
+        new_keys: Dict[bytes, int] = dict()
+        for position, description in enumerate(descriptions):
+            key = self.key(description)
+            if key in self.rows:
+                self.rows[key][1] = self.run
+            elif key not in new_keys:
+                new_keys[key] = position
+        if not new_keys:
+            return
+
+        next_row = self.count_stored_rows()
+        with open(self.embeddings_path, "ab") as file:
+            file.write(
+                np.ascontiguousarray(
+                    np.asarray(encodings)[list(new_keys.values())], dtype=np.float32
+                ).tobytes()
+            )
+
+        for offset, key in enumerate(new_keys.keys()):
+            self.rows[key] = [next_row + offset, self.run]
+        if next_row + len(new_keys) > COMPACTION_RATIO * self.max_entries:
+            self.evict()
+
+    def save(self) -> None:
+        """Evict the least recently used entries over the size cap, or compact the embeddings file
+        if most of its rows are not indexed, then write the index
+        """
+        if self.dimension is None:
+            return
+        if len(
+            self.rows
+        ) > self.max_entries or self.count_stored_rows() > COMPACTION_RATIO * len(
+            self.rows
+        ):
+            self.evict()
+        else:
+            self.write_index()
+
+    def write_index(self) -> None:
+        """Write the index of the current generation, then the metadata naming it"""
+        index = np.array(
+            [(key, row, last_used) for key, (row, last_used) in self.rows.items()],
+            dtype=INDEX_DTYPE,
+        )
+        with open(f"{self.index_path}.tmp", "wb") as file:
+            np.save(file, index)
+        os.replace(f"{self.index_path}.tmp", self.index_path)
+
+        with open(f"{self.metadata_path}.tmp", "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "dimension": self.dimension,
+                    "run": self.run,
+                    "generation": self.generation,
+                },
+                file,
+            )
+        os.replace(f"{self.metadata_path}.tmp", self.metadata_path)
+
+    def evict(self) -> None:
+        """Keep only the max_entries most recently used entries, compact their rows into the
+        embeddings file of a new generation and write its index
+        """
+        # Among entries last used by the same run, the most recently appended are kept
+        kept_entries = sorted(
+            self.rows.items(), key=lambda item: (item[1][1], item[1][0]), reverse=True
+        )[: self.max_entries]
+        self.evicted += len(self.rows) - len(kept_entries)
+
+        embeddings = self.open_embeddings()
+        kept_rows = np.array([row for _, (row, _) in kept_entries], dtype=np.int64)
+        with open(
+            self.generation_path("embeddings", self.generation + 1, "f32"), "wb"
+        ) as file:
+            for chunk_start in range(0, len(kept_rows), COMPACTION_CHUNK_ROWS):
+                chunk_rows = kept_rows[
+                    chunk_start : chunk_start + COMPACTION_CHUNK_ROWS
+                ]
+                file.write(np.ascontiguousarray(embeddings[chunk_rows]).tobytes())
+        del embeddings
+
+        self.generation += 1
+        self.rows = {
+            key: [new_row, last_used]
+            for new_row, (key, (_, last_used)) in enumerate(kept_entries)
+        }
+        self.write_index()
+        self.remove_generations()
+
+    def remove_generations(self, keep_current: bool = True) -> None:
+        """Remove the embeddings and index files of the generations before the current one, and of
+        a compaction that stopped before its metadata was written
+        """
+        current_files = (
+            {os.path.basename(self.embeddings_path), os.path.basename(self.index_path)}
+            if keep_current
+            else set()
+        )
+        for file_name in os.listdir(self.directory):
+            if (
+                file_name.startswith(("embeddings", "index"))
+                and file_name not in current_files
+            ):
+                os.remove(os.path.join(self.directory, file_name))
+
+    def clear(self) -> None:
+        """Drop every entry, e.g. when the encodings no longer have the stored dimension"""
+        if os.path.isdir(self.directory):
+            self.remove_generations(keep_current=False)
+        if os.path.exists(self.metadata_path):
+            os.remove(self.metadata_path)
+        self.rows = dict()
+        self.dimension = None
+        self.generation = 0
+
+    def count_stored_rows(self) -> int:
+        if not os.path.exists(self.embeddings_path):
+            return 0
+        return os.path.getsize(self.embeddings_path) // (self.dimension * 4)
+
+    def open_embeddings(self) -> np.ndarray:
+        return np.memmap(self.embeddings_path, dtype=np.float32, mode="r").reshape(
+            -1, self.dimension
+        )
@@ -0,0 +1,206 @@
+import atexit
+import logging
+import multiprocessing
+import os
+import queue
+from multiprocessing import shared_memory
+from typing import Callable, List, Optional
+
+import numpy as np
+
+# Seconds to wait on a worker before checking that every worker is still alive
+WORKER_POLL_SECONDS = 1.0
+
+
+def default_thread_count(worker_count: int) -> int:
+    """Return the torch threads of each worker when the cores are shared evenly between them"""
+    return max(1, (os.cpu_count() or 1) // worker_count)
+
+
+def run_encoder_worker(
+    create_model: Callable, thread_count: int, tasks, results
+) -> None:
+    """Worker process entry point. Load a model replica, report the dimension of its encodings, then
+    encode batches of sentences into the rows of the shared memory block named by each task until
+    the None sentinel arrives. Only the rows that were written, or the error, are sent back.
+    """
+    import torch
+
+    torch.set_num_threads(thread_count)
+    try:
+        model = create_model()
+        dimension = int(np.asarray(model.encode(["dimension probe"])).shape[1])
+    except Exception as exception:
+        results.put(("error", f"{type(exception).__name__}: {exception}"))
+        return
+    results.put(("ready", dimension))
+
+    block = None
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        block_name, row_capacity, start_row, batch_size, sentences = task
+        try:
+            if block is None or block.name != block_name:
+                if block is not None:
+                    block.close()
+                # Spawned workers share the resource tracker of the parent, which unlinks the block
+                block = shared_memory.SharedMemory(name=block_name)
+            encodings = np.ndarray(
+                (row_capacity, dimension), dtype=np.float32, buffer=block.buf
+            )
+            batch_encodings = model.encode(sentences, batch_size=batch_size)
+            encodings[start_row : start_row + len(sentences)] = np.asarray(
+                batch_encodings, dtype=np.float32
+            )
+            del encodings
+            results.put(("done", start_row, len(sentences)))
+        except Exception as exception:
+            results.put(("error", f"{type(exception).__name__}: {exception}"))
+    if block is not None:
+        block.close()
+
+
+class EncoderPool:
+    """Stand-in for the model that encodes with model replicas in worker processes.
+
+    encode() splits the sentences into batches of batch_size, in order, and spreads the batches
+    over the workers, each running torch with thread_count threads. The workers write their
+    encodings straight into the rows of a shared memory block, and only send back which rows are
+    done, so encodings are never pickled. Batches hold the same sentences as when encoding one
+    batch at a time in-process.
+
+    The workers are spawned the first time something is encoded, so runs that find every
+    description in the embedding cache never start them. create_model is called in every worker
+    and must be picklable, e.g. a partial of LazySentenceTransformer or a top-level class.
+    """
+
+    def __init__(
+        self,
+        create_model: Callable,
+        worker_count: int,
+        thread_count: Optional[int] = None,
+        logger: Optional[logging.Logger] = None,
+    ):
+        self.create_model = create_model
+        self.worker_count = worker_count
+        self.thread_count = thread_count or default_thread_count(worker_count)
+        self.logger = logger
+        self.workers: List[multiprocessing.Process] = []
+        self.tasks = None
+        self.results = None
+        self.dimension: Optional[int] = None
+        self.block: Optional[shared_memory.SharedMemory] = None
+        self.row_capacity = 0
+
+    @property
+    def is_started(self) -> bool:
+        return bool(self.workers)
+
+    def start(self) -> None:
+        if self.is_started:
+            return
+        # Forking a process that already runs torch threads can deadlock, so workers are spawned
+        context = multiprocessing.get_context("spawn")
+        self.tasks = context.Queue()
+        self.results = context.Queue()
+        self.workers = [
+            context.Process(
+                target=run_encoder_worker,
+                args=(self.create_model, self.thread_count, self.tasks, self.results),
+                daemon=True,
+            )
+            for _ in range(self.worker_count)
+        ]
+        for worker in self.workers:
+            worker.start()
+        atexit.register(self.close)
+
+        for _ in self.workers:
+            message = self.next_result()
+            self.dimension = message[1]
+        if self.logger is not None:
+            self.logger.info(
+                f"Done starting {self.worker_count} encoder workers with "
+                f"{self.thread_count} threads each."
+            )
+
+    def next_result(self) -> tuple:
+        """Return the next message of a worker. Raise if a worker failed or died."""
+        while True:
+            try:
+                message = self.results.get(timeout=WORKER_POLL_SECONDS)
+            except queue.Empty:
+                if not all(worker.is_alive() for worker in self.workers):
+                    self.close()
+                    raise RuntimeError("an encoder worker exited unexpectedly")
+                continue
+            if message[0] == "error":
+                self.close()
+                raise RuntimeError(f"an encoder worker failed: {message[1]}")
+            return message
+
+    def reserve(self, row_count: int) -> None:
+        """Replace the shared memory block with a larger one if it cannot hold row_count rows"""
+        if row_count <= self.row_capacity:
+            return
+        if self.block is not None:
+            self.block.close()
+            self.block.unlink()
+        self.row_capacity = max(row_count, 2 * self.row_capacity)
+        self.block = shared_memory.SharedMemory(
+            create=True, size=self.row_capacity * self.dimension * 4
+        )
+
+    def encode(
+        self,
+        sentences: List[str],
+        batch_size: int = 32,
+        convert_to_tensor: bool = False,
+        **kwargs,
+    ):
+        """Encode the sentences across the workers, and return their encodings in order"""
+        self.start()
+        self.reserve(max(len(sentences), 1))
+        batch_count = 0
+        for start_row in range(0, len(sentences), batch_size):
+            self.tasks.put(
+                (
+                    self.block.name,
+                    self.row_capacity,
+                    start_row,
+                    batch_size,
+                    sentences[start_row : start_row + batch_size],
+                )
+            )
+            batch_count += 1
+        for _ in range(batch_count):
+            self.next_result()
+
+        encodings = np.ndarray(
+            (self.row_capacity, self.dimension), dtype=np.float32, buffer=self.block.buf
+        )[: len(sentences)].copy()
+        if convert_to_tensor:
+            import torch
+
+            return torch.from_numpy(encodings)
+        return encodings
+
+    def close(self) -> None:
+        """Stop the workers and release the shared memory block"""
+        if self.is_started:
+            for worker in self.workers:
+                if worker.is_alive():
+                    self.tasks.put(None)
+            for worker in self.workers:
+                worker.join(timeout=WORKER_POLL_SECONDS * 5)
+                if worker.is_alive():
+                    worker.terminate()
+            self.workers = []
+            atexit.unregister(self.close)
+        if self.block is not None:
+            self.block.close()
+            self.block.unlink()
+            self.block = None
+            self.row_capacity = 0
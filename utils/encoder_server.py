@@ -0,0 +1,379 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from constants.data_constants import ENCODER_SERVER
+from utils.micro_batcher import MicroBatcher
+
+# Every message is the byte lengths of its JSON header and of its payload, then both
+MESSAGE_PREFIX = struct.Struct("!II")
+
+
+def pack_message(header: Dict[str, Any], payload: bytes = b"") -> bytes:
+    header_bytes = json.dumps(header).encode("utf-8")
+    return MESSAGE_PREFIX.pack(len(header_bytes), len(payload)) + header_bytes + payload
+
+
+def receive_exactly(connection: socket.socket, size: int) -> bytearray:
+    data = bytearray(size)
+    view = memoryview(data)
+    received = 0
+    while received < size:
+        count = connection.recv_into(view[received:])
+        if count == 0:
+            raise ConnectionError("the encoder server closed the connection")
+        received += count
+    return data
+
+
+def receive_message(connection: socket.socket) -> Tuple[Dict[str, Any], bytearray]:
+    header_size, payload_size = MESSAGE_PREFIX.unpack(
+        receive_exactly(connection, MESSAGE_PREFIX.size)
+    )
+    header = json.loads(receive_exactly(connection, header_size).decode("utf-8"))
+    return header, receive_exactly(connection, payload_size)
+
+
+async def read_message(reader: asyncio.StreamReader) -> Tuple[Dict[str, Any], bytes]:
+    header_size, payload_size = MESSAGE_PREFIX.unpack(
+        await reader.readexactly(MESSAGE_PREFIX.size)
+    )
+    header = json.loads((await reader.readexactly(header_size)).decode("utf-8"))
+    return header, await reader.readexactly(payload_size)
+
+
+def connect_to_server(
+    socket_path: str,
+    timeout_seconds: float = ENCODER_SERVER.CONNECT_TIMEOUT_SECONDS.value,
+) -> socket.socket:
+    """Connect to the encoder server listening on the Unix domain socket. Raise OSError when none
+    does.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        raise OSError("Unix domain sockets are not supported on this platform")
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.settimeout(timeout_seconds)
+        connection.connect(socket_path)
+        connection.settimeout(None)
+    except OSError:
+        connection.close()
+        raise
+    return connection
+
+
+def send_request(
+    connection: socket.socket, header: Dict[str, Any]
+) -> Tuple[Dict[str, Any], bytearray]:
+    """Send a request to the encoder server and return its response. Raise RuntimeError when the
+    server could not handle it.
+    """
+    connection.sendall(pack_message(header))
+    response_header, payload = receive_message(connection)
+    if "error" in response_header:
+        raise RuntimeError(f"the encoder server failed: {response_header['error']}")
+    return response_header, payload
+
+
+def remove_stale_socket(socket_path: str) -> None:
+    """Remove the socket file left behind by a server that did not shut down. Raise RuntimeError
+    when a server is still listening on it.
+    """
+    if not os.path.exists(socket_path):
+        return
+    try:
+        connect_to_server(socket_path).close()
+    except OSError:
+        os.unlink(socket_path)
+        return
+    raise RuntimeError(f"an encoder server is already running at {socket_path}")
+
+
+class EncoderServer:
+    """Local server that loads the model once and encodes sentences for every process on the
+    machine, over a Unix domain socket.
+
+    Encode requests of concurrent clients, e.g. the data pipeline and the web API, are coalesced
+    into batches of up to max_batch_size sentences, and every batch is encoded with one call to
+    the model. A request that fills a batch by itself is encoded alone, with the batch size it
+    asked for, so its encodings are the same as when encoding in-process. Batching and queue
+    metrics are logged every metrics_log_seconds and answered to "metrics" requests.
+    """
+
+    def __init__(
+        self,
+        socket_path: str,
+        model,
+        model_name: str,
+        max_batch_size: int = ENCODER_SERVER.MAX_BATCH_SIZE.value,
+        max_wait_seconds: float = ENCODER_SERVER.MAX_WAIT_SECONDS.value,
+        metrics_log_seconds: float = ENCODER_SERVER.METRICS_LOG_SECONDS.value,
+        logger: Optional[logging.Logger] = None,
+    ):
+        self.socket_path = socket_path
+        self.model = model
+        self.model_name = model_name
+        self.metrics_log_seconds = metrics_log_seconds
+        self.logger = logger
+        self.batcher = MicroBatcher(
+            self.encode_batch,
+            max_batch_size,
+            max_wait_seconds,
+            item_size=lambda request: len(request[0]),
+        )
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stop_event: Optional[asyncio.Event] = None
+        # Set once the server listens, for callers that run it on another thread
+        self.ready = threading.Event()
+        self.start_time = time.perf_counter()
+        self.open_connections = 0
+        self.request_count = 0
+        self.error_count = 0
+
+    def encode_batch(self, requests: List[Tuple[List[str], int]]) -> List[np.ndarray]:
+        """Encode the sentences of a batch of (sentences, batch size) requests with one call to the
+        model, and return the encodings of every request
+        """
+        if len(requests) == 1:
+            sentences, batch_size = requests[0]
+        else:
+            sentences = [sentence for request in requests for sentence in request[0]]
+            batch_size = len(sentences)
+        if not sentences:
+            return [np.zeros((0, 0), dtype=np.float32) for _ in requests]
+        encodings = np.asarray(
+            self.model.encode(sentences, batch_size=batch_size), dtype=np.float32
+        )
+        request_encodings = []
+        start_row = 0
+        for request_sentences, _ in requests:
+            request_encodings.append(
+                encodings[start_row : start_row + len(request_sentences)]
+            )
+            start_row += len(request_sentences)
+        return request_encodings
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "model_name": self.model_name,
+            "uptime_seconds": time.perf_counter() - self.start_time,
+            "open_connections": self.open_connections,
+            "request_count": self.request_count,
+            "error_count": self.error_count,
+            **self.batcher.metrics(),
+        }
+
+    def log_metrics(self) -> None:
+        metrics = self.metrics()
+        if self.logger is None or not metrics["batch_count"]:
+            return
+        self.logger.info(
+            f"Encoder server: {metrics['request_count']} requests, {metrics['size_count']} "
+            f"sentences in {metrics['batch_count']} batches ({metrics['mean_batch_items']:.1f} "
+            f"requests, {metrics['mean_batch_size']:.1f} sentences per batch), mean queue wait "
+            f"{metrics['mean_wait_seconds'] * 1000:.1f}ms, queue depth "
+            f"{metrics['queue_depth']} (max {metrics['max_queue_depth']}), "
+            f"{metrics['open_connections']} open connections."
+        )
+
+    async def log_metrics_periodically(self) -> None:
+        logged_batch_count = 0
+        while True:
+            await asyncio.sleep(self.metrics_log_seconds)
+            if self.batcher.batch_count != logged_batch_count:
+                self.log_metrics()
+                logged_batch_count = self.batcher.batch_count
+
+    async def handle_request(
+        self, header: Dict[str, Any]
+    ) -> Tuple[Dict[str, Any], bytes]:
+        operation = header.get("op")
+        if operation == "encode":
+            try:
+                encodings = await self.batcher.submit(
+                    (header["sentences"], header["batch_size"])
+                )
+            except Exception as exception:
+                self.error_count += 1
+                if self.logger is not None:
+                    self.logger.error(f"Error encoding a request: {exception}")
+                return {"error": f"{type(exception).__name__}: {exception}"}, b""
+            self.request_count += 1
+            return {"shape": list(encodings.shape)}, encodings.tobytes()
+        if operation == "info":
+            return {"model_name": self.model_name}, b""
+        if operation == "metrics":
+            return {"metrics": self.metrics()}, b""
+        return {"error": f"unknown operation: {operation}"}, b""
+
+    async def handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self.open_connections += 1
+        try:
+            while True:
+                try:
+                    header, _ = await read_message(reader)
+                except asyncio.IncompleteReadError:
+                    break
+                response_header, payload = await self.handle_request(header)
+                writer.write(pack_message(response_header, payload))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.open_connections -= 1
+            writer.close()
+
+    async def serve(self) -> None:
+        """Serve requests until stop() is called or the task is cancelled, then remove the socket"""
+        os.makedirs(os.path.dirname(self.socket_path) or ".", exist_ok=True)
+        remove_stale_socket(self.socket_path)
+        self.loop = asyncio.get_running_loop()
+        self.stop_event = asyncio.Event()
+        server = await asyncio.start_unix_server(
+            self.handle_connection, path=self.socket_path
+        )
+        metrics_task = self.loop.create_task(self.log_metrics_periodically())
+        if self.logger is not None:
+            self.logger.info(
+                f"Done starting encoder server of {self.model_name} at: {self.socket_path}"
+            )
+        self.ready.set()
+        try:
+            await self.stop_event.wait()
+        finally:
+            metrics_task.cancel()
+            server.close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            self.loop = None
+            self.log_metrics()
+
+    def stop(self) -> None:
+        """Stop serving. Safe to call from any thread, and once stopped."""
+        loop = self.loop
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(self.stop_event.set)
+        except RuntimeError:
+            # The loop closed since
+            pass
+
+
+class EncoderClient:
+    """Stand-in for the model that encodes with the local encoder server.
+
+    The server is connected to on first use, and only used if it serves model_name, so encodings
+    match the ones of the fallback model. When no such server is running, or the connection is
+    lost, sentences are encoded in-process with the fallback model from then on. Encodings are
+    returned the same way as by the model, but options other than batch_size and
+    convert_to_tensor only apply in-process.
+    """
+
+    def __init__(
+        self,
+        socket_path: str,
+        model_name: str,
+        fallback,
+        logger: Optional[logging.Logger] = None,
+    ):
+        self.socket_path = socket_path
+        self.model_name = model_name
+        self.fallback = fallback
+        self.logger = logger
+        self.connection: Optional[socket.socket] = None
+        self.use_fallback = False
+        # The web API encodes on its micro-batch thread, so requests may come from any thread
+        self.lock = threading.Lock()
+
+    @property
+    def is_connected(self) -> bool:
+        return self.connection is not None
+
+    def connect(self) -> bool:
+        """Return whether the server is used, connecting to it on first use"""
+        if self.connection is not None or self.use_fallback:
+            return not self.use_fallback
+        try:
+            connection = connect_to_server(self.socket_path)
+        except OSError:
+            self.fall_back(f"No encoder server at {self.socket_path}.", logging.INFO)
+            return False
+        try:
+            server_model_name = send_request(connection, {"op": "info"})[0][
+                "model_name"
+            ]
+        except (OSError, RuntimeError) as exception:
+            connection.close()
+            self.fall_back(f"Error querying the encoder server: {exception}.")
+            return False
+        if server_model_name != self.model_name:
+            connection.close()
+            self.fall_back(
+                f"The encoder server at {self.socket_path} serves {server_model_name}, "
+                f"not {self.model_name}."
+            )
+            return False
+        self.connection = connection
+        if self.logger is not None:
+            self.logger.info(
+                f"Done connecting to encoder server at: {self.socket_path}"
+            )
+        return True
+
+    def fall_back(self, reason: str, level: int = logging.WARNING) -> None:
+        self.close()
+        self.use_fallback = True
+        if self.logger is not None:
+            self.logger.log(level, f"{reason} Encoding in-process.")
+
+    def encode(
+        self,
+        sentences: List[str],
+        batch_size: int = 32,
+        convert_to_tensor: bool = False,
+        **kwargs,
+    ):
+        with self.lock:
+            if self.connect():
+                try:
+                    response_header, payload = send_request(
+                        self.connection,
+                        {
+                            "op": "encode",
+                            "sentences": list(sentences),
+                            "batch_size": batch_size,
+                        },
+                    )
+                except OSError as exception:
+                    self.fall_back(f"Lost the encoder server: {exception}.")
+                else:
+                    encodings = np.frombuffer(payload, dtype=np.float32).reshape(
+                        response_header["shape"]
+                    )
+                    if convert_to_tensor:
+                        import torch
+
+                        return torch.from_numpy(encodings)
+                    return encodings
+        return self.fallback.encode(
+            sentences,
+            batch_size=batch_size,
+            convert_to_tensor=convert_to_tensor,
+            **kwargs,
+        )
+
+    def close(self) -> None:
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
@@ -0,0 +1,97 @@
+import re
+from html.entities import html5
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Tuple
+
+REFERENCE_PATTERN = re.compile(r"&(#[xX]?[0-9a-zA-Z]*;?|[a-zA-Z0-9]+;?)")
+NUMERIC_REFERENCE_PATTERN = re.compile(r"#([0-9]+|[xX][0-9a-fA-F]+);")
+
+
+class SinglePassHtmlParser(HTMLParser):
+    """Streaming tokenizer that records, in one pass over a document, the name of every tag in
+    document order, the enclosing tags of each tag, and the text inside each tag.
+
+    Note: documents with comments, processing instructions, mismatched end tags or unclosed tags
+    are flagged as not simple, since their text can differ from what BeautifulSoup returns.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.tag_names: List[str] = []
+        self.enclosing_tags: Dict[str, Tuple[str, ...]] = dict()
+        self.texts: Dict[str, List[str]] = dict()
+        self.open_tags: List[str] = []
+        self.is_simple = True
+
+    def handle_starttag(self, tag, attrs):
+        self.tag_names.append(tag)
+        self.enclosing_tags.setdefault(tag, tuple(self.open_tags))
+        self.texts.setdefault(tag, [])
+        self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.tag_names.append(tag)
+
+    def handle_endtag(self, tag):
+        if not self.open_tags or self.open_tags[-1] != tag:
+            self.is_simple = False
+            return
+        self.open_tags.pop()
+
+    def handle_data(self, data):
+        for tag in self.open_tags:
+            self.texts[tag].append(data)
+
+    def handle_comment(self, data):
+        self.is_simple = False
+
+    def handle_pi(self, data):
+        self.is_simple = False
+
+    def unknown_decl(self, data):
+        self.is_simple = False
+
+    def text(self, tag: str) -> str:
+        return "".join(self.texts[tag])
+
+
+def parse_simple_html(html_content: str) -> Optional[SinglePassHtmlParser]:
+    """Tokenize a document in a single pass. Return None when the document is not simple enough for
+    the recorded tags and texts to be trusted.
+    """
+    if "&" in html_content and has_ambiguous_references(html_content):
+        return None
+
+    parser = SinglePassHtmlParser()
+    parser.feed(html_content)
+    parser.close()
+    if not parser.is_simple or parser.open_tags:
+        return None
+    return parser
+
+
+def has_ambiguous_references(html_content: str) -> bool:
+    """Return True if the document has a character reference that BeautifulSoup may decode
+    differently from the standard library, such as an unknown name, a name without its semicolon,
+    or an invalid code point.
+    """
+    for match in REFERENCE_PATTERN.finditer(html_content):
+        reference = match.group(1)
+        if reference.startswith("#"):
+            numeric_reference = NUMERIC_REFERENCE_PATTERN.fullmatch(reference)
+            if numeric_reference is None:
+                return True
+            digits = numeric_reference.group(1)
+            code_point = int(digits[1:], 16) if digits[0] in "xX" else int(digits, 10)
+            if not (0 < code_point <= 0x10FFFF) or 0xD800 <= code_point <= 0xDFFF:
+                return True
+        elif reference.endswith(";"):
+            if reference not in html5:
+                return True
+        elif any(
+            reference[:length] in html5 or f"{reference[:length]};" in html5
+            for length in range(1, len(reference) + 1)
+        ):
+            # BeautifulSoup also decodes names that are only known with a semicolon, e.g. &in
+            return True
+    return False
@@ -0,0 +1,137 @@
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from utils.input_sources import hash_file, hash_input_file, input_file_signature
+
+
+class InputManifest:
+    """Record of the input files used by the last run of the data pipeline.
+
+    Every company file is stored with its size, mtime, content hash and the ticker it produced,
+    along with the hash of the themes file, so that an incremental run only processes what
+    changed since. Every file that produced a ticker is recorded, as a full run keeps the company
+    of the last of them.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.files: Dict[str, Dict[str, any]] = dict()
+        self.company_files: Dict[str, List[str]] = dict()
+        self.themes_hash: Optional[str] = None
+        self.exists = os.path.exists(path)
+
+        if self.exists:
+            with open(path, "r", encoding="utf-8") as file:
+                manifest = json.load(file)
+            self.files = manifest["files"]
+            # Manifests of earlier versions only recorded the file of the kept company
+            self.company_files = {
+                company_ticker: (
+                    html_files if isinstance(html_files, list) else [html_files]
+                )
+                for company_ticker, html_files in manifest["company_files"].items()
+            }
+            self.themes_hash = manifest["themes_hash"]
+
+    def refresh(
+        self, directory: str, html_files: List[str]
+    ) -> Tuple[List[str], List[str], int]:
+        """Compare the current files with the manifest. Return the files to process, the tickers
+        that are stale because one of their files changed or was deleted, and the number of deleted
+        files. The files to process are the added or changed files, and the unchanged files that
+        still produce a stale ticker, so that its company is rebuilt from them, in the order of
+        html_files. Files whose size and mtime are unchanged are not hashed again.
+        """
+        changed_files = []
+        stale_tickers = []
+
+        for html_file in html_files:
+            file_size, file_mtime_ns = input_file_signature(directory, html_file)
+            entry = self.files.get(html_file)
+            if (
+                entry is not None
+                and entry["size"] == file_size
+                and entry["mtime_ns"] == file_mtime_ns
+            ):
+                continue
+
+            content_hash = hash_input_file(directory, html_file)
+            if entry is not None and entry["sha256"] == content_hash:
+                entry["size"] = file_size
+                entry["mtime_ns"] = file_mtime_ns
+                continue
+
+            if entry is not None:
+                stale_tickers.extend(self.release_ticker(html_file))
+            self.files[html_file] = {
+                "size": file_size,
+                "mtime_ns": file_mtime_ns,
+                "sha256": content_hash,
+                "company_ticker": None,
+            }
+            changed_files.append(html_file)
+
+        deleted_files = set(self.files.keys()).difference(html_files)
+        for html_file in deleted_files:
+            stale_tickers.extend(self.release_ticker(html_file))
+            del self.files[html_file]
+
+        files_to_process = set(changed_files)
+        for company_ticker in stale_tickers:
+            files_to_process.update(self.company_files.get(company_ticker, []))
+        changed_files = [
+            html_file for html_file in html_files if html_file in files_to_process
+        ]
+        return changed_files, stale_tickers, len(deleted_files)
+
+    def release_ticker(self, html_file: str) -> List[str]:
+        """Forget the ticker produced by a file, and return it"""
+        company_ticker = self.files[html_file]["company_ticker"]
+        if company_ticker is None:
+            return []
+        self.files[html_file]["company_ticker"] = None
+        html_files = self.company_files.get(company_ticker, [])
+        if html_file in html_files:
+            html_files.remove(html_file)
+        if not html_files:
+            self.company_files.pop(company_ticker, None)
+        return [company_ticker]
+
+    def source_file(
+        self, company_ticker: str, file_order: Dict[str, int]
+    ) -> Optional[str]:
+        """Return the file whose company a full run keeps for a ticker: the last of the files that
+        produce it, in the order of file_order
+        """
+        html_files = self.company_files.get(company_ticker)
+        if not html_files:
+            return None
+        return max(html_files, key=lambda html_file: file_order.get(html_file, -1))
+
+    def forget_companies(self) -> None:
+        """Forget the tickers produced by every file, before all of them are processed again"""
+        for entry in self.files.values():
+            entry["company_ticker"] = None
+        self.company_files = dict()
+
+    def record_company(self, html_file: str, company_ticker: str) -> None:
+        if self.files[html_file]["company_ticker"] not in (None, company_ticker):
+            self.release_ticker(html_file)
+        self.files[html_file]["company_ticker"] = company_ticker
+        html_files = self.company_files.setdefault(company_ticker, [])
+        if html_file not in html_files:
+            html_files.append(html_file)
+
+    def save(self) -> None:
+        with open(f"{self.path}.tmp", "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "themes_hash": self.themes_hash,
+                    "company_files": self.company_files,
+                    "files": self.files,
+                },
+                file,
+            )
+        os.replace(f"{self.path}.tmp", self.path)
+        self.exists = True
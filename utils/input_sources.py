@@ -0,0 +1,168 @@
+import hashlib
+import os
+import tarfile
+import threading
+import zipfile
+from typing import Dict, Iterator, List, Optional, Tuple
+
+HASH_READ_SIZE = 1024 * 1024
+HTML_EXTENSIONS = (".html", ".htm")
+ZIP_EXTENSIONS = (".zip",)
+TAR_EXTENSIONS = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+ARCHIVE_EXTENSIONS = ZIP_EXTENSIONS + TAR_EXTENSIONS
+
+
+def hash_file(path: str) -> str:
+    """Return the sha256 hex digest of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(HASH_READ_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def has_extension(name: str, extensions: Tuple[str, ...]) -> bool:
+    return name.lower().endswith(extensions)
+
+
+def iterate_input_files(
+    directory: str, extensions: Tuple[str, ...] = HTML_EXTENSIONS
+) -> Iterator[str]:
+    """Lazily yield the path, relative to the directory, of every file with one of the extensions
+    in the directory, its subdirectories, and the zip and tar archives in them. A file inside an
+    archive is named as if the archive were a directory, e.g. vendor.zip/2024/AAPL.html.
+
+    Entries are yielded in directory order, the same order as listdir, so that the companies of a
+    flat directory are processed in the same order as before.
+    """
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                for file_name in iterate_input_files(entry.path, extensions):
+                    yield f"{entry.name}/{file_name}"
+            elif not entry.is_file():
+                continue
+            elif has_extension(entry.name, ARCHIVE_EXTENSIONS):
+                for member_name in archive_reader(entry.path).member_names(extensions):
+                    yield f"{entry.name}/{member_name}"
+            elif has_extension(entry.name, extensions):
+                yield entry.name
+
+
+def split_archive_path(directory: str, file_name: str) -> Optional[Tuple[str, str]]:
+    """Return the path of the archive and the name of the member for a file inside an archive, or
+    None for a plain file
+    """
+    parts = file_name.split("/")
+    for index, part in enumerate(parts[:-1]):
+        if has_extension(part, ARCHIVE_EXTENSIONS):
+            archive_path = os.path.join(directory, *parts[: index + 1])
+            if os.path.isfile(archive_path):
+                return archive_path, "/".join(parts[index + 1 :])
+    return None
+
+
+def read_input_file(directory: str, file_name: str) -> str:
+    """Return the text of an input file, reading it out of its archive if it is in one"""
+    archive_member = split_archive_path(directory, file_name)
+    if archive_member is None:
+        with open(os.path.join(directory, file_name), "r", encoding="utf-8") as file:
+            return file.read()
+    archive_path, member_name = archive_member
+    return archive_reader(archive_path).read(member_name).decode("utf-8")
+
+
+def input_file_signature(directory: str, file_name: str) -> Tuple[int, int]:
+    """Return the size and mtime of an input file. A file inside an archive has the mtime of the
+    archive, so every file of an archive that was replaced is checked again.
+    """
+    archive_member = split_archive_path(directory, file_name)
+    if archive_member is None:
+        file_stat = os.stat(os.path.join(directory, file_name))
+        return file_stat.st_size, file_stat.st_mtime_ns
+    archive_path, member_name = archive_member
+    return (
+        archive_reader(archive_path).member_size(member_name),
+        os.stat(archive_path).st_mtime_ns,
+    )
+
+
+def hash_input_file(directory: str, file_name: str) -> str:
+    """Return the sha256 hex digest of an input file's content"""
+    archive_member = split_archive_path(directory, file_name)
+    if archive_member is None:
+        return hash_file(os.path.join(directory, file_name))
+    archive_path, member_name = archive_member
+    return hashlib.sha256(archive_reader(archive_path).read(member_name)).hexdigest()
+
+
+class ArchiveReader:
+    """Reads the files of a zip or tar archive without extracting it.
+
+    Reads are serialized, as neither archive format can be read by several threads at once. The
+    members of a tar archive are listed by reading it once from start to end, and compressed tar
+    archives are read fastest in member order, which is the order they are listed and prefetched
+    in.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.is_zip = has_extension(path, ZIP_EXTENSIONS)
+        if self.is_zip:
+            self.archive = zipfile.ZipFile(path)
+            self.members: Dict[str, any] = {
+                member.filename: member
+                for member in self.archive.infolist()
+                if not member.is_dir()
+            }
+        else:
+            self.archive = tarfile.open(path)
+            self.members = {
+                member.name: member for member in self.archive if member.isfile()
+            }
+
+    def member_names(self, extensions: Tuple[str, ...]) -> List[str]:
+        return [
+            member_name
+            for member_name in self.members
+            if has_extension(member_name, extensions)
+        ]
+
+    def member_size(self, member_name: str) -> int:
+        member = self.members[member_name]
+        return member.file_size if self.is_zip else member.size
+
+    def close(self) -> None:
+        with self.lock:
+            self.archive.close()
+
+    def read(self, member_name: str) -> bytes:
+        member = self.members[member_name]
+        with self.lock:
+            if self.is_zip:
+                return self.archive.read(member)
+            with self.archive.extractfile(member) as file:
+                return file.read()
+
+
+# Open archives of this process, keyed by path, with the size and mtime they were opened at
+_archive_readers: Dict[str, Tuple[int, int, int, ArchiveReader]] = dict()
+_archive_readers_lock = threading.Lock()
+
+
+def archive_reader(path: str) -> ArchiveReader:
+    """Return the reader of an archive, opening it once per process and again if it changed.
+    Forked parse workers open their own, as they would otherwise share the file position.
+    """
+    file_stat = os.stat(path)
+    key = (os.getpid(), file_stat.st_size, file_stat.st_mtime_ns)
+    with _archive_readers_lock:
+        cached = _archive_readers.get(path)
+        if cached is not None and cached[:3] == key:
+            return cached[3]
+        if cached is not None and cached[0] == os.getpid():
+            cached[3].close()
+        reader = ArchiveReader(path)
+        _archive_readers[path] = (*key, reader)
+        return reader
@@ -0,0 +1,70 @@
+import logging
+from typing import Optional, Tuple
+
+from constants.data_constants import ENCODER_BACKEND
+
+
+def encoder_model_name(model_name: str, encoder_backend: str) -> str:
+    """Return the name that encodings of a model and backend are cached under. Backends other than
+    the fp32 torch one produce slightly different encodings, so they must not share cache entries.
+    """
+    if encoder_backend == ENCODER_BACKEND.TORCH.value:
+        return model_name
+    return f"{model_name}@{encoder_backend}"
+
+
+def split_encoder_model_name(name: str) -> Tuple[str, str]:
+    """Return the model name and the encoder backend of a name made by encoder_model_name"""
+    for encoder_backend in ENCODER_BACKEND:
+        if name.endswith(f"@{encoder_backend.value}"):
+            return name[: -len(encoder_backend.value) - 1], encoder_backend.value
+    return name, ENCODER_BACKEND.TORCH.value
+
+
+class LazySentenceTransformer:
+    """Stand-in for a SentenceTransformer that only imports sentence_transformers (and with it torch)
+    and loads the model the first time something is encoded.
+
+    Runs that reuse the theme matrix and find every description in the embedding cache never load
+    the model at all. With the int8 backend, the linear layers of the loaded model are dynamically
+    quantized for faster inference on CPU.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        logger: Optional[logging.Logger] = None,
+        encoder_backend: str = ENCODER_BACKEND.TORCH.value,
+    ):
+        self.model_name = model_name
+        self.logger = logger
+        self.encoder_backend = encoder_backend
+        self.model = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.model is not None
+
+    def load(self):
+        if self.model is None:
+            from sentence_transformers import SentenceTransformer
+
+            if self.encoder_backend == ENCODER_BACKEND.TORCH_INT8.value:
+                import torch
+
+                # Dynamically quantized layers only run on CPU
+                model = SentenceTransformer(self.model_name, device="cpu")
+                model = torch.ao.quantization.quantize_dynamic(
+                    model, {torch.nn.Linear}, dtype=torch.qint8
+                )
+            else:
+                model = SentenceTransformer(self.model_name)
+            self.model = model
+            if self.logger is not None:
+                self.logger.info(
+                    f"Done loading model: {self.model_name} ({self.encoder_backend})"
+                )
+        return self.model
+
+    def encode(self, sentences, **kwargs):
+        return self.load().encode(sentences, **kwargs)
@@ -0,0 +1,144 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class MicroBatcher:
+    """Coalesces items submitted by concurrent requests into batches for one call each.
+
+    A batch is processed as soon as it holds max_batch_size items, or max_wait_seconds after its
+    first item arrived. With item_size, the size of an item, e.g. its number of sentences, counts
+    towards max_batch_size instead of 1, and an item that would overflow a batch waits for the
+    next one, unless it is alone. process_batch takes a list of items and returns one result per
+    item. It runs on a single worker thread, off the event loop, so requests keep arriving and
+    queueing for the next batch while one is processed. An exception fails every request of its
+    batch.
+    """
+
+    def __init__(
+        self,
+        process_batch: Callable[[List[Any]], List[Any]],
+        max_batch_size: int,
+        max_wait_seconds: float,
+        item_size: Optional[Callable[[Any], int]] = None,
+    ):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self.item_size = item_size or (lambda item: 1)
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="micro-batcher"
+        )
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.queue: Optional[asyncio.Queue] = None
+        self.worker: Optional[asyncio.Task] = None
+        # The queued item that did not fit in the last batch, which starts the next one
+        self.next_item: Optional[Tuple[Any, asyncio.Future, float]] = None
+        self.batch_count = 0
+        self.item_count = 0
+        self.size_count = 0
+        self.max_queue_depth = 0
+        self.wait_seconds = 0.0
+        self.process_seconds = 0.0
+
+    async def submit(self, item: Any) -> Any:
+        """Queue an item for the next batch, and return its result once the batch is processed"""
+        self.start()
+        future = self.loop.create_future()
+        await self.queue.put((item, future, time.perf_counter()))
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth())
+        return await future
+
+    def start(self) -> None:
+        """Start the worker task on the running event loop, once per loop"""
+        loop = asyncio.get_running_loop()
+        if self.loop is loop and not self.worker.done():
+            return
+        self.loop = loop
+        self.queue = asyncio.Queue()
+        self.next_item = None
+        self.worker = loop.create_task(self.run())
+
+    def queue_depth(self) -> int:
+        """Return the number of items waiting for a batch"""
+        return (0 if self.queue is None else self.queue.qsize()) + (
+            0 if self.next_item is None else 1
+        )
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return how many batches and items were processed, how full the batches were, and how
+        long items waited in the queue
+        """
+        return {
+            "queue_depth": self.queue_depth(),
+            "max_queue_depth": self.max_queue_depth,
+            "batch_count": self.batch_count,
+            "item_count": self.item_count,
+            "size_count": self.size_count,
+            "mean_batch_items": (
+                self.item_count / self.batch_count if self.batch_count else None
+            ),
+            "mean_batch_size": (
+                self.size_count / self.batch_count if self.batch_count else None
+            ),
+            "mean_wait_seconds": (
+                self.wait_seconds / self.item_count if self.item_count else None
+            ),
+            "process_seconds": self.process_seconds,
+        }
+
+    async def next_batch(self) -> List[Tuple[Any, asyncio.Future, float]]:
+        if self.next_item is None:
+            self.next_item = await self.queue.get()
+        batch = [self.next_item]
+        batch_size = self.item_size(self.next_item[0])
+        self.next_item = None
+        deadline = self.loop.time() + self.max_wait_seconds
+        while batch_size < self.max_batch_size:
+            if self.queue.empty():
+                timeout = deadline - self.loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    queued_item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                queued_item = self.queue.get_nowait()
+            queued_item_size = self.item_size(queued_item[0])
+            if batch_size + queued_item_size > self.max_batch_size:
+                self.next_item = queued_item
+                break
+            batch.append(queued_item)
+            batch_size += queued_item_size
+        return batch
+
+    async def run(self) -> None:
+        while True:
+            batch = await self.next_batch()
+            # Requests whose client went away are not processed
+            batch = [queued_item for queued_item in batch if not queued_item[1].done()]
+            if not batch:
+                continue
+            start_time = time.perf_counter()
+            try:
+                results = await self.loop.run_in_executor(
+                    self.executor, self.process_batch, [item for item, _, _ in batch]
+                )
+            except Exception as exception:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(exception)
+                continue
+
+            self.batch_count += 1
+            self.item_count += len(batch)
+            self.size_count += sum(self.item_size(item) for item, _, _ in batch)
+            self.wait_seconds += sum(
+                start_time - queued_time for _, _, queued_time in batch
+            )
+            self.process_seconds += time.perf_counter() - start_time
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
@@ -0,0 +1,95 @@
+import logging
+import os
+from typing import List, Optional, Tuple
+
+from constants.data_constants import ENCODER_SERVER
+from utils.encoder_server import EncoderClient
+from utils.lazy_model import LazySentenceTransformer, split_encoder_model_name
+from utils.theme_matrix import ThemeMatrix
+
+
+class OnlineClassifier:
+    """Classifies company descriptions on demand against the theme matrix saved by the data
+    pipeline.
+
+    The theme matrix is loaded on first use and again only when the pipeline replaces the file.
+    Descriptions are encoded with the model named by the matrix, with its encoder backend, so the
+    same way as the themes: by the local encoder server at encoder_socket when it serves that
+    model, otherwise by a copy kept loaded in-process. Themes are ranked as in the pipeline, ties
+    keeping the order of the themes file.
+    """
+
+    def __init__(
+        self,
+        theme_matrix_file: str,
+        logger: Optional[logging.Logger] = None,
+        encoder_socket: str = ENCODER_SERVER.SOCKET_PATH.value,
+    ):
+        self.theme_matrix_file = theme_matrix_file
+        self.logger = logger
+        self.encoder_socket = encoder_socket
+        self.theme_matrix: Optional[ThemeMatrix] = None
+        self.theme_matrix_signature: Optional[Tuple[str, int, int]] = None
+        self.model = None
+        self.model_name: Optional[str] = None
+
+    def current_theme_matrix(self) -> ThemeMatrix:
+        """Return the saved theme matrix, loading it again if the file changed. Raise
+        FileNotFoundError when there is none.
+        """
+        if not os.path.exists(self.theme_matrix_file):
+            raise FileNotFoundError(self.theme_matrix_file)
+        file_stat = os.stat(self.theme_matrix_file)
+        signature = (self.theme_matrix_file, file_stat.st_size, file_stat.st_mtime_ns)
+        if signature != self.theme_matrix_signature:
+            theme_matrix = ThemeMatrix.load(self.theme_matrix_file)
+            if theme_matrix is None:
+                raise FileNotFoundError(self.theme_matrix_file)
+            self.theme_matrix = theme_matrix
+            self.theme_matrix_signature = signature
+            if self.logger is not None:
+                self.logger.info(
+                    f"Done loading theme matrix of {len(theme_matrix.theme_names)} themes from: "
+                    f"{self.theme_matrix_file}"
+                )
+        return self.theme_matrix
+
+    def load_model(self, model_name: str) -> EncoderClient:
+        base_model_name, encoder_backend = split_encoder_model_name(model_name)
+        return EncoderClient(
+            self.encoder_socket,
+            model_name,
+            LazySentenceTransformer(base_model_name, self.logger, encoder_backend),
+            self.logger,
+        )
+
+    def classify(
+        self, descriptions: List[str], top_n: int
+    ) -> List[List[Tuple[str, float]]]:
+        """Return the top N themes of every description, with their cosine similarity, highest
+        first
+        """
+        import torch
+
+        theme_matrix = self.current_theme_matrix()
+        if self.model is None or self.model_name != theme_matrix.model_name:
+            if isinstance(self.model, EncoderClient):
+                self.model.close()
+            self.model = self.load_model(theme_matrix.model_name)
+            self.model_name = theme_matrix.model_name
+
+        encodings = self.model.encode(
+            descriptions, batch_size=len(descriptions), convert_to_tensor=True
+        )
+        company_matrix = torch.nn.functional.normalize(encodings.float().cpu(), dim=1)
+        similarities = company_matrix @ torch.from_numpy(theme_matrix.matrix).T
+        top_scores, top_indices = torch.sort(
+            similarities, dim=1, descending=True, stable=True
+        )
+        return [
+            [
+                (theme_matrix.theme_names[index], score)
+                for index, score in zip(indices[:top_n], scores[:top_n])
+            ]
+            for indices, scores in zip(top_indices.tolist(), top_scores.tolist())
+        ]
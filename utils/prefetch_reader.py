@@ -0,0 +1,64 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator, Optional, Tuple
+
+from utils.input_sources import read_input_file
+
+
+class PrefetchingFileReader:
+    """Reads files in a pool of reader threads, up to queue_depth files ahead of the consumer, so
+    that reading the next files overlaps with processing the current ones.
+
+    Files are yielded in the given order. A file that cannot be read is yielded without content,
+    so that the consumer reads it again itself and fails with the same error as without
+    prefetching. The time spent reading, and the time the consumer spent waiting for reads, are
+    counted to show how much of the reading was overlapped.
+    """
+
+    def __init__(self, directory: str, read_workers: int, queue_depth: int):
+        self.directory = directory
+        self.read_workers = read_workers
+        self.queue_depth = max(queue_depth, 1)
+        self.file_count = 0
+        self.read_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.lock = threading.Lock()
+
+    def read_file(self, file_name: str) -> Optional[str]:
+        start_time = time.perf_counter()
+        try:
+            return read_input_file(self.directory, file_name)
+        except Exception:
+            return None
+        finally:
+            with self.lock:
+                self.read_seconds += time.perf_counter() - start_time
+
+    def read_all(
+        self, file_names: Iterable[str]
+    ) -> Iterator[Tuple[str, Optional[str]]]:
+        """Yield the name and content of every file, in order"""
+        file_names = iter(file_names)
+        with ThreadPoolExecutor(max_workers=self.read_workers) as executor:
+            pending = deque(
+                (file_name, executor.submit(self.read_file, file_name))
+                for file_name in islice(file_names, self.queue_depth)
+            )
+            while pending:
+                file_name, future = pending.popleft()
+                wait_start_time = time.perf_counter()
+                content = future.result()
+                self.wait_seconds += time.perf_counter() - wait_start_time
+                self.file_count += 1
+
+                for next_file_name in islice(file_names, 1):
+                    pending.append(
+                        (
+                            next_file_name,
+                            executor.submit(self.read_file, next_file_name),
+                        )
+                    )
+                yield file_name, content
@@ -0,0 +1,89 @@
+import json
+import os
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+SHARD_FORMAT_VERSION = 1
+SHARD_METADATA_FILE = "shard.json"
+
+
+def shard_of_file(file_name: str, shard_count: int) -> int:
+    """Return the shard a company file belongs to. The hash of the file name is stable across
+    processes and machines, unlike the built-in hash().
+    """
+    return zlib.crc32(file_name.encode("utf-8")) % shard_count
+
+
+def shard_directory(directory: str, shard_index: int, shard_count: int) -> str:
+    return os.path.join(directory, f"shard-{shard_index}-of-{shard_count}")
+
+
+def save_shard_metadata(
+    directory: str,
+    shard_index: int,
+    shard_count: int,
+    theme_names: List[str],
+    themes_hash: str,
+    model_name: str,
+    company_files: Dict[str, str],
+) -> None:
+    """Write what the merge needs to check and combine the output of a shard: the shard, the themes
+    and model it was scored with, and the company file of every ticker
+    """
+    metadata = {
+        "format_version": SHARD_FORMAT_VERSION,
+        "shard_index": shard_index,
+        "shard_count": shard_count,
+        "theme_names": theme_names,
+        "themes_hash": themes_hash,
+        "model_name": model_name,
+        "company_files": company_files,
+    }
+    file_path = os.path.join(directory, SHARD_METADATA_FILE)
+    with open(f"{file_path}.tmp", "w", encoding="utf-8") as file:
+        json.dump(metadata, file)
+    os.replace(f"{file_path}.tmp", file_path)
+
+
+def load_shard_metadata(directory: str) -> Optional[Dict[str, any]]:
+    """Read the metadata of a shard. Return None if the shard has none, or another format version"""
+    file_path = os.path.join(directory, SHARD_METADATA_FILE)
+    if not os.path.exists(file_path):
+        return None
+    with open(file_path, "r", encoding="utf-8") as file:
+        metadata = json.load(file)
+    if metadata.get("format_version") != SHARD_FORMAT_VERSION:
+        return None
+    return metadata
+
+
+def merge_shard_companies(
+    shards: List[Tuple[Dict[str, any], Dict[str, str]]],
+) -> Tuple[Dict[str, any], int, Dict[str, int]]:
+    """Combine the companies of every shard, each given with the company file of every ticker.
+    Return the merged companies, the number of duplicate tickers dropped and the position of the
+    shard every kept company comes from.
+
+    When files of different shards share a ticker, the company of the file name that sorts last is
+    kept, as it is within a shard, so the result does not depend on the shard count or the order
+    of the shards. The merged companies are ordered by file name.
+    """
+    kept_companies: Dict[str, Tuple[str, int, any]] = dict()
+    duplicate_count = 0
+    for shard_position, (companies, company_files) in enumerate(shards):
+        for company_ticker, company in companies.items():
+            html_file = company_files[company_ticker]
+            if company_ticker in kept_companies:
+                duplicate_count += 1
+                if kept_companies[company_ticker][0] > html_file:
+                    continue
+            kept_companies[company_ticker] = (html_file, shard_position, company)
+
+    merged_companies = dict()
+    company_shards = dict()
+    for company_ticker, (_, shard_position, company) in sorted(
+        kept_companies.items(), key=lambda item: (item[1][0], item[0])
+    ):
+        merged_companies[company_ticker] = company
+        company_shards[company_ticker] = shard_position
+    return merged_companies, duplicate_count, company_shards
@@ -0,0 +1,128 @@
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from typing import Callable, Dict, Iterator, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_megabytes() -> Optional[float]:
+    """Return the peak resident set size of this process so far, or None where it is unknown"""
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    if sys.platform == "darwin":
+        return peak_rss / (1024 * 1024)
+    return peak_rss / 1024
+
+
+class StageTimer:
+    """Handle of a running stage, used to count the items it processed"""
+
+    def __init__(self):
+        self.items = 0
+
+    def add_items(self, count: int) -> None:
+        self.items += count
+
+
+class StageMetrics:
+    """Wall time, CPU time, peak RSS, item count and throughput of every stage of a run.
+
+    A stage can run many times, e.g. once per window of files, and its measurements are summed
+    over every call. Stages can be nested, so a stage's time includes that of the stages it calls.
+
+    Note: CPU time is that of the main process only, not of parse worker processes.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.started_at = datetime.now()
+        self.start_wall_time = time.perf_counter()
+        self.start_cpu_time = time.process_time()
+        self.stages: Dict[str, Dict[str, any]] = dict()
+        self.details: Dict[str, any] = dict()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageTimer]:
+        timer = StageTimer()
+        start_wall_time = time.perf_counter()
+        start_cpu_time = time.process_time()
+        try:
+            yield timer
+        finally:
+            stage = self.stages.setdefault(
+                name,
+                {"calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0, "items": 0},
+            )
+            stage["calls"] += 1
+            stage["wall_seconds"] += time.perf_counter() - start_wall_time
+            stage["cpu_seconds"] += time.process_time() - start_cpu_time
+            stage["items"] += timer.items
+            stage["peak_rss_mb"] = peak_rss_megabytes()
+
+    def add_details(self, **details) -> None:
+        """Add measurements of the run that are not those of a stage to the summary"""
+        self.details.update(details)
+
+    def timed(self, name: str, count_items: Optional[Callable] = None) -> Callable:
+        """Decorator that runs every call of a function as a stage. count_items is called with the
+        result and the arguments of the call, and returns the number of items processed.
+        """
+
+        def decorator(function: Callable) -> Callable:
+            @wraps(function)
+            def timed_function(*args, **kwargs):
+                with self.stage(name) as timer:
+                    result = function(*args, **kwargs)
+                    if count_items is not None:
+                        timer.add_items(count_items(result, *args, **kwargs))
+                    return result
+
+            return timed_function
+
+        return decorator
+
+    def summary(self, **run_details) -> Dict[str, any]:
+        """Return the metrics of the run and of every stage, in the order the stages first ran"""
+        stages = dict()
+        for name, stage in self.stages.items():
+            stages[name] = {
+                **stage,
+                "items_per_second": (
+                    stage["items"] / stage["wall_seconds"]
+                    if stage["wall_seconds"] > 0
+                    else None
+                ),
+            }
+        return {
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            **run_details,
+            **self.details,
+            "wall_seconds": time.perf_counter() - self.start_wall_time,
+            "cpu_seconds": time.process_time() - self.start_cpu_time,
+            "peak_rss_mb": peak_rss_megabytes(),
+            "stages": stages,
+        }
+
+    def save(self, directory: str, name: str, **run_details) -> str:
+        """Write the summary of the run as JSON into a new file named after the run start time, and
+        return its path
+        """
+        file_path = os.path.join(
+            directory,
+            f"{name}-metrics-{self.started_at.strftime('%Y%m%dT%H%M%S')}.json",
+        )
+        with open(file_path, "w", encoding="utf-8") as file:
+            json.dump(self.summary(**run_details), file, indent=2)
+        return file_path
@@ -0,0 +1,33 @@
+import zlib
+
+import numpy as np
+
+STUB_ENCODER_NAME = "stub-hashing-encoder"
+STUB_ENCODER_DIMENSION = 384
+
+
+class StubEncoder:
+    """Deterministic stand-in for the sentence transformer model, for machines without the model
+    weights, e.g. CI runners.
+
+    Every word is hashed into one of the dimensions of the encoding, so descriptions that share
+    words are similar. It has the same encode() interface as the model and output of the same
+    dimension, but costs far less, so encoding timings made with it only measure the pipeline
+    around the model.
+    """
+
+    def __init__(self, dimension: int = STUB_ENCODER_DIMENSION):
+        self.dimension = dimension
+
+    def encode(
+        self, sentences, batch_size: int = 32, convert_to_tensor=False, **kwargs
+    ):
+        encodings = np.zeros((len(sentences), self.dimension), dtype=np.float32)
+        for row, sentence in enumerate(sentences):
+            for word in sentence.lower().split():
+                encodings[row, zlib.crc32(word.encode("utf-8")) % self.dimension] += 1.0
+        if convert_to_tensor:
+            import torch
+
+            return torch.from_numpy(encodings)
+        return encodings
@@ -0,0 +1,117 @@
+import os
+import random
+from typing import List
+
+from constants.data_constants import PREFIX
+
+# Words the synthetic company descriptions and themes are drawn from, so that they share a
+# vocabulary and produce a spread of similarities when encoded
+VOCABULARY = (
+    "battery lithium vehicle charging grid solar wind turbine storage semiconductor chip wafer "
+    "foundry software cloud platform subscription analytics security network wireless satellite "
+    "retail grocery store ecommerce logistics warehouse shipping freight airline travel hotel "
+    "restaurant beverage food agriculture fertilizer seed pharmaceutical drug vaccine clinical "
+    "hospital insurance bank payment lending mortgage asset management exchange mining copper "
+    "gold steel aluminium chemical plastic packaging paper timber construction housing cement "
+    "machinery robot automation sensor medical device diagnostic genome biotech media streaming "
+    "music gaming advertising social education consumer apparel footwear luxury cosmetics oil gas "
+    "pipeline refinery utility water waste recycling defense aerospace rail truck engine tire"
+).split()
+FILLER_WORDS = (
+    "the a of and for with to in its across that provides designs sells".split()
+)
+
+# Ways a synthetic company file can be malformed, each rejected by the pipeline with its own error
+MALFORMED_KINDS = [
+    "missing_tag",
+    "missing_title_prefix",
+    "mismatch_name",
+    "missing_ticker_prefix",
+    "blank_description",
+]
+
+
+def synthetic_sentence(rng: random.Random, word_count: int) -> str:
+    words = []
+    for _ in range(word_count):
+        pool = FILLER_WORDS if rng.random() < 0.3 else VOCABULARY
+        words.append(rng.choice(pool))
+    return " ".join(words).capitalize() + "."
+
+
+def synthetic_company_html(
+    rng: random.Random, company_index: int, malformed_kind: str = None
+) -> str:
+    """Return the HTML of one synthetic company in the expected tag structure, or malformed in the
+    given way
+    """
+    company_name = f"Company {company_index} Holdings"
+    company_ticker = f"C{company_index:06d}"
+    description = " ".join(
+        synthetic_sentence(rng, rng.randint(12, 30)) for _ in range(rng.randint(3, 8))
+    )
+
+    title = f"{PREFIX.TITLE_NAME.value} {company_name}"
+    h1 = company_name
+    h2 = f"<H2>{PREFIX.TICKER.value} {company_ticker}</H2>\n"
+    if malformed_kind == "missing_tag":
+        h2 = ""
+    elif malformed_kind == "missing_title_prefix":
+        title = company_name
+    elif malformed_kind == "mismatch_name":
+        h1 = f"Other {company_name}"
+    elif malformed_kind == "missing_ticker_prefix":
+        h2 = f"<H2>{company_ticker}</H2>\n"
+    elif malformed_kind == "blank_description":
+        description = ""
+
+    return (
+        "<HTML>\n<HEAD>\n"
+        f"<TITLE>{title}</TITLE>\n"
+        "</HEAD>\n<BODY>\n"
+        f"<H1>{h1}</H1>\n"
+        f"{h2}"
+        f"<P>\n    {description}\n</P>\n"
+        "</BODY>\n</HTML>"
+    )
+
+
+def write_synthetic_companies(
+    directory: str, company_count: int, malformed_share: float = 0.0, seed: int = 0
+) -> int:
+    """Write company_count synthetic company HTML files into a directory, a share of which are
+    malformed, and return the number of malformed files. The same seed writes the same files.
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    malformed_count = 0
+    for company_index in range(company_count):
+        malformed_kind = None
+        if rng.random() < malformed_share:
+            malformed_kind = MALFORMED_KINDS[malformed_count % len(MALFORMED_KINDS)]
+            malformed_count += 1
+        with open(
+            os.path.join(directory, f"company_{company_index:06d}.html"),
+            "w",
+            encoding="utf-8",
+        ) as file:
+            file.write(synthetic_company_html(rng, company_index, malformed_kind))
+    return malformed_count
+
+
+def synthetic_theme_lines(theme_count: int, seed: int = 0) -> List[str]:
+    """Return theme_count lines in the format of the themes file"""
+    rng = random.Random(seed)
+    return [
+        f"Theme{theme_index}: "
+        + " ".join(synthetic_sentence(rng, rng.randint(15, 30)) for _ in range(3))
+        for theme_index in range(theme_count)
+    ]
+
+
+def write_synthetic_themes(file_path: str, theme_count: int, seed: int = 0) -> None:
+    directory = os.path.dirname(file_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(file_path, "w", encoding="utf-8") as file:
+        file.write("\n\n".join(synthetic_theme_lines(theme_count, seed)))
@@ -0,0 +1,119 @@
+import math
+from typing import List, Optional, Tuple
+
+import torch
+
+
+class IvfThemeIndex:
+    """Approximate nearest-neighbour index over the normalized theme encodings.
+
+    The themes are clustered with spherical k-means into lists, each with a centroid. A company is
+    only scored against the themes of the probed lists, whose centroids are the most similar to
+    it, instead of against every theme.
+
+    The index also counts how many of the exact top themes of a sample of companies it found, to
+    report its recall against exact scoring.
+    """
+
+    def __init__(
+        self,
+        theme_matrix: torch.Tensor,
+        list_count: Optional[int] = None,
+        probe_count: int = 8,
+        kmeans_iterations: int = 20,
+        recall_sample_size: int = 1000,
+    ):
+        self.theme_matrix = theme_matrix
+        theme_count = theme_matrix.shape[0]
+        self.list_count = min(
+            list_count or max(1, round(math.sqrt(theme_count))), theme_count
+        )
+        self.probe_count = min(probe_count, self.list_count)
+        self.recall_sample_size = recall_sample_size
+        self.sampled_company_count = 0
+        self.sampled_hit_count = 0
+        self.sampled_relevant_count = 0
+
+        self.centroids, assignments = spherical_kmeans(
+            theme_matrix, self.list_count, kmeans_iterations
+        )
+        self.lists = [
+            (assignments == list_index).nonzero().squeeze(1)
+            for list_index in range(self.list_count)
+        ]
+        self.max_list_size = max(len(members) for members in self.lists)
+
+    @property
+    def recall(self) -> Optional[float]:
+        if self.sampled_relevant_count == 0:
+            return None
+        return self.sampled_hit_count / self.sampled_relevant_count
+
+    @property
+    def remaining_recall_sample_size(self) -> int:
+        return max(self.recall_sample_size - self.sampled_company_count, 0)
+
+    def candidates(
+        self, company_matrix: torch.Tensor
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """Score every normalized company encoding against the themes of its probed lists. Return
+        the candidate theme indices and their similarities. Unused columns hold the index -1 and
+        a similarity of -inf.
+        """
+        company_count = company_matrix.shape[0]
+        candidate_width = self.probe_count * self.max_list_size
+        candidate_scores = torch.full((company_count, candidate_width), -math.inf)
+        candidate_themes = torch.full(
+            (company_count, candidate_width), -1, dtype=torch.long
+        )
+
+        probed_lists = torch.topk(
+            company_matrix @ self.centroids.T, self.probe_count, dim=1
+        ).indices
+        for list_index in probed_lists.unique().tolist():
+            rows, probes = (probed_lists == list_index).nonzero(as_tuple=True)
+            members = self.lists[list_index]
+            # Every probe of a company has its own block of columns
+            columns = (probes * self.max_list_size).unsqueeze(1) + torch.arange(
+                len(members)
+            )
+            candidate_scores[rows.unsqueeze(1), columns] = (
+                company_matrix[rows] @ self.theme_matrix[members].T
+            )
+            candidate_themes[rows.unsqueeze(1), columns] = members
+
+        return candidate_themes, candidate_scores
+
+    def record_recall(
+        self,
+        exact_top_theme_indices: List[List[int]],
+        approximate_top_theme_indices: List[List[int]],
+    ) -> None:
+        for exact, approximate in zip(
+            exact_top_theme_indices, approximate_top_theme_indices
+        ):
+            self.sampled_hit_count += len(set(exact).intersection(approximate))
+            self.sampled_relevant_count += len(exact)
+            self.sampled_company_count += 1
+
+
+def spherical_kmeans(
+    matrix: torch.Tensor, cluster_count: int, iterations: int
+) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Cluster normalized rows by cosine similarity. Return the normalized centroids and the cluster
+    of every row. The initial centroids are picked with a fixed seed, so the clusters are the same
+    on every run.
+    """
+    generator = torch.Generator().manual_seed(0)
+    centroids = matrix[
+        torch.randperm(matrix.shape[0], generator=generator)[:cluster_count]
+    ].clone()
+
+    for _ in range(iterations):
+        assignments = torch.argmax(matrix @ centroids.T, dim=1)
+        sums = torch.zeros_like(centroids).index_add_(0, assignments, matrix)
+        non_empty = sums.norm(dim=1) > 0
+        # Empty clusters keep their previous centroid
+        centroids[non_empty] = torch.nn.functional.normalize(sums[non_empty], dim=1)
+
+    return centroids, torch.argmax(matrix @ centroids.T, dim=1)
@@ -0,0 +1,75 @@
+import json
+import os
+import zipfile
+from typing import List, Optional
+
+import numpy as np
+
+THEME_MATRIX_FORMAT_VERSION = 1
+THEME_MATRIX_FILE_NAME = "theme_matrix.npz"
+
+
+class ThemeMatrix:
+    """Normalized encodings of the themes, one float32 row per theme in the order of the themes
+    file, along with the theme names.
+
+    The matrix is saved as an artifact keyed by the hash of the themes file and the model name, so
+    that later runs and other consumers can load it instead of encoding the themes again.
+    """
+
+    def __init__(
+        self,
+        theme_names: List[str],
+        matrix: np.ndarray,
+        themes_hash: str,
+        model_name: str,
+    ):
+        self.theme_names = theme_names
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        self.themes_hash = themes_hash
+        self.model_name = model_name
+
+    @classmethod
+    def load(cls, path: str) -> Optional["ThemeMatrix"]:
+        """Read a saved theme matrix. Return None if there is none, or it has another format version"""
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as artifact:
+                metadata = json.loads(str(artifact["metadata"]))
+                if metadata["format_version"] != THEME_MATRIX_FORMAT_VERSION:
+                    return None
+                return cls(
+                    artifact["theme_names"].tolist(),
+                    artifact["matrix"],
+                    metadata["themes_hash"],
+                    metadata["model_name"],
+                )
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            return None
+
+    def is_current(
+        self, theme_names: List[str], themes_hash: str, model_name: str
+    ) -> bool:
+        """Return True if the matrix was built from the same themes file with the same model"""
+        return (
+            self.themes_hash == themes_hash
+            and self.model_name == model_name
+            and self.theme_names == theme_names
+        )
+
+    def save(self, path: str) -> None:
+        metadata = {
+            "format_version": THEME_MATRIX_FORMAT_VERSION,
+            "themes_hash": self.themes_hash,
+            "model_name": self.model_name,
+            "dimension": int(self.matrix.shape[1]),
+        }
+        with open(f"{path}.tmp", "wb") as file:
+            np.savez(
+                file,
+                theme_names=np.array(self.theme_names, dtype=str),
+                matrix=self.matrix,
+                metadata=np.array(json.dumps(metadata)),
+            )
+        os.replace(f"{path}.tmp", path)